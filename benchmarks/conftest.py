@@ -0,0 +1,67 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from numpy.typing import NDArray
+from pytest import FixtureRequest, TempPathFactory
+
+from imod_coupler.testing.fake_kernels import (
+    FakeMetaMod,
+    FakeRibaMetaMod,
+    create_metamod,
+    create_ribametamod,
+)
+
+# number of svats; the models have half as many MODFLOW 6 cells
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n}svats")
+def n_svat(request: FixtureRequest) -> int:
+    return int(request.param)
+
+
+@pytest.fixture(scope="module")
+def metamod(n_svat: int, tmp_path_factory: TempPathFactory) -> FakeMetaMod:
+    """MetaMod on fake kernels, prepared for its first outer iteration"""
+    directory: Path = tmp_path_factory.mktemp("metamod")
+    driver = create_metamod(
+        directory, n_svat=n_svat, n_node=n_svat // 2, n_well=n_svat // 100
+    )
+    driver.initialize()
+    driver.mf6.prepare_time_step(0.0)
+    driver.delt = driver.mf6.get_time_step()
+    driver.msw.prepare_time_step(driver.delt)
+    driver.msw.solve(0)
+    return driver
+
+
+@pytest.fixture(scope="module")
+def ribametamod(n_svat: int, tmp_path_factory: TempPathFactory) -> FakeRibaMetaMod:
+    """RibaMetaMod on fake kernels, with the river exchange of a time step done"""
+    directory: Path = tmp_path_factory.mktemp("ribametamod")
+    driver = create_ribametamod(
+        directory,
+        n_svat=n_svat,
+        n_node=n_svat // 2,
+        n_basin=max(n_svat // 100, 10),
+        n_bound=n_svat // 10,
+        n_passive_river=1,
+        n_passive_drainage=1,
+        n_well=n_svat // 100,
+    )
+    driver.initialize()
+    driver.mf6.prepare_time_step(0.0)
+    driver.delt_gw = driver.mf6.get_time_step()
+    driver.exchange_rib2mod()
+    driver.exchange_mod2rib()
+    driver.msw.prepare_time_step_noSW(driver.delt_gw)
+    driver.msw.prepare_surface_water_time_step(1)
+    driver.exchange.add_ponding_volume_msw(driver.msw_ponding_volume)
+    return driver
+
+
+@pytest.fixture(scope="module")
+def realised_volume(ribametamod: FakeRibaMetaMod) -> NDArray[np.float64]:
+    """Realised volumes when Ribasim meets all demands"""
+    return ribametamod.exchange.demand.copy()
@@ -0,0 +1,57 @@
+"""Timings of the exchanges performed during every (outer iteration of a) time step"""
+
+import numpy as np
+from numpy.typing import NDArray
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from imod_coupler.testing.fake_kernels import FakeMetaMod, FakeRibaMetaMod
+
+
+def test_metamod_exchange_msw2mod(
+    benchmark: BenchmarkFixture, metamod: FakeMetaMod
+) -> None:
+    benchmark(metamod.exchange_msw2mod)
+
+
+def test_metamod_exchange_mod2msw(
+    benchmark: BenchmarkFixture, metamod: FakeMetaMod
+) -> None:
+    benchmark(metamod.exchange_mod2msw)
+
+
+def test_ribametamod_exchange_rib2mod(
+    benchmark: BenchmarkFixture, ribametamod: FakeRibaMetaMod
+) -> None:
+    benchmark(ribametamod.exchange_rib2mod)
+
+
+def test_add_flux_estimate_mod(
+    benchmark: BenchmarkFixture, ribametamod: FakeRibaMetaMod
+) -> None:
+    benchmark(
+        ribametamod.exchange.add_flux_estimate_mod,
+        ribametamod.mf6_head,
+        ribametamod.delt_gw,
+    )
+
+
+def test_flux_to_ribasim(
+    benchmark: BenchmarkFixture, ribametamod: FakeRibaMetaMod
+) -> None:
+    benchmark(
+        ribametamod.exchange.flux_to_ribasim,
+        ribametamod.delt_gw,
+        ribametamod.delt_sw,
+    )
+
+
+def test_flux_to_modflow(
+    benchmark: BenchmarkFixture,
+    ribametamod: FakeRibaMetaMod,
+    realised_volume: NDArray[np.float64],
+) -> None:
+    benchmark(
+        ribametamod.exchange.flux_to_modflow,
+        realised_volume,
+        ribametamod.delt_gw,
+    )
@@ -0,0 +1,22 @@
+"""Timings of the construction of the coupling tables at initialization"""
+
+import numpy as np
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from imod_coupler.utils import create_mapping
+
+
+@pytest.mark.parametrize("operator", ["sum", "avg"])
+def test_create_mapping(
+    benchmark: BenchmarkFixture, n_svat: int, operator: str
+) -> None:
+    # n:1 coupling of svats to cells, like the MetaMod head and storage mappings
+    n_node = n_svat // 2
+    src_idx = np.arange(n_svat)
+    tgt_idx = src_idx % n_node
+    benchmark.pedantic(
+        create_mapping,
+        args=(src_idx, tgt_idx, n_svat, n_node, operator),
+        rounds=3,
+    )
@@ -14,6 +14,9 @@ from scipy._lib.array_api_compat.numpy import fft  # noqa: F401
 from imod_coupler import __version__
 from imod_coupler.config import BaseConfig
 from imod_coupler.drivers.driver import get_driver
+from imod_coupler.io import configure_table_cache
+from imod_coupler.logging.run_metrics import RunMetrics
+from imod_coupler.logging.trace import TraceRecorder
 from imod_coupler.parser import parse_args
 from imod_coupler.utils import setup_logger
 
@@ -28,13 +31,13 @@ def main() -> None:
     config_path = Path(args.config_path).resolve()
 
     try:
-        run_coupler(config_path)
+        run_coupler(config_path, trace=args.enable_trace)
     except:  # noqa: E722
         logger.exception("iMOD Coupler run failed with: ")
         sys.exit(1)
 
 
-def run_coupler(config_path: Path) -> None:
+def run_coupler(config_path: Path, trace: bool = False) -> None:
     with open(config_path, "rb") as f:
         config_dict = tomllib.load(f)
 
@@ -42,18 +45,39 @@ def run_coupler(config_path: Path) -> None:
     base_config = BaseConfig(**config_dict)
     setup_logger(base_config.log_level, config_dir / "imod_coupler.log")
     logger.info(f"iMOD Coupler {__version__}")
+    configure_table_cache(
+        base_config.table_cache,
+        (
+            None
+            if base_config.table_cache_dir is None
+            else config_dir / base_config.table_cache_dir
+        ),
+    )
 
     if base_config.timing:
         start = time.perf_counter()
 
     driver = get_driver(config_dict, config_dir, base_config)
-    driver.execute()
+    if base_config.trace or trace:
+        tracer = TraceRecorder(config_dir / "imod_coupler_trace.json")
+        driver.timing_registry.tracer = tracer
+    if base_config.metrics:
+        driver.run_metrics = RunMetrics(config_dir / "imod_coupler_metrics.csv")
+    try:
+        driver.execute()
+    finally:
+        if driver.timing_registry.tracer is not None:
+            driver.timing_registry.tracer.finalize()
+        if driver.run_metrics is not None:
+            driver.run_metrics.finalize()
 
     # Report timing
     if base_config.timing:
         driver.report_timing_totals()
+        driver.timing_registry.write_json(config_dir / "imod_coupler_timing.json")
+        driver.timing_registry.write_csv(config_dir / "imod_coupler_timing.csv")
         end = time.perf_counter()
-        logger.info(f"Total elapsed time: {end-start:0.4f} seconds")
+        logger.info(f"Total elapsed time: {end - start:0.4f} seconds")
 
 
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 from enum import Enum
+from pathlib import Path
 
 from pydantic import BaseModel
 
@@ -22,5 +23,9 @@ class BaseConfig(BaseModel):
 
     log_level: LogLevel = LogLevel.INFO
     timing: bool = False
+    trace: bool = False
+    metrics: bool = False
+    table_cache: bool = True
+    table_cache_dir: Path | None = None  # relative to the configuration file
     driver_type: DriverType
     driver: BaseModel
@@ -7,8 +7,11 @@ from pathlib import Path
 from typing import Any
 
 from loguru import logger
+from xmipy import XmiWrapper
 
 from imod_coupler.config import BaseConfig
+from imod_coupler.logging.run_metrics import RunMetrics
+from imod_coupler.logging.timing_registry import UPDATE_PHASE, TimingRegistry
 
 
 def resolve_path(libname: str) -> str:
@@ -37,15 +40,46 @@ class Driver(ABC):
     Inherit from this class when creating a new driver
     """
 
+    base_config: BaseConfig  # the parsed information from the configuration file
+    timing_registry: TimingRegistry  # the wall time spent per phase
+    run_metrics: RunMetrics | None  # the table of metrics per time step, if any
+    iterations: int  # the outer iterations of the last time step
+    converged: bool  # whether the last time step converged
+
+    def __init__(self, base_config: BaseConfig):
+        self.base_config = base_config
+        self.timing_registry = TimingRegistry(enabled=base_config.timing)
+        self.run_metrics = None
+        self.iterations = 0
+        self.converged = True
+
     def execute(self) -> None:
         """Execute the driver"""
 
         # This will initialize and couple the kernels
-        self.initialize()
+        with self.timing_registry.measure("initialize"):
+            self.initialize()
+        if self.timing_registry.tracer is not None:
+            for kernel in self.get_kernels().values():
+                self.timing_registry.tracer.trace_kernel(kernel)
+        if self.run_metrics is not None:
+            self.run_metrics.add_kernels(self.get_kernels())
 
         # Run the time loop
         while self.get_current_time() < self.get_end_time():
-            self.update()
+            start_time = self.get_current_time()
+            if self.run_metrics is not None:
+                self.run_metrics.start_time_step()
+            with self.timing_registry.measure(UPDATE_PHASE):
+                self.update()
+            if self.run_metrics is not None:
+                current_time = self.get_current_time()
+                self.run_metrics.end_time_step(
+                    current_time,
+                    current_time - start_time,
+                    self.iterations,
+                    self.converged,
+                )
 
         logger.info("New simulation terminated normally")
 
@@ -77,10 +111,16 @@ class Driver(ABC):
         ...
 
     @abstractmethod
-    def report_timing_totals(self) -> None:
-        """Report total time spent on coupling"""
+    def get_kernels(self) -> dict[str, XmiWrapper]:
+        """Return the initialized kernels by name"""
         ...
 
+    def report_timing_totals(self) -> None:
+        """Report the time spent per phase, in the kernels and in the coupler"""
+        for kernel_name, kernel in self.get_kernels().items():
+            self.timing_registry.add_kernel_timer(kernel_name, kernel.timer)
+        self.timing_registry.report()
+
 
 def get_driver(
     config_dict: dict[str, Any], config_dir: Path, base_config: BaseConfig
@@ -13,14 +13,18 @@ import numpy as np
 from loguru import logger
 from numpy.typing import NDArray
 from scipy.sparse import csr_matrix, dia_matrix
+from xmipy import XmiWrapper
 
 from imod_coupler.config import BaseConfig
 from imod_coupler.drivers.driver import Driver
 from imod_coupler.drivers.metamod.config import Coupling, MetaModConfig
-from imod_coupler.kernelwrappers.mf6_wrapper import Mf6Wrapper
+from imod_coupler.exchange_operator import ExchangeOperator
+from imod_coupler.io import check_bounds, load_table
+from imod_coupler.kernelwrappers.mf6_wrapper import Mf6RechargeArea, Mf6Wrapper
 from imod_coupler.kernelwrappers.msw_wrapper import MswWrapper
 from imod_coupler.logging.exchange_collector import ExchangeCollector
-from imod_coupler.utils import create_mapping
+from imod_coupler.logging.timing_registry import timed
+from imod_coupler.utils import SvatLookup, create_mapping
 
 
 class MetaMod(Driver):
@@ -52,17 +56,23 @@ class MetaMod(Driver):
 
     enable_sprinkling_groundwater: bool
     # dictionary with mapping tables for mod=>msw coupling
-    map_mod2msw: dict[str, csr_matrix] = {}
+    map_mod2msw: dict[str, csr_matrix]
     # dictionary with mapping tables for msw=>mod coupling
-    map_msw2mod: dict[str, csr_matrix] = {}
+    map_msw2mod: dict[str, csr_matrix]
     # dict. with mask arrays for mod=>msw coupling
-    mask_mod2msw: dict[str, NDArray[Any]] = {}
+    mask_mod2msw: dict[str, NDArray[Any]]
     # dict. with mask arrays for msw=>mod coupling
-    mask_msw2mod: dict[str, NDArray[Any]] = {}
+    mask_msw2mod: dict[str, NDArray[Any]]
+    # dict. with in-place exchange operators for mod=>msw coupling
+    mod2msw_operators: dict[str, ExchangeOperator]
+    # dict. with in-place exchange operators for msw=>mod coupling
+    msw2mod_operators: dict[str, ExchangeOperator]
+    # the inverse cell area of the coupled recharge cells
+    recharge_area: Mf6RechargeArea
 
     def __init__(self, base_config: BaseConfig, metamod_config: MetaModConfig):
         """Constructs the `MetaMod` object"""
-        self.base_config = base_config
+        super().__init__(base_config)
         self.metamod_config = metamod_config
         self.coupling = metamod_config.coupling[
             0
@@ -92,6 +102,7 @@ class MetaMod(Driver):
             )
         else:
             self.exchange_logger = ExchangeCollector()
+        self.exchange_logger.timing_registry = self.timing_registry
         self.couple()
 
     def log_version(self) -> None:
@@ -116,30 +127,24 @@ class MetaMod(Driver):
         self.msw_volume = self.msw.get_volume_ptr()
         self.msw_storage = self.msw.get_storage_ptr()
 
-        # create a lookup, with the svat tuples (id, lay) as keys and the
-        # metaswap internal indexes as values
-        svat_lookup = {}
-        msw_mod2svat_file = self.msw.working_directory / "mod2svat.inp"
-        if msw_mod2svat_file.is_file():
-            svat_data: NDArray[np.int32] = np.loadtxt(
-                msw_mod2svat_file, dtype=np.int32, ndmin=2
-            )
-            svat_id = svat_data[:, 1]
-            svat_lay = svat_data[:, 2]
-            for vi in range(svat_id.size):
-                svat_lookup[(svat_id[vi], svat_lay[vi])] = vi
-        else:
-            raise ValueError(f"Can't find {msw_mod2svat_file}.")
+        self.map_mod2msw = {}
+        self.map_msw2mod = {}
+        self.mask_mod2msw = {}
+        self.mask_msw2mod = {}
+
+        # create a lookup of the metaswap internal indexes of the svat
+        # tuples (id, lay)
+        svat_lookup = SvatLookup.from_file(self.msw.working_directory / "mod2svat.inp")
 
         # create mappings
-        table_node2svat: NDArray[np.int32] = np.loadtxt(
-            self.coupling.mf6_msw_node_map, dtype=np.int32, ndmin=2
+        table_node2svat: NDArray[np.int32] = load_table(
+            self.coupling.mf6_msw_node_map, ncol=3
         )
         node_idx = table_node2svat[:, 0] - 1
-        msw_idx = [
-            svat_lookup[table_node2svat[ii, 1], table_node2svat[ii, 2]]
-            for ii in range(len(table_node2svat))
-        ]
+        check_bounds(
+            node_idx, self.mf6_storage.size, "node", self.coupling.mf6_msw_node_map
+        )
+        msw_idx = svat_lookup.indices(table_node2svat[:, 1], table_node2svat[:, 2])
 
         self.map_msw2mod["storage"], self.mask_msw2mod["storage"] = create_mapping(
             msw_idx,
@@ -173,14 +178,17 @@ class MetaMod(Driver):
             "avg",
         )
 
-        table_rch2svat: NDArray[np.int32] = np.loadtxt(
-            self.coupling.mf6_msw_recharge_map, dtype=np.int32, ndmin=2
+        table_rch2svat: NDArray[np.int32] = load_table(
+            self.coupling.mf6_msw_recharge_map, ncol=3
         )
         rch_idx = table_rch2svat[:, 0] - 1
-        msw_idx = [
-            svat_lookup[table_rch2svat[ii, 1], table_rch2svat[ii, 2]]
-            for ii in range(len(table_rch2svat))
-        ]
+        check_bounds(
+            rch_idx,
+            self.mf6_recharge.size,
+            "recharge index",
+            self.coupling.mf6_msw_recharge_map,
+        )
+        msw_idx = svat_lookup.indices(table_rch2svat[:, 1], table_rch2svat[:, 2])
 
         self.map_msw2mod["recharge"], self.mask_msw2mod["recharge"] = create_mapping(
             msw_idx,
@@ -199,16 +207,17 @@ class MetaMod(Driver):
             self.mf6_sprinkling_wells = self.mf6.get_well(
                 self.coupling.mf6_model, self.coupling.mf6_msw_well_pkg
             )
-            table_well2svat: NDArray[np.int32] = np.loadtxt(
-                self.coupling.mf6_msw_sprinkling_map_groundwater,
-                dtype=np.int32,
-                ndmin=2,
+            table_well2svat: NDArray[np.int32] = load_table(
+                self.coupling.mf6_msw_sprinkling_map_groundwater, ncol=3
             )
             well_idx = table_well2svat[:, 0] - 1
-            msw_idx = [
-                svat_lookup[table_well2svat[ii, 1], table_well2svat[ii, 2]]
-                for ii in range(len(table_well2svat))
-            ]
+            check_bounds(
+                well_idx,
+                self.mf6_sprinkling_wells.size,
+                "well index",
+                self.coupling.mf6_msw_sprinkling_map_groundwater,
+            )
+            msw_idx = svat_lookup.indices(table_well2svat[:, 1], table_well2svat[:, 2])
 
             (
                 self.map_msw2mod["sprinkling"],
@@ -223,6 +232,21 @@ class MetaMod(Driver):
         else:
             self.enable_sprinkling_groundwater = False
 
+        self.mod2msw_operators = {
+            key: ExchangeOperator(mapping, self.mask_mod2msw[key])
+            for key, mapping in self.map_mod2msw.items()
+        }
+        self.msw2mod_operators = {
+            key: ExchangeOperator(mapping, self.mask_msw2mod[key])
+            for key, mapping in self.map_msw2mod.items()
+        }
+        self.recharge_area = Mf6RechargeArea(
+            self.mf6,
+            self.coupling.mf6_model,
+            self.coupling.mf6_msw_recharge_pkg,
+            self.msw2mod_operators["recharge"].rows,
+        )
+
     def update(self) -> None:
         # heads to MetaSWAP
         self.exchange_mod2msw()
@@ -236,15 +260,21 @@ class MetaMod(Driver):
 
         # convergence loop
         self.mf6.prepare_solve(1)
+        has_converged = False
         for kiter in range(1, self.max_iter + 1):
+            self.exchange_logger.iteration = kiter
+            self.iterations = kiter
             has_converged = self.do_iter(1)
             if has_converged:
                 logger.debug(f"MF6-MSW converged in {kiter} iterations")
                 break
+        self.exchange_logger.iteration = None
+        self.converged = has_converged
         self.mf6.finalize_solve(1)
 
         self.mf6.finalize_time_step()
         self.msw.finalize_time_step()
+        self.exchange_logger.end_time_step(has_converged)
 
     def finalize(self) -> None:
         self.mf6.finalize()
@@ -257,12 +287,10 @@ class MetaMod(Driver):
     def get_end_time(self) -> float:
         return self.mf6.get_end_time()
 
+    @timed("exchange_msw2mod")
     def exchange_msw2mod(self) -> None:
         """Exchange Metaswap to Modflow"""
-        self.mf6_storage[:] = (
-            self.mask_msw2mod["storage"][:] * self.mf6_storage[:]
-            + self.map_msw2mod["storage"].dot(self.msw_storage)[:]
-        )
+        self.msw2mod_operators["storage"].exchange(self.msw_storage, self.mf6_storage)
         self.exchange_logger.log_exchange(
             "mf6_storage", self.mf6_storage, self.get_current_time()
         )
@@ -271,28 +299,25 @@ class MetaMod(Driver):
         )
 
         # Set recharge
-        nodelist_address = self.mf6.get_var_address(
-            "NODELIST", self.coupling.mf6_model, self.coupling.mf6_msw_recharge_pkg
+        # MODFLOW needs the recharge as a flux per area
+        self.msw2mod_operators["recharge"].exchange(
+            self.msw_volume,
+            self.mf6_recharge,
+            1.0 / self.delt,
+            self.recharge_area.get_inverse_area(),
         )
-        nodelist = self.mf6.get_value_ptr(nodelist_address)
-        self.mf6_recharge[:] = (
-            self.mask_msw2mod["recharge"][:] * self.mf6_recharge[:]
-            + self.map_msw2mod["recharge"].dot(self.msw_volume)[:] / self.delt
-        ) / self.mf6_area[nodelist - 1]
 
         if self.enable_sprinkling_groundwater:
-            self.mf6_sprinkling_wells[:] = (
-                self.mask_msw2mod["sprinkling"][:] * self.mf6_sprinkling_wells[:]
-                + self.map_msw2mod["sprinkling"].dot(self.msw_volume)[:] / self.delt
+            self.msw2mod_operators["sprinkling"].exchange(
+                self.msw_volume, self.mf6_sprinkling_wells, 1.0 / self.delt
             )
 
+    @timed("exchange_mod2msw")
     def exchange_mod2msw(self) -> None:
         """Exchange Modflow to Metaswap"""
-        self.msw_head[:] = (
-            self.mask_mod2msw["head"][:] * self.msw_head[:]
-            + self.map_mod2msw["head"].dot(self.mf6_head)[:]
-        )
+        self.mod2msw_operators["head"].exchange(self.mf6_head, self.msw_head)
 
+    @timed("outer_iteration")
     def do_iter(self, sol_id: int) -> bool:
         """Execute a single iteration"""
         self.msw.prepare_solve(0)
@@ -303,8 +328,5 @@ class MetaMod(Driver):
         self.msw.finalize_solve(0)
         return has_converged
 
-    def report_timing_totals(self) -> None:
-        total_mf6 = self.mf6.report_timing_totals()
-        total_msw = self.msw.report_timing_totals()
-        total = total_mf6 + total_msw
-        logger.info(f"Total elapsed time in numerical kernels: {total:0.4f} seconds")
+    def get_kernels(self) -> dict[str, XmiWrapper]:
+        return {"modflow6": self.mf6, "metaswap": self.msw}
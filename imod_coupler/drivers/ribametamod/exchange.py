@@ -1,23 +1,108 @@
 from collections import ChainMap
+from collections.abc import Iterable, Iterator, Mapping
 from typing import Any
 
 import numpy as np
 from numpy.typing import NDArray
 
 from imod_coupler.drivers.ribametamod.mapping import SetMapping
+from imod_coupler.io import check_bounds
 from imod_coupler.kernelwrappers.mf6_wrapper import (
     Mf6Api,
+    Mf6BoundaryGroup,
     Mf6Drainage,
     Mf6River,
 )
 from imod_coupler.logging.exchange_collector import ExchangeCollector
 
 
+class LabelArrays(Mapping[str, NDArray[np.float64]]):
+    """
+    Arrays of the same size by label, stored as the rows of a single 2-D array,
+    together with their total.
+
+    The arrays, the 2-D array and the total are read-only views. They are
+    only written by the methods of this class, which keep the total up to
+    date, so that reading the total doesn't sum the rows. Unknown labels
+    raise a KeyError.
+
+    Parameters
+    ----------
+    labels : list[str]
+        The labels, in the order of the rows
+    shape : int
+        The size of every array
+    """
+
+    index: dict[str, int]  # the row of every label
+    array: NDArray[np.float64]  # labels x shape, read-only
+    total: NDArray[np.float64]  # the sum of the rows, read-only
+
+    def __init__(self, labels: list[str], shape: int) -> None:
+        self.index = {label: row for row, label in enumerate(labels)}
+        self._array = np.zeros((len(self.index), shape), dtype=np.float64)
+        self._total = np.zeros(shape, dtype=np.float64)
+        self._scratch = np.zeros(shape, dtype=np.float64)
+        self.array = self._array.view()
+        self.array.flags.writeable = False
+        self.total = self._total.view()
+        self.total.flags.writeable = False
+
+    def __getitem__(self, label: str) -> NDArray[np.float64]:
+        row: NDArray[np.float64] = self.array[self.index[label]]
+        return row
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __setitem__(self, label: str, values: NDArray[np.float64] | float) -> None:
+        """Sets the array of a label, updating the total by the difference"""
+        row = self._array[self.index[label]]
+        np.subtract(values, row, out=self._scratch)
+        self._total += self._scratch
+        row[:] = values
+
+    def add(self, label: str, values: NDArray[np.float64] | float) -> None:
+        """Adds values to the array of a label, and to the total"""
+        self._array[self.index[label]] += values
+        self._total += values
+
+    def set_rows(
+        self, rows: slice | NDArray[np.intp], values: NDArray[np.float64]
+    ) -> None:
+        """Sets the given rows of the 2-D array, e.g. the rows of `rows`"""
+        self._array[rows] = values
+        np.sum(self._array, axis=0, out=self._total)
+
+    def set_product(
+        self, array: NDArray[np.float64], factor: NDArray[np.float64]
+    ) -> None:
+        """Sets all rows to the product of a 2-D array and a factor per column"""
+        np.multiply(array, factor, out=self._array)
+        np.sum(self._array, axis=0, out=self._total)
+
+    def fill(self, value: float) -> None:
+        self._array.fill(value)
+        self._total.fill(value * len(self.index))
+
+    def rows(self, labels: Iterable[str]) -> slice | NDArray[np.intp]:
+        """Returns the rows of the labels, as a slice when they are consecutive"""
+        rows = np.array([self.index[label] for label in labels], dtype=np.intp)
+        if rows.size == 0:
+            return slice(0, 0)
+        if np.all(np.diff(rows) == 1):
+            return slice(int(rows[0]), int(rows[-1]) + 1)
+        return rows
+
+
 class ExchangeBalance:
-    demands: dict[str, NDArray[np.float64]]
-    demands_negative: dict[str, NDArray[np.float64]]
+    demands: LabelArrays
+    demands_negative: LabelArrays
     demands_mf6: dict[str, NDArray[np.float64]]
-    realised_negative: dict[str, NDArray[np.float64]]
+    realised_negative: LabelArrays
     shape: int
     sum_keys: list[str]
 
@@ -30,36 +115,42 @@ class ExchangeBalance:
         """
         This function computes the realised (negative) volumes
         """
-        shortage = self.demand - realised_volume
+        demand = self.demand
         demand_negative = self.demand_negative
+        shortage = np.subtract(demand, realised_volume, out=self._shortage)
         self._check_valid_shortage(
-            shortage
+            shortage, demand, demand_negative
         )  # use a numpy isclose to set the max non-zero value
         # deal with zero division
-        realised_fraction = np.where(
-            demand_negative < 0.0, 1.0 - (shortage / demand_negative), 1.0
+        realised_fraction = self._realised_fraction
+        realised_fraction.fill(1.0)
+        negative = demand_negative < 0.0
+        np.divide(shortage, demand_negative, out=realised_fraction, where=negative)
+        np.subtract(1.0, realised_fraction, out=realised_fraction, where=negative)
+        self.realised_negative.set_product(
+            self.demands_negative.array, realised_fraction
         )
-        for volume_label in self.volume_labels:
-            self.realised_negative[volume_label] = (
-                self.demands_negative[volume_label] * realised_fraction
-            )
 
     def reset(self) -> None:
         """
         function sets all arrays to zero
         """
-        for volume_label in self.volume_labels:
-            self.demands[volume_label][:] = 0.0
-            self.demands_negative[volume_label][:] = 0.0
-            self.realised_negative[volume_label][:] = 0.0
+        self.demands.fill(0.0)
+        self.demands_negative.fill(0.0)
+        self.realised_negative.fill(0.0)
 
-    def _check_valid_shortage(self, shortage: NDArray[np.float64]) -> None:
+    def _check_valid_shortage(
+        self,
+        shortage: NDArray[np.float64],
+        demand: NDArray[np.float64],
+        demand_negative: NDArray[np.float64],
+    ) -> None:
         eps: float = 1.0e-04
-        if np.any(np.logical_and(self.demand > 0.0, np.absolute(shortage) > eps)):
+        if np.any(np.logical_and(demand > 0.0, np.absolute(shortage) > eps)):
             raise ValueError(
                 "Invalid realised volumes: found shortage for positive demand"
             )
-        if np.any(shortage < self.demand_negative - eps):
+        if np.any(shortage < demand_negative - eps):
             raise ValueError(
                 "Invalid realised volumes: found shortage larger than negative demand contributions"
             )
@@ -68,37 +159,40 @@ class ExchangeBalance:
         return np.zeros(shape=self.shape, dtype=np.float64)
 
     def _init_arrays(self) -> None:
-        self.demands = {}
+        self.demands = LabelArrays(self.volume_labels, self.shape)
         self.demands_mf6 = {}
-        self.demands_negative = {}
-        self.realised_negative = {}
-        for volume_label in self.volume_labels:
-            self.demands[volume_label] = self._zeros_array()
-            self.demands_negative[volume_label] = self._zeros_array()
-            self.realised_negative[volume_label] = self._zeros_array()
+        self.demands_negative = LabelArrays(self.volume_labels, self.shape)
+        self.realised_negative = LabelArrays(self.volume_labels, self.shape)
+        # scratch arrays, reused over time steps
+        self._shortage = self._zeros_array()
+        self._realised_fraction = self._zeros_array()
 
     @property
-    def demand_negative(self) -> Any:
+    def demand_negative(self) -> NDArray[np.float64]:
         """
-        compute negative demand as sum of demands arrays
+        negative demand as sum of demands arrays
+
+        The read-only total of `demands_negative`, kept up to date when the
+        demands are set.
         """
-        sum_array = np.stack(list(self.demands_negative.values()))
-        return sum_array.sum(axis=0)
+        return self.demands_negative.total
 
     @property
-    def demand(self) -> Any:
+    def demand(self) -> NDArray[np.float64]:
         """
-        compute demand as sum of demands arrays
+        demand as sum of demands arrays
+
+        The read-only total of `demands`, kept up to date when the demands are
+        set.
         """
-        sum_array = np.stack(list(self.demands.values()))
-        return sum_array.sum(axis=0)
+        return self.demands.total
 
 
 class CoupledExchangeBalance(ExchangeBalance):
-    demands: dict[str, NDArray[np.float64]]
+    demands: LabelArrays
     demands_mf6: dict[str, NDArray[np.float64]]
-    demands_negative: dict[str, NDArray[np.float64]]
-    realised_negative: dict[str, NDArray[np.float64]]
+    demands_negative: LabelArrays
+    realised_negative: LabelArrays
     shape: int
     sum_keys: list[str]
     exchange_logger: ExchangeCollector
@@ -119,11 +213,34 @@ class CoupledExchangeBalance(ExchangeBalance):
         self.mf6_river_packages = mf6_river_packages
         self.mf6_active_river_api_packages = mf6_active_river_api_packages
         self.mf6_drainage_packages = mf6_drainage_packages
+        # the stress period the nodelist of every API package was updated in
+        self.api_nodelist_periods: dict[str, int] = {}
         self.mapping = mapping
         self.ribasim_infiltration = ribasim_infiltration
         self.ribasim_drainage = ribasim_drainage
         self.exchange_logger = exchange_logger
         self.exchanged_ponding_per_dtsw = np.zeros_like(self.demand)
+        # all river and all drainage packages stacked, with their stacked mod2rib mapping
+        self.mf6_river_group = Mf6BoundaryGroup(mf6_river_packages)
+        self.mf6_drainage_group = Mf6BoundaryGroup(mf6_drainage_packages)
+        self.river_mod2rib = self.mf6_river_group.stack_mapping(mapping.map_mod2rib)
+        self.drainage_mod2rib = self.mf6_drainage_group.stack_mapping(
+            mapping.map_mod2rib
+        )
+        # the MODFLOW 6 demands of every river package, copied from the flux
+        # estimate of the group, which the next estimate overwrites
+        self.demands_mf6 = {
+            key: np.zeros(bounds.stop - bounds.start, dtype=np.float64)
+            for key, bounds in self.mf6_river_group.slices.items()
+        }
+        # the rows of the packages in the demand arrays
+        self.river_rows = self.demands.rows(self.mf6_river_group.slices)
+        self.drainage_rows = self.demands.rows(self.mf6_drainage_group.slices)
+        self._demand_flux = self._zeros_array()
+        self._ponding_flux = self._zeros_array()
+        self._coupled_flux = np.zeros(mapping.coupled_basins.size, dtype=np.float64)
+        # flux_to_ribasim gathers the coupled basins without bounds checks
+        check_bounds(mapping.coupled_basins, shape, "basin", "the coupled basins")
 
     def update_api_packages(self) -> None:
         """
@@ -135,17 +252,19 @@ class CoupledExchangeBalance(ExchangeBalance):
         this is done automatically by reading in period data
 
         The update of the nbound and nodelist should be done after every timestep where new input is
-        read in the riv package.
+        read in the riv package. Therefore, they are only copied when MODFLOW 6 started a new
+        stress period since the last update.
 
         """
         for key in self.mf6_active_river_api_packages.keys():
             self.mf6_active_river_api_packages[key].hcof[:] = 0.0
-            self.mf6_active_river_api_packages[key].nodelist[:] = (
-                self.mf6_river_packages[key].nodelist[:]
-            )
-            self.mf6_active_river_api_packages[key].nbound[:] = self.mf6_river_packages[
-                key
-            ].nbound[:]
+            river = self.mf6_river_packages[key]
+            stress_period = river.mf6_wrapper.stress_period
+            if self.api_nodelist_periods.get(key) == stress_period:
+                continue
+            self.mf6_active_river_api_packages[key].nodelist[:] = river.nodelist[:]
+            self.mf6_active_river_api_packages[key].nbound[:] = river.nbound[:]
+            self.api_nodelist_periods[key] = stress_period
 
     def reset(self) -> None:
         self.ribasim_infiltration[:] = 0.0
@@ -158,41 +277,55 @@ class CoupledExchangeBalance(ExchangeBalance):
     def add_flux_estimate_mod(
         self, mf6_head: NDArray[np.float64], delt_gw: float
     ) -> None:
-        # Compute MODFLOW 6 river and drain flux extimates
-        for key, river in self.mf6_river_packages.items():
-            # Swap sign since a negative RIV flux means a positive contribution to Ribasim
-            # Flux estimation is always in m3/d; add to demands as volume per delt_gw
-            river_flux = -river.get_flux_estimate(mf6_head) * delt_gw
-            river_flux_negative = np.where(river_flux < 0, river_flux, 0)
-            self.demands_mf6[key] = river_flux[:]
-            self.demands[key] = self.mapping.map_mod2rib[key].dot(self.demands_mf6[key])
-            self.demands_negative[key] = self.mapping.map_mod2rib[key].dot(
-                river_flux_negative
-            )
-        for key, drainage in self.mf6_drainage_packages.items():
-            # Swap sign since a negative RIV flux means a positive contribution to Ribasim
-            drain_flux = -drainage.get_flux_estimate(mf6_head) * delt_gw
-            self.demands[key] = self.mapping.map_mod2rib[key].dot(drain_flux)
+        # Compute MODFLOW 6 river and drain flux extimates of all packages at once
+        # Swap sign since a negative RIV flux means a positive contribution to Ribasim
+        # Flux estimation is always in m3/d; add to demands as volume per delt_gw
+        river_flux = self.mf6_river_group.get_flux_estimate(mf6_head)
+        river_flux *= -delt_gw
+        n_river = len(self.mf6_river_group)
+        demands = self.river_mod2rib.dot(river_flux).reshape(n_river, self.shape)
+        demands_negative = self.river_mod2rib.dot(np.minimum(river_flux, 0.0))
+        self.demands.set_rows(self.river_rows, demands)
+        self.demands_negative.set_rows(
+            self.river_rows, demands_negative.reshape(n_river, self.shape)
+        )
+        for key, bounds in self.mf6_river_group.slices.items():
+            np.copyto(self.demands_mf6[key], river_flux[bounds])
+
+        # Swap sign since a negative DRN flux means a positive contribution to Ribasim
+        drain_flux = self.mf6_drainage_group.get_flux_estimate(mf6_head)
+        drain_flux *= -delt_gw
+        demands = self.drainage_mod2rib.dot(drain_flux).reshape(
+            len(self.mf6_drainage_group), self.shape
+        )
+        self.demands.set_rows(self.drainage_rows, demands)
 
     def add_ponding_volume_msw(self, allocated_volume: NDArray[np.float64]) -> None:
         if self.mapping.msw2rib is not None:
             # sw_ponding volumes are accumulated over the delt_gw timestep,
             # resulting in a total volume per delt_gw
             if "sw_ponding" in self.mapping.msw2rib:
-                self.demands["sw_ponding"] += self.mapping.msw2rib["sw_ponding"].dot(
-                    allocated_volume
-                )[:]
+                self.demands.add(
+                    "sw_ponding",
+                    self.mapping.msw2rib["sw_ponding"].dot(allocated_volume),
+                )
 
     def flux_to_ribasim(self, delt_gw: float, delt_sw: float) -> None:
         demand_per_subtimestep = self.get_demand_flux_sec(delt_gw, delt_sw)
 
         # exchange to Ribasim; negative demand in exchange class means infiltration from Ribasim
-        self.ribasim_infiltration[self.mapping.coupled_index] = np.where(
-            demand_per_subtimestep < 0, -demand_per_subtimestep, 0
-        )[self.mapping.coupled_index]
-        self.ribasim_drainage[self.mapping.coupled_index] = np.where(
-            demand_per_subtimestep > 0, demand_per_subtimestep, 0
-        )[self.mapping.coupled_index]
+        # only the coupled basins are evaluated and set
+        coupled_basins = self.mapping.coupled_basins
+        flux = self._coupled_flux
+        # the basins are checked; unlike the default mode="raise", mode="wrap"
+        # doesn't make np.take buffer the output
+        np.take(demand_per_subtimestep, coupled_basins, out=flux, mode="wrap")
+        np.maximum(flux, 0.0, out=flux)
+        self.ribasim_drainage[coupled_basins] = flux
+        np.take(demand_per_subtimestep, coupled_basins, out=flux, mode="wrap")
+        np.minimum(flux, 0.0, out=flux)
+        np.negative(flux, out=flux)
+        self.ribasim_infiltration[coupled_basins] = flux
 
     def flux_to_modflow(
         self, realised_volume: NDArray[np.float64], delt_gw: float
@@ -213,20 +346,28 @@ class CoupledExchangeBalance(ExchangeBalance):
                 np.minimum(self.demands_mf6[key] / delt_gw, 0.0)
             ) * (1 - self.mapping.map_rib2mod_flux[key].dot(realised_fraction))
 
-    def get_demand_flux_sec(self, delt_gw: float, delt_sw: float) -> Any:
-        # returns the MODFLOW6 demands and MetaSWAP demands as a flux in m3/s
-        mf6_labels = list(self.demands.keys())
-        mf6_labels.remove("sw_ponding")
-        demands = {key: self.demands[key] for key in mf6_labels}
-        mf6_demand_flux = np.stack(list(demands.values())).sum(axis=0) / delt_gw
-        msw_demand_flux = (
-            self.demands["sw_ponding"] - self.exchanged_ponding_per_dtsw
-        ) / delt_sw
-
-        # update the ponding demand volume exchanged to Ribasim.
-        self.exchanged_ponding_per_dtsw[:] = self.demands["sw_ponding"][:]
-
-        return (mf6_demand_flux + msw_demand_flux) / day_to_seconds
+    def get_demand_flux_sec(
+        self, delt_gw: float, delt_sw: float
+    ) -> NDArray[np.float64]:
+        # returns the MODFLOW6 demands and MetaSWAP demands as a flux in m3/s,
+        # in an array that is reused
+        demand_flux = self._demand_flux
+        np.copyto(demand_flux, self.demand)
+        if "sw_ponding" in self.demands:
+            # the MODFLOW 6 demands are the total without the ponding demand
+            demand_flux -= self.demands["sw_ponding"]
+        demand_flux /= delt_gw
+        if "sw_ponding" in self.demands:
+            ponding = self.demands["sw_ponding"]
+            msw_demand_flux = np.subtract(
+                ponding, self.exchanged_ponding_per_dtsw, out=self._ponding_flux
+            )
+            msw_demand_flux /= delt_sw
+            demand_flux += msw_demand_flux
+            # update the ponding demand volume exchanged to Ribasim.
+            self.exchanged_ponding_per_dtsw[:] = ponding
+        demand_flux /= day_to_seconds
+        return demand_flux
 
     def log_demands(self, current_time: float) -> None:
         for key, array in self.demands.items():
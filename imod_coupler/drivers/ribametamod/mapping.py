@@ -7,7 +7,9 @@ from numpy.typing import NDArray
 from scipy.sparse import csr_matrix, dia_matrix
 
 from imod_coupler.drivers.ribametamod.config import Coupling
-from imod_coupler.utils import create_mapping
+from imod_coupler.exchange_operator import ExchangeOperator
+from imod_coupler.io import check_bounds, load_table
+from imod_coupler.utils import SvatLookup, create_mapping
 
 
 class SetMapping:
@@ -15,11 +17,16 @@ class SetMapping:
     map_mod2rib: dict[str, csr_matrix]
     map_rib2mod_stage: dict[str, csr_matrix]
     map_rib2mod_flux: dict[str, csr_matrix]
-    mask_rib2mod: dict[str, csr_matrix]
+    mask_rib2mod: dict[str, NDArray[np.int8]]
     msw2mod: dict[str, csr_matrix]
     mod2msw: dict[str, csr_matrix]
+    rib2mod_stage_operators: dict[str, ExchangeOperator]
+    msw2mod_operators: dict[str, ExchangeOperator]
+    mod2msw_operators: dict[str, ExchangeOperator]
     msw2rib: dict[str, csr_matrix]
     coupled_mod2rib: NDArray[np.bool_]
+    coupled_index: NDArray[np.bool_]
+    coupled_basins: NDArray[np.intp]
 
     def __init__(
         self,
@@ -38,6 +45,9 @@ class SetMapping:
         if has_ribasim and has_metaswap and mod2svat is not None:
             self.set_metaswap_ribasim_mapping(packages, mod2svat)
             self.coupled_index |= self.coupled_msw2rib
+        if has_ribasim:
+            # the indices of the basins coupled to MODFLOW 6 or MetaSWAP
+            self.coupled_basins = np.flatnonzero(self.coupled_index)
 
     def set_ribasim_modflow_mapping(self, packages: ChainMap[str, Any]) -> None:
         self.map_mod2rib = {}
@@ -45,14 +55,20 @@ class SetMapping:
         self.map_rib2mod_stage = {}
         self.map_rib2mod_flux = {}
         self.mask_rib2mod = {}
+        self.rib2mod_stage_operators = {}
         active_tables = ChainMap(
             self.coupling.mf6_active_river_packages,
             self.coupling.mf6_active_drainage_packages,
         )
         for key, path in active_tables.items():
-            table = np.loadtxt(path, delimiter="\t", dtype=int, skiprows=1, ndmin=2)
+            table = load_table(path, ncol=3, header=True)
             package = packages[key]
             basin_index, bound_index, subgrid_index = table.T
+            check_bounds(basin_index, packages["ribasim_nbasin"], "basin_index", path)
+            check_bounds(bound_index, package.n_bound, "bound_index", path)
+            check_bounds(
+                subgrid_index, packages["ribasim_nsubgrid"], "subgrid_index", path
+            )
             data = np.ones_like(basin_index, dtype=np.float64)
 
             mod2rib = csr_matrix(
@@ -80,7 +96,10 @@ class SetMapping:
                 mod2rib.T
             )  # for mapping fluxes between basins and riv nodes
 
-            self.mask_rib2mod[key] = (rib2mod.getnnz(axis=1) == 0).astype(int)
+            self.mask_rib2mod[key] = (np.diff(rib2mod.indptr) == 0).astype(np.int8)
+            self.rib2mod_stage_operators[key] = ExchangeOperator(
+                rib2mod, self.mask_rib2mod[key]
+            )
             # In-place bitwise or
             self.coupled_mod2rib |= mod2rib.getnnz(axis=1) > 0
 
@@ -89,9 +108,11 @@ class SetMapping:
             self.coupling.mf6_passive_drainage_packages,
         )
         for key, path in passive_tables.items():
-            table = np.loadtxt(path, delimiter="\t", dtype=int, skiprows=1, ndmin=2)
+            table = load_table(path, ncol=2, header=True)
             package = packages[key]
             basin_index, bound_index = table.T
+            check_bounds(basin_index, packages["ribasim_nbasin"], "basin_index", path)
+            check_bounds(bound_index, package.n_bound, "bound_index", path)
             data = np.ones_like(basin_index, dtype=np.float64)
             mod2rib = csr_matrix(
                 (data, (basin_index, bound_index)),
@@ -109,19 +130,22 @@ class SetMapping:
         if self.coupling.mf6_msw_recharge_map is None:
             return
 
-        svat_lookup = set_svat_lookup(mod2svat)
+        svat_lookup = SvatLookup.from_file(mod2svat)
 
         self.mod2msw = {}
         self.msw2mod = {}
 
-        table_node2svat: NDArray[np.int32] = np.loadtxt(
-            self.coupling.mf6_msw_node_map, dtype=np.int32, ndmin=2
+        table_node2svat: NDArray[np.int32] = load_table(
+            self.coupling.mf6_msw_node_map, ncol=3
         )
         node_idx = table_node2svat[:, 0] - 1
-        msw_idx = [
-            svat_lookup[table_node2svat[ii, 1], table_node2svat[ii, 2]]
-            for ii in range(len(table_node2svat))
-        ]
+        check_bounds(
+            node_idx,
+            packages["mf6_storage"].size,
+            "node",
+            self.coupling.mf6_msw_node_map,
+        )
+        msw_idx = svat_lookup.indices(table_node2svat[:, 1], table_node2svat[:, 2])
         self.msw2mod["storage"], self.msw2mod["storage_mask"] = create_mapping(
             msw_idx,
             node_idx,
@@ -154,14 +178,17 @@ class SetMapping:
             packages["msw_head"].size,
             "avg",
         )
-        table_rch2svat: NDArray[np.int32] = np.loadtxt(
-            self.coupling.mf6_msw_recharge_map, dtype=np.int32, ndmin=2
+        table_rch2svat: NDArray[np.int32] = load_table(
+            self.coupling.mf6_msw_recharge_map, ncol=3
         )
         rch_idx = table_rch2svat[:, 0] - 1
-        msw_idx = [
-            svat_lookup[table_rch2svat[ii, 1], table_rch2svat[ii, 2]]
-            for ii in range(len(table_rch2svat))
-        ]
+        check_bounds(
+            rch_idx,
+            packages["mf6_recharge"].size,
+            "recharge index",
+            self.coupling.mf6_msw_recharge_map,
+        )
+        msw_idx = svat_lookup.indices(table_rch2svat[:, 1], table_rch2svat[:, 2])
 
         self.msw2mod["recharge"], self.msw2mod["recharge_mask"] = create_mapping(
             msw_idx,
@@ -170,22 +197,34 @@ class SetMapping:
             packages["mf6_recharge"].size,
             "sum",
         )
+        self.msw2mod_operators = {
+            "storage": ExchangeOperator(
+                self.msw2mod["storage"], self.msw2mod["storage_mask"]
+            ),
+            "recharge": ExchangeOperator(
+                self.msw2mod["recharge"], self.msw2mod["recharge_mask"]
+            ),
+        }
+        self.mod2msw_operators = {
+            "head": ExchangeOperator(self.mod2msw["head"], self.mod2msw["head_mask"])
+        }
 
         if self.coupling.mf6_msw_sprinkling_map_groundwater is not None:
             assert isinstance(self.coupling.mf6_msw_well_pkg, str)
             assert isinstance(self.coupling.mf6_msw_sprinkling_map_groundwater, Path)
 
             # in this case we have a sprinkling demand from MetaSWAP
-            table_well2svat: NDArray[np.int32] = np.loadtxt(
-                self.coupling.mf6_msw_sprinkling_map_groundwater,
-                dtype=np.int32,
-                ndmin=2,
+            table_well2svat: NDArray[np.int32] = load_table(
+                self.coupling.mf6_msw_sprinkling_map_groundwater, ncol=3
             )
             well_idx = table_well2svat[:, 0] - 1
-            msw_idx = [
-                svat_lookup[table_well2svat[ii, 1], table_well2svat[ii, 2]]
-                for ii in range(len(table_well2svat))
-            ]
+            check_bounds(
+                well_idx,
+                packages["mf6_sprinkling_wells"].size,
+                "well index",
+                self.coupling.mf6_msw_sprinkling_map_groundwater,
+            )
+            msw_idx = svat_lookup.indices(table_well2svat[:, 1], table_well2svat[:, 2])
 
             (
                 self.msw2mod["gw_sprinkling"],
@@ -197,6 +236,9 @@ class SetMapping:
                 packages["mf6_sprinkling_wells"].size,
                 "sum",
             )
+            self.msw2mod_operators["gw_sprinkling"] = ExchangeOperator(
+                self.msw2mod["gw_sprinkling"], self.msw2mod["gw_sprinkling_mask"]
+            )
 
     def set_metaswap_ribasim_mapping(
         self, packages: ChainMap[str, Any], mod2svat: Path
@@ -209,14 +251,23 @@ class SetMapping:
 
         # surface water ponding mapping
         if self.coupling.rib_msw_ponding_map_surface_water is not None:
-            table_node2svat = np.loadtxt(
-                self.coupling.rib_msw_ponding_map_surface_water,
-                dtype=np.int32,
-                skiprows=1,
-                ndmin=2,
+            table_node2svat = load_table(
+                self.coupling.rib_msw_ponding_map_surface_water, ncol=2, header=True
             )
             rib_idx = table_node2svat[:, 0]
             msw_idx = table_node2svat[:, 1] - 1
+            check_bounds(
+                rib_idx,
+                packages["ribasim_nbasin"],
+                "basin_index",
+                self.coupling.rib_msw_ponding_map_surface_water,
+            )
+            check_bounds(
+                msw_idx,
+                packages["ribmsw_nbound"],
+                "svat",
+                self.coupling.rib_msw_ponding_map_surface_water,
+            )
             (
                 self.msw2rib["sw_ponding"],
                 self.msw2rib["sw_ponding_mask"],
@@ -231,14 +282,25 @@ class SetMapping:
 
         # surface water sprinkling mapping
         if self.coupling.rib_msw_sprinkling_map_surface_water is not None:
-            table_node2svat = np.loadtxt(
+            table_node2svat = load_table(
                 self.coupling.rib_msw_sprinkling_map_surface_water,
-                dtype=np.int32,
-                skiprows=1,
-                ndmin=2,
+                ncol=2,
+                header=True,
             )
             rib_idx = table_node2svat[:, 0]
             msw_idx = table_node2svat[:, 1] - 1
+            check_bounds(
+                rib_idx,
+                packages["ribasim_nuser"],
+                "user_demand_index",
+                self.coupling.rib_msw_sprinkling_map_surface_water,
+            )
+            check_bounds(
+                msw_idx,
+                packages["ribmsw_nbound"],
+                "svat",
+                self.coupling.rib_msw_sprinkling_map_surface_water,
+            )
             (
                 self.msw2rib["sw_sprinkling"],
                 self.msw2rib["sw_sprinkling_mask"],
@@ -250,19 +312,3 @@ class SetMapping:
                 "sum",
             )
             # should become shape of 'users'-array in Ribasim
-
-
-def set_svat_lookup(mod2svat: Path) -> dict[Any, Any]:
-    svat_lookup = {}
-    msw_mod2svat_file = mod2svat
-    if msw_mod2svat_file.is_file():
-        svat_data: NDArray[np.int32] = np.loadtxt(
-            msw_mod2svat_file, dtype=np.int32, ndmin=2
-        )
-        svat_id = svat_data[:, 1]
-        svat_lay = svat_data[:, 2]
-        for vi in range(svat_id.size):
-            svat_lookup[(svat_id[vi], svat_lay[vi])] = vi
-    else:
-        raise ValueError(f"Can't find {msw_mod2svat_file}.")
-    return svat_lookup
@@ -14,6 +14,7 @@ import numpy as np
 from loguru import logger
 from numpy.typing import NDArray
 from ribasim_api import RibasimApi
+from xmipy import XmiWrapper
 
 from imod_coupler.config import BaseConfig
 from imod_coupler.drivers.driver import Driver
@@ -23,11 +24,13 @@ from imod_coupler.drivers.ribametamod.mapping import SetMapping
 from imod_coupler.kernelwrappers.mf6_wrapper import (
     Mf6Api,
     Mf6Drainage,
+    Mf6RechargeArea,
     Mf6River,
     Mf6Wrapper,
 )
 from imod_coupler.kernelwrappers.msw_wrapper import MswWrapper
 from imod_coupler.logging.exchange_collector import ExchangeCollector
+from imod_coupler.logging.timing_registry import timed
 
 
 class RibaMetaMod(Driver):
@@ -54,6 +57,7 @@ class RibaMetaMod(Driver):
     mf6_storage: NDArray[Any]  # the specific storage array (ss)
     mf6_has_sc1: bool  # when true, specific storage in mf6 is given as a storage coefficient (sc1)
     mf6_area: NDArray[Any]  # cell area (size:nodes)
+    recharge_area: Mf6RechargeArea  # the inverse cell area of the coupled recharge
     mf6_top: NDArray[Any]  # top of cell (size:nodes)
     mf6_bot: NDArray[Any]  # bottom of cell (size:nodes)
 
@@ -95,7 +99,7 @@ class RibaMetaMod(Driver):
 
     def __init__(self, base_config: BaseConfig, ribametamod_config: RibaMetaModConfig):
         """Constructs the `RibaMetaMod` object"""
-        self.base_config = base_config
+        super().__init__(base_config)
         self.ribametamod_config = ribametamod_config
         self.coupling = ribametamod_config.coupling[
             0
@@ -158,6 +162,7 @@ class RibaMetaMod(Driver):
             )
         else:
             self.exchange_logger = ExchangeCollector()
+        self.exchange_logger.timing_registry = self.timing_registry
         self.couple()
 
     def log_version(self) -> None:
@@ -261,6 +266,7 @@ class RibaMetaMod(Driver):
             arrays["msw_volume"] = self.msw_volume
             arrays["msw_storage"] = self.msw_storage
             arrays["mf6_recharge"] = self.mf6_recharge
+            arrays["mf6_recharge_nodes"] = self.mf6_recharge_nodes
             arrays["mf6_head"] = self.mf6_head
             arrays["mf6_storage"] = self.mf6_storage
             arrays["mf6_has_sc1"] = self.mf6_has_sc1
@@ -313,6 +319,13 @@ class RibaMetaMod(Driver):
                 else None
             ),
         )
+        if self.has_metaswap:
+            self.recharge_area = Mf6RechargeArea(
+                self.mf6,
+                self.coupling.mf6_model,
+                self.coupling.mf6_msw_recharge_pkg,
+                self.mapping.msw2mod_operators["recharge"].rows,
+            )
 
         if self.has_ribasim:
             if self.has_metaswap:
@@ -368,24 +381,28 @@ class RibaMetaMod(Driver):
         self.msw.prepare_time_step_noSW(self.delt_gw)
 
         for timestep_sw in range(1, int(nsubtimesteps) + 1):
-            self.msw.prepare_surface_water_time_step(timestep_sw)
-            self.exchange.add_ponding_volume_msw(self.msw_ponding_volume)
-            if self.enable_sprinkling_surface_water:
-                self.exchange_sprinkling_demand_msw2rib()
-            # exchange summed volumes to Ribasim
-            self.exchange.flux_to_ribasim(self.delt_gw, self.delt_sw)
-            # update Ribasim per delt_sw
-            self.current_time += self.delt_sw
-            self.ribasim.update_until(day_to_seconds * self.current_time)
-            # get realised values on wateruser nodes
-            if self.enable_sprinkling_surface_water:
-                self.exchange_sprinkling_flux_realised_msw2rib()
-            self.msw.finish_surface_water_time_step(timestep_sw)
+            with self.timing_registry.measure("surface_water_timestep"):
+                self.msw.prepare_surface_water_time_step(timestep_sw)
+                with self.timing_registry.measure("add_ponding_volume_msw"):
+                    self.exchange.add_ponding_volume_msw(self.msw_ponding_volume)
+                if self.enable_sprinkling_surface_water:
+                    self.exchange_sprinkling_demand_msw2rib()
+                # exchange summed volumes to Ribasim
+                with self.timing_registry.measure("flux_to_ribasim"):
+                    self.exchange.flux_to_ribasim(self.delt_gw, self.delt_sw)
+                # update Ribasim per delt_sw
+                self.current_time += self.delt_sw
+                self.ribasim.update_until(day_to_seconds * self.current_time)
+                # get realised values on wateruser nodes
+                if self.enable_sprinkling_surface_water:
+                    self.exchange_sprinkling_flux_realised_msw2rib()
+                self.msw.finish_surface_water_time_step(timestep_sw)
 
     def update_ribasim(self) -> None:
         # exchange summed volumes to Ribasim
         # no metaswap, delt_sw doesn't exist
-        self.exchange.flux_to_ribasim(self.delt_gw, self.delt_gw)
+        with self.timing_registry.measure("flux_to_ribasim"):
+            self.exchange.flux_to_ribasim(self.delt_gw, self.delt_gw)
         # update Ribasim per delt_gw
         self.ribasim.update_until(day_to_seconds * self.get_current_time())
 
@@ -406,48 +423,69 @@ class RibaMetaMod(Driver):
             else:
                 self.update_ribasim()
 
-            self.exchange.flux_to_modflow(
-                (self.ribasim_cumulative_drainage[:] - self.ribasim_drainage_save[:])
-                - (
-                    self.ribasim_cumulative_infiltration[:]
-                    - self.ribasim_infiltration_save[:]
-                ),
-                self.delt_gw,
-            )
+            with self.timing_registry.measure("flux_to_modflow"):
+                self.exchange.flux_to_modflow(
+                    (
+                        self.ribasim_cumulative_drainage[:]
+                        - self.ribasim_drainage_save[:]
+                    )
+                    - (
+                        self.ribasim_cumulative_infiltration[:]
+                        - self.ribasim_infiltration_save[:]
+                    ),
+                    self.delt_gw,
+                )
             self.exchange.log_demands(self.get_current_time())
 
         # do the MODFLOW-MetaSWAP timestep
         if self.has_metaswap:
-            self.solve_modflow6_metaswap()
+            has_converged = self.solve_modflow6_metaswap()
         else:
-            self.solve_modflow()
+            has_converged = self.solve_modflow()
         self.mf6.finalize_time_step()
         if self.has_metaswap:
             self.msw.finalize_time_step()
+        self.exchange_logger.end_time_step(has_converged)
 
-    def solve_modflow(self) -> None:
+    def solve_modflow(self) -> bool:
+        """Solve a MODFLOW 6 time step, returns whether it converged"""
         self.mf6.prepare_solve(1)
+        has_converged = False
         for kiter in range(1, self.max_iter + 1):
+            self.exchange_logger.iteration = kiter
+            self.iterations = kiter
             has_converged = self.do_modflow_iter(1)
             if has_converged:
                 logger.debug(f"MF6 converged in {kiter} iterations")
                 break
+        self.exchange_logger.iteration = None
+        self.converged = has_converged
         self.mf6.finalize_solve(1)
+        return has_converged
 
-    def solve_modflow6_metaswap(self) -> None:
+    def solve_modflow6_metaswap(self) -> bool:
+        """Solve a MODFLOW 6 - MetaSWAP time step, returns whether it converged"""
         self.mf6.prepare_solve(1)
+        has_converged = False
         for kiter in range(1, self.max_iter + 1):
+            self.exchange_logger.iteration = kiter
+            self.iterations = kiter
             has_converged = self.do_modflow6_metaswap_iter(1)
             if has_converged:
                 logger.debug(f"MF6-MSW converged in {kiter} iterations")
                 break
+        self.exchange_logger.iteration = None
+        self.converged = has_converged
         self.mf6.finalize_solve(1)
+        return has_converged
 
+    @timed("outer_iteration")
     def do_modflow_iter(self, sol_id: int) -> bool:
         """Execute a single iteration"""
         has_converged = self.mf6.solve(sol_id)
         return has_converged
 
+    @timed("outer_iteration")
     def do_modflow6_metaswap_iter(self, sol_id: int) -> bool:
         """Execute a single iteration"""
         self.msw.prepare_solve(0)
@@ -465,6 +503,7 @@ class RibaMetaMod(Driver):
             self.ribasim.shutdown_julia()
         self.exchange_logger.finalize()
 
+    @timed("exchange_rib2mod")
     def exchange_rib2mod(self) -> None:
         self.ribasim.update_subgrid_level()
         # zeros exchange-arrays, Ribasim pointers and API-packages
@@ -472,12 +511,14 @@ class RibaMetaMod(Driver):
         # exchange stage and compute flux estimates over MODFLOW 6 timestep
         self.exchange_stage_rib2mod()
 
+    @timed("exchange_mod2rib")
     def exchange_mod2rib(self) -> None:
         self.exchange.add_flux_estimate_mod(self.mf6_head, self.delt_gw)
         # reset Ribasim pointers
         self.ribasim_infiltration_save[:] = self.ribasim_cumulative_infiltration[:]
         self.ribasim_drainage_save[:] = self.ribasim_cumulative_drainage[:]
 
+    @timed("exchange_sprinkling_demand_msw2rib")
     def exchange_sprinkling_demand_msw2rib(self) -> None:
         # flux demand from metaswap sprinkling to Ribasim (demand)
         self.msw_sprinkling_demand_sec = (
@@ -498,6 +539,7 @@ class RibaMetaMod(Driver):
             self.current_time,
         )
 
+    @timed("exchange_sprinkling_flux_realised_msw2rib")
     def exchange_sprinkling_flux_realised_msw2rib(self) -> None:
         msw_sprinkling_realized = self.msw.get_surfacewater_sprinking_realised_ptr()
 
@@ -532,19 +574,20 @@ class RibaMetaMod(Driver):
         # ChainMaps work fine in other places...
         for key, package in self.mf6_active_packages.items():
             package.update_bottom_minimum()
-            package.set_water_level(
-                self.mapping.mask_rib2mod[key] * package.water_level
-                + self.mapping.map_rib2mod_stage[key].dot(self.subgrid_level)
+            water_level = package.water_level
+            self.mapping.rib2mod_stage_operators[key].exchange(
+                self.subgrid_level, water_level
             )
+            package.set_water_level(water_level)
             self.exchange_logger.log_exchange(
                 ("stage_" + key), package.water_level, self.get_current_time()
             )
 
+    @timed("exchange_msw2mod")
     def exchange_msw2mod(self) -> None:
         """Exchange Metaswap to Modflow"""
-        self.mf6_storage[:] = (
-            self.mapping.msw2mod["storage_mask"][:] * self.mf6_storage[:]
-            + self.mapping.msw2mod["storage"].dot(self.msw_storage)[:]
+        self.mapping.msw2mod_operators["storage"].exchange(
+            self.msw_storage, self.mf6_storage
         )
         self.exchange_logger.log_exchange(
             "mf6_storage", self.mf6_storage, self.get_current_time()
@@ -553,25 +596,23 @@ class RibaMetaMod(Driver):
             "msw_storage", self.msw_storage, self.get_current_time()
         )
         # Set recharge
-        self.mf6_recharge[:] = (
-            self.mapping.msw2mod["recharge_mask"][:] * self.mf6_recharge[:]
-            + self.mapping.msw2mod["recharge"].dot(self.msw_volume)[:] / self.delt_gw
-        ) / self.mf6_area[self.mf6_recharge_nodes - 1]
+        # MODFLOW needs the recharge as a flux per area
+        self.mapping.msw2mod_operators["recharge"].exchange(
+            self.msw_volume,
+            self.mf6_recharge,
+            1.0 / self.delt_gw,
+            self.recharge_area.get_inverse_area(),
+        )
 
         if self.enable_sprinkling_groundwater:
-            self.mf6_sprinkling_wells[:] = (
-                self.mapping.msw2mod["gw_sprinkling_mask"][:]
-                * self.mf6_sprinkling_wells[:]
-                + self.mapping.msw2mod["gw_sprinkling"].dot(self.msw_volume)[:]
-                / self.delt_gw
+            self.mapping.msw2mod_operators["gw_sprinkling"].exchange(
+                self.msw_volume, self.mf6_sprinkling_wells, 1.0 / self.delt_gw
             )
 
+    @timed("exchange_mod2msw")
     def exchange_mod2msw(self) -> None:
         """Exchange Modflow to Metaswap"""
-        self.msw_head[:] = (
-            self.mapping.mod2msw["head_mask"][:] * self.msw_head[:]
-            + self.mapping.mod2msw["head"].dot(self.mf6_head)[:]
-        )
+        self.mapping.mod2msw_operators["head"].exchange(self.mf6_head, self.msw_head)
 
     def exchange_labels(self) -> list[str]:
         exchange_labels = []
@@ -590,12 +631,13 @@ class RibaMetaMod(Driver):
     def get_end_time(self) -> float:
         return self.mf6.get_end_time()
 
-    def report_timing_totals(self) -> None:
-        total_mf6 = self.mf6.report_timing_totals()
-        total_ribasim = self.ribasim.report_timing_totals()
-        total_msw = self.msw.report_timing_totals()
-        total = total_mf6 + total_ribasim + total_msw
-        logger.info(f"Total elapsed time in numerical kernels: {total:0.4f} seconds")
+    def get_kernels(self) -> dict[str, XmiWrapper]:
+        kernels: dict[str, XmiWrapper] = {"modflow6": self.mf6}
+        if self.has_ribasim:
+            kernels["ribasim"] = self.ribasim
+        if self.has_metaswap:
+            kernels["metaswap"] = self.msw
+        return kernels
 
     def get_api_packages(
         self, mf6_flowmodel_key: str, mf6_active_river_packages: Sequence[str]
@@ -15,12 +15,21 @@ from loguru import logger
 from numpy.typing import NDArray
 from ribasim_api import RibasimApi
 from scipy.sparse import csr_matrix
+from xmipy import XmiWrapper
 
 from imod_coupler.config import BaseConfig
 from imod_coupler.drivers.driver import Driver
 from imod_coupler.drivers.ribamod.config import Coupling, RibaModConfig
-from imod_coupler.kernelwrappers.mf6_wrapper import Mf6Drainage, Mf6River, Mf6Wrapper
+from imod_coupler.exchange_operator import ExchangeOperator
+from imod_coupler.io import check_bounds, load_table
+from imod_coupler.kernelwrappers.mf6_wrapper import (
+    Mf6BoundaryGroup,
+    Mf6Drainage,
+    Mf6River,
+    Mf6Wrapper,
+)
 from imod_coupler.logging.exchange_collector import ExchangeCollector
+from imod_coupler.logging.timing_registry import timed
 
 # iMOD Python sets MODFLOW 6's time unit to days
 # Ribasim's time unit is always seconds
@@ -68,12 +77,19 @@ class RibaMod(Driver):
     # Mapping tables
     map_mod2rib: dict[str, csr_matrix]
     coupled_mod2rib: NDArray[np.bool_]
+    coupled_basins: NDArray[np.intp]  # the indices of the coupled basins
+    # all river and all drainage packages stacked, with their stacked mod2rib mapping
+    mf6_river_group: Mf6BoundaryGroup
+    mf6_drainage_group: Mf6BoundaryGroup
+    river_mod2rib: csr_matrix
+    drainage_mod2rib: csr_matrix
     map_rib2mod: dict[str, csr_matrix]
-    mask_rib2mod: dict[str, NDArray[Any]]
+    mask_rib2mod: dict[str, NDArray[np.int8]]
+    rib2mod_operators: dict[str, ExchangeOperator]
 
     def __init__(self, base_config: BaseConfig, ribamod_config: RibaModConfig):
         """Constructs the `Ribamod` object"""
-        self.base_config = base_config
+        super().__init__(base_config)
         self.ribamod_config = ribamod_config
         self.coupling = ribamod_config.coupling[
             0
@@ -103,6 +119,7 @@ class RibaMod(Driver):
             )
         else:
             self.exchange_logger = ExchangeCollector()
+        self.exchange_logger.timing_registry = self.timing_registry
         self.couple()
 
     def log_version(self) -> None:
@@ -145,10 +162,6 @@ class RibaMod(Driver):
         self.ribasim_level = self.ribasim.get_value_ptr("basin.level")
         self.subgrid_level = self.ribasim.get_value_ptr("basin.subgrid_level")
 
-        # Setup some accumulator work arrays
-        self.work_infiltration = self.ribasim_infiltration.copy()
-        self.work_drainage = self.ribasim_drainage.copy()
-
         # Create mappings
         packages: ChainMap[str, Any] = ChainMap(
             self.mf6_river_packages, self.mf6_drainage_packages
@@ -158,6 +171,7 @@ class RibaMod(Driver):
         self.map_mod2rib = {}
         self.map_rib2mod = {}
         self.mask_rib2mod = {}
+        self.rib2mod_operators = {}
         self.coupled_mod2rib = np.full(n_basin, False)
         # This coupled_mod2rib will be sequentially updated during this initialization,
         # accumulating all coupled basins.
@@ -169,9 +183,12 @@ class RibaMod(Driver):
             self.coupling.mf6_active_drainage_packages,
         )
         for key, path in active_tables.items():
-            table = np.loadtxt(path, delimiter="\t", dtype=int, skiprows=1, ndmin=2)
+            table = load_table(path, ncol=3, header=True)
             package = packages[key]
             basin_index, bound_index, subgrid_index = table.T
+            check_bounds(basin_index, n_basin, "basin_index", path)
+            check_bounds(bound_index, package.n_bound, "bound_index", path)
+            check_bounds(subgrid_index, n_subgrid, "subgrid_index", path)
             data = np.ones_like(basin_index, dtype=np.float64)
 
             mod2rib = csr_matrix(
@@ -183,7 +200,10 @@ class RibaMod(Driver):
 
             self.map_mod2rib[key] = mod2rib
             self.map_rib2mod[key] = rib2mod
-            self.mask_rib2mod[key] = (rib2mod.getnnz(axis=1) == 0).astype(int)
+            self.mask_rib2mod[key] = (np.diff(rib2mod.indptr) == 0).astype(np.int8)
+            self.rib2mod_operators[key] = ExchangeOperator(
+                rib2mod, self.mask_rib2mod[key]
+            )
             # In-place bitwise or
             self.coupled_mod2rib |= mod2rib.getnnz(axis=1) > 0
 
@@ -192,9 +212,11 @@ class RibaMod(Driver):
             self.coupling.mf6_passive_drainage_packages,
         )
         for key, path in passive_tables.items():
-            table = np.loadtxt(path, delimiter="\t", dtype=int, skiprows=1, ndmin=2)
+            table = load_table(path, ncol=2, header=True)
             package = packages[key]
             basin_index, bound_index = table.T
+            check_bounds(basin_index, n_basin, "basin_index", path)
+            check_bounds(bound_index, package.n_bound, "bound_index", path)
             data = np.ones_like(basin_index, dtype=np.float64)
             mod2rib = csr_matrix(
                 (data, (basin_index, bound_index)), shape=(n_basin, package.n_bound)
@@ -203,46 +225,66 @@ class RibaMod(Driver):
             # In-place bitwise or
             self.coupled_mod2rib |= mod2rib.getnnz(axis=1) > 0
 
+        # Only the coupled basins receive fluxes, so the exchange is
+        # restricted to those
+        self.coupled_basins = np.flatnonzero(self.coupled_mod2rib)
+        # Setup some accumulator work arrays, for the coupled basins only
+        self.work_infiltration = np.zeros(self.coupled_basins.size, dtype=np.float64)
+        self.work_drainage = np.zeros(self.coupled_basins.size, dtype=np.float64)
+
+        self.mf6_river_group = Mf6BoundaryGroup(self.mf6_river_packages)
+        self.mf6_drainage_group = Mf6BoundaryGroup(self.mf6_drainage_packages)
+        self.river_mod2rib = self.mf6_river_group.stack_mapping(
+            self.map_mod2rib, rows=self.coupled_basins
+        )
+        self.drainage_mod2rib = self.mf6_drainage_group.stack_mapping(
+            self.map_mod2rib, rows=self.coupled_basins
+        )
         return
 
     @typing.no_type_check
+    @timed("exchange_rib2mod")
     def exchange_rib2mod(self) -> None:
         # Mypy refuses to understand this ChainMap for some reason.
         # ChainMaps work fine in other places...
         for key, package in self.mf6_active_packages.items():
             package.update_bottom_minimum()
-            package.set_water_level(
-                self.mask_rib2mod[key] * package.water_level
-                + self.map_rib2mod[key].dot(self.subgrid_level)
-            )
+            water_level = package.water_level
+            self.rib2mod_operators[key].exchange(self.subgrid_level, water_level)
+            package.set_water_level(water_level)
             self.exchange_logger.log_exchange(
                 ("stage_" + key), package.water_level, self.get_current_time()
             )
         return
 
+    @timed("exchange_mod2rib")
     def exchange_mod2rib(self) -> None:
         # Zero the accumulator arrays
         self.work_infiltration[:] = 0.0
         self.work_drainage[:] = 0.0
 
-        # Compute MODFLOW 6 river and drain flux
-        for key, river in self.mf6_river_packages.items():
-            river_flux = river.get_flux(self.mf6_head)
-            ribasim_flux = self.map_mod2rib[key].dot(river_flux) / RIBAMOD_TIME_FACTOR
-            self.work_infiltration += np.where(ribasim_flux > 0, ribasim_flux, 0)
-            self.work_drainage += np.where(ribasim_flux < 0, -ribasim_flux, 0)
-
-        for key, drainage in self.mf6_drainage_packages.items():
-            drain_flux = drainage.get_flux(self.mf6_head)
-            ribasim_flux = self.map_mod2rib[key].dot(drain_flux) / RIBAMOD_TIME_FACTOR
-            self.work_drainage -= ribasim_flux
-
-        self.ribasim_drainage[self.coupled_mod2rib] = self.work_drainage[
-            self.coupled_mod2rib
-        ]
-        self.ribasim_infiltration[self.coupled_mod2rib] = self.work_infiltration[
-            self.coupled_mod2rib
-        ]
+        # Compute MODFLOW 6 river and drain flux of all packages at once. The
+        # basin totals are kept per package, so that infiltration and drainage
+        # are split per package as before. Only the coupled basins are
+        # computed.
+        n_coupled = self.coupled_basins.size
+        river_flux = self.mf6_river_group.get_flux(self.mf6_head)
+        ribasim_flux = self.river_mod2rib.dot(river_flux).reshape(
+            len(self.mf6_river_group), n_coupled
+        )
+        ribasim_flux /= RIBAMOD_TIME_FACTOR
+        self.work_infiltration += np.maximum(ribasim_flux, 0.0).sum(axis=0)
+        self.work_drainage -= np.minimum(ribasim_flux, 0.0).sum(axis=0)
+
+        drain_flux = self.mf6_drainage_group.get_flux(self.mf6_head)
+        ribasim_flux = self.drainage_mod2rib.dot(drain_flux).reshape(
+            len(self.mf6_drainage_group), n_coupled
+        )
+        ribasim_flux /= RIBAMOD_TIME_FACTOR
+        self.work_drainage -= ribasim_flux.sum(axis=0)
+
+        self.ribasim_drainage[self.coupled_basins] = self.work_drainage
+        self.ribasim_infiltration[self.coupled_basins] = self.work_infiltration
         return
 
     def update(self) -> None:
@@ -256,11 +298,16 @@ class RibaMod(Driver):
         # One time step in MODFLOW 6
         # convergence loop
         self.mf6.prepare_solve(1)
+        has_converged = False
         for kiter in range(1, self.max_iter + 1):
+            self.exchange_logger.iteration = kiter
+            self.iterations = kiter
             has_converged = self.do_iter(1)
             if has_converged:
                 logger.debug(f"MF6-Ribasim converged in {kiter} iterations")
                 break
+        self.exchange_logger.iteration = None
+        self.converged = has_converged
         self.mf6.finalize_solve(1)
         self.mf6.finalize_time_step()
 
@@ -269,7 +316,9 @@ class RibaMod(Driver):
 
         # Update Ribasim until current time of MODFLOW 6
         self.ribasim.update_until(self.mf6.get_current_time() * RIBAMOD_TIME_FACTOR)
+        self.exchange_logger.end_time_step(has_converged)
 
+    @timed("outer_iteration")
     def do_iter(self, sol_id: int) -> bool:
         """Execute a single iteration"""
         has_converged = self.mf6.solve(sol_id)
@@ -287,8 +336,5 @@ class RibaMod(Driver):
     def get_end_time(self) -> float:
         return self.mf6.get_end_time()
 
-    def report_timing_totals(self) -> None:
-        total_mf6 = self.mf6.report_timing_totals()
-        total_ribasim = self.ribasim.report_timing_totals()
-        total = total_mf6 + total_ribasim
-        logger.info(f"Total elapsed time in numerical kernels: {total:0.4f} seconds")
+    def get_kernels(self) -> dict[str, XmiWrapper]:
+        return {"modflow6": self.mf6, "ribasim": self.ribasim}
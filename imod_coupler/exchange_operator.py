@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import importlib
+from collections.abc import Callable
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from scipy.sparse import csr_matrix, sparray, spmatrix
+
+from imod_coupler.io import check_bounds
+
+
+def _find_csr_matvec() -> Callable[..., None] | None:
+    """
+    Returns the routine of scipy that accumulates a csr matrix-vector product
+    into an existing array, or None when it isn't found. The routine is not
+    part of the public API of scipy, so that it may change in any release.
+    """
+    try:
+        sparsetools = importlib.import_module("scipy.sparse._sparsetools")
+    except ImportError:
+        return None
+    csr_matvec: Callable[..., None] | None = getattr(sparsetools, "csr_matvec", None)
+    return csr_matvec
+
+
+_csr_matvec = _find_csr_matvec()
+
+
+class ExchangeOperator:
+    """
+    In-place evaluation of an exchange from a source to a target array
+
+    For a mapping and mask created by `create_mapping`, the exchange
+
+    target[:] = mask * target + factor * mapping.dot(source)
+
+    is evaluated directly into the target array, which usually is a pointer
+    into a kernel. Only the rows of the mapping that are mapped (mask 0) are
+    stored, and the scratch buffer is allocated once at construction, so that
+    an exchange does not allocate any temporary arrays.
+
+    When every mapped target entry has a single source entry, as for the
+    head of an svat taken from its cell, the exchange is a gather from the
+    source instead of a sparse matrix-vector product. Weights are only
+    applied when they differ from one. The sparse matrix-vector product only
+    avoids the allocation of its result with the internal `csr_matvec` of
+    scipy; when a scipy release doesn't provide it, the product is evaluated
+    with `@`, which allocates its result.
+
+    Parameters
+    ----------
+    mapping : csr_matrix
+        The mapping of size (ntgt x nsrc)
+    mask : NDArray
+        Array of size ntgt with 0 for mapped entries and 1 otherwise
+    """
+
+    mapping: csr_matrix
+    mask: NDArray[Any]
+    rows: NDArray[np.intp]  # the mapped target entries
+    empty_rows: NDArray[np.intp]  # mapped target entries without any source
+    all_rows: bool  # true, when every target entry is mapped
+    is_gather: bool  # true, when every mapped target entry has a single source
+
+    def __init__(self, mapping: csr_matrix | spmatrix | sparray, mask: NDArray[Any]):
+        self.mapping = csr_matrix(mapping)
+        self.mapping.sum_duplicates()
+        self.mask = mask
+        mapped = np.asarray(mask) == 0
+        nnz = np.diff(self.mapping.indptr)
+        self.rows = np.flatnonzero(mapped & (nnz > 0))
+        self.empty_rows = np.flatnonzero(mapped & (nnz == 0))
+        self.all_rows = self.rows.size == self.mapping.shape[0]
+
+        # the mapping restricted to the mapped rows
+        self._mapped = self.mapping[self.rows]
+        self._mapped.data = self._mapped.data.astype(np.float64)
+        # the exchange reads the source without bounds checks
+        check_bounds(
+            self._mapped.indices, self.mapping.shape[1], "source", "the mapping"
+        )
+        self._values = np.empty(self.rows.size, dtype=np.float64)
+
+        self.is_gather = bool(np.all(np.diff(self._mapped.indptr) == 1))
+        if self.is_gather:
+            self._gather_indices = self._mapped.indices.astype(np.intp)
+            self._gather_weights: NDArray[np.float64] | None = None
+            if np.any(self._mapped.data != 1.0):
+                self._gather_weights = self._mapped.data
+
+    def exchange(
+        self,
+        source: NDArray[Any],
+        target: NDArray[Any],
+        factor: float = 1.0,
+        scale: NDArray[np.float64] | None = None,
+    ) -> None:
+        """
+        Set the mapped entries of `target` from `source`
+
+        Parameters
+        ----------
+        source : NDArray[np.float64]
+            The source array of size nsrc
+        target : NDArray[np.float64]
+            The target array of size ntgt, updated in place. Like the
+            pointers of the kernels, it should be a contiguous array.
+        factor : float
+            Scalar applied to the mapped values, e.g. to convert volumes to
+            fluxes
+        scale : NDArray[np.float64] | None
+            Array of the size of `rows`, applied to the mapped values of
+            those rows, e.g. the inverse cell area
+        """
+        if np.size(source) != self.mapping.shape[1]:
+            raise ValueError(
+                f"Expected a source of size {self.mapping.shape[1]}, "
+                f"found {np.size(source)}"
+            )
+        if self.rows.size > 0:
+            values = target if self.all_rows else self._values
+            if self.is_gather:
+                # the indexes are checked; unlike the default mode="raise",
+                # mode="wrap" doesn't make np.take buffer the output
+                np.take(source, self._gather_indices, out=values, mode="wrap")
+                if self._gather_weights is not None:
+                    np.multiply(values, self._gather_weights, out=values)
+            elif _csr_matvec is not None:
+                values.fill(0.0)
+                # accumulates mapped.dot(source) into values, without the
+                # allocation of the result done by csr_matrix.dot
+                _csr_matvec(
+                    self._mapped.shape[0],
+                    self._mapped.shape[1],
+                    self._mapped.indptr,
+                    self._mapped.indices,
+                    self._mapped.data,
+                    source,
+                    values,
+                )
+            else:
+                np.copyto(values, self._mapped @ source)
+            if factor != 1.0:
+                np.multiply(values, factor, out=values)
+            if scale is not None:
+                np.multiply(values, scale, out=values)
+            if not self.all_rows:
+                target[self.rows] = values
+        if self.empty_rows.size > 0:
+            target[self.empty_rows] = 0.0
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import warnings
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from loguru import logger
+from numpy.typing import NDArray
+
+CACHE_SUFFIX = ".npz"
+
+# the settings of the cache of the coupling tables, see `configure_table_cache`
+_cache_enabled = True
+_cache_dir: Path | None = None
+
+
+def configure_table_cache(enabled: bool = True, cache_dir: Path | None = None) -> None:
+    """
+    Configure the binary cache of the coupling tables read by `load_table`.
+
+    Parameters
+    ----------
+    enabled : bool
+        Whether the parsed tables are cached. When False, the tables are
+        parsed on every run, and no cache is read or written.
+    cache_dir : Path | None
+        The directory of the cache files. When None, the cache of a table is
+        stored next to the table, e.g. in the model directory.
+    """
+    global _cache_enabled, _cache_dir
+    _cache_enabled = enabled
+    _cache_dir = cache_dir
+
+
+def _cache_path(path: Path) -> Path:
+    if _cache_dir is None:
+        return path.with_name(path.name + CACHE_SUFFIX)
+    # tables of different directories may have the same name
+    digest = hashlib.sha256(str(path.resolve()).encode()).hexdigest()[:16]
+    return _cache_dir / f"{path.name}.{digest}{CACHE_SUFFIX}"
+
+
+def load_table(path: str | Path, ncol: int, header: bool = False) -> NDArray[np.int32]:
+    """
+    Load an integer coupling table, reusing a binary cache of an earlier run.
+
+    All coupling tables are read by this function: the fixed-width `.dxc`
+    tables and `mod2svat.inp` of MetaSWAP, and the tab-separated `.tsv`
+    tables with a header line written by primod. Columns may be separated by
+    any whitespace, values of fixed-width columns are always separated by at
+    least one space.
+
+    The parsed table is stored as `<name>.npz` next to the table, or in the
+    directory set by `configure_table_cache`. It is reused as long as the
+    size and modification time of the table are unchanged, or, when only
+    the modification time differs, its content hash. When the cache can't be
+    written, e.g. because the directory is read-only, a warning is logged
+    and the table is parsed on every run. The cache can be disabled with
+    `configure_table_cache`.
+
+    Parameters
+    ----------
+    path : str | Path
+        The path to the coupling table
+    ncol : int
+        The number of columns of the table
+    header : bool
+        Whether the first line of the table is a header
+
+    Returns
+    -------
+    NDArray[np.int32]
+        The table of shape (nrow, ncol), stored in column-major order, so
+        that every column is a contiguous array
+
+    Raises
+    ------
+    ValueError
+        When a value is not an int32, or when any row does not have `ncol`
+        columns
+    """
+    path = Path(path)
+    skiprows = 1 if header else 0
+    if _cache_enabled:
+        cache_path = _cache_path(path)
+        options = f"skiprows={skiprows}"
+        table = _read_cache(path, cache_path, options)
+        if table is None:
+            table = _parse_table(path, ncol, skiprows)
+            _write_cache(path, cache_path, options, table)
+    else:
+        table = _parse_table(path, ncol, skiprows)
+    if table.shape[1] != ncol:
+        raise ValueError(
+            f"Expected {ncol} columns in {path}, found {table.shape[1]} columns."
+        )
+    return table
+
+
+def check_bounds(index: NDArray[Any], size: int, name: str, path: str | Path) -> None:
+    """
+    Check that all zero-based indexes, read from a coupling table or from a
+    kernel, are in range
+
+    Parameters
+    ----------
+    index : NDArray[Any]
+        The zero-based indexes
+    size : int
+        The size of the indexed array
+    name : str
+        Description of the indexes, used in the error message
+    path : str | Path
+        The coupling table, or a description of the kernel variable, the
+        indexes were read from
+
+    Raises
+    ------
+    ValueError
+        When any of the indexes is not in [0, size)
+    """
+    if index.size == 0 or (index.min() >= 0 and index.max() < size):
+        # cheap enough to check indexes that are updated every time step
+        return
+    invalid = (index < 0) | (index >= size)
+    if invalid.any():
+        rows = np.flatnonzero(invalid)
+        raise ValueError(
+            f"{rows.size} {name} values in {path} are out of bounds [0, {size}), "
+            f"first at row {rows[0]}: {index[rows[0]]}."
+        )
+
+
+def _parse_table(path: Path, ncol: int, skiprows: int) -> NDArray[np.int32]:
+    # np.loadtxt is implemented in C since numpy 1.23; for the coupling tables
+    # it is as fast as the C parser of pandas or np.fromstring, and it
+    # already reports rows with a varying number of columns
+    with warnings.catch_warnings():
+        # an empty table is valid, e.g. when no svats are coupled
+        warnings.filterwarnings("ignore", "loadtxt: input contained no data")
+        # without this, loadtxt falls back to parsing values that aren't an
+        # int32 as float, which silently truncates or overflows them
+        warnings.filterwarnings("error", "loadtxt.*via a float", DeprecationWarning)
+        table = np.loadtxt(path, dtype=np.int32, ndmin=2, skiprows=skiprows)
+    if table.size == 0:
+        table = np.empty((0, ncol), dtype=np.int32)
+    return np.asfortranarray(table)
+
+
+def _file_hash(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _read_cache(path: Path, cache_path: Path, options: str) -> NDArray[np.int32] | None:
+    if not cache_path.is_file():
+        return None
+    stat = path.stat()
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if str(cache["options"]) != options or int(cache["size"]) != stat.st_size:
+                return None
+            modified = int(cache["mtime"]) != stat.st_mtime_ns
+            if modified and str(cache["hash"]) != _file_hash(path):
+                return None
+            table: NDArray[np.int32] = cache["table"]
+    except (OSError, ValueError, KeyError) as e:
+        logger.debug(f"Ignoring invalid cache {cache_path}: {e}")
+        return None
+    if modified:
+        # same content, store the new modification time
+        _write_cache(path, cache_path, options, table)
+    logger.debug(f"Using cached {path}")
+    return table
+
+
+def _write_cache(
+    path: Path, cache_path: Path, options: str, table: NDArray[np.int32]
+) -> None:
+    stat = path.stat()
+    temporary_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.tmp")
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(temporary_path, "wb") as f:
+            np.savez(
+                f,
+                table=table,
+                size=stat.st_size,
+                mtime=stat.st_mtime_ns,
+                hash=_file_hash(path),
+                options=options,
+            )
+        # replace atomically, so that concurrent runs never read a partial cache
+        os.replace(temporary_path, cache_path)
+    except OSError as e:
+        logger.warning(
+            f"Can't write cache {cache_path}, {path} is parsed on every run: {e}"
+        )
+        temporary_path.unlink(missing_ok=True)
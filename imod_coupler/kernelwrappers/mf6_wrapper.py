@@ -1,12 +1,15 @@
 from abc import ABC
-from collections.abc import Sequence
+from collections.abc import Iterable, Mapping, Sequence
 from pathlib import Path
 from typing import Any
 
 import numpy as np
 from numpy.typing import NDArray
+from scipy.sparse import block_diag, csr_matrix, sparray, spmatrix
 from xmipy import XmiWrapper
 
+from imod_coupler.io import check_bounds
+
 
 class Mf6Wrapper(XmiWrapper):
     def __init__(
@@ -17,11 +20,85 @@ class Mf6Wrapper(XmiWrapper):
         timing: bool = False,
     ):
         super().__init__(lib_path, lib_dependency, working_directory, timing)
+        self._init_caches()
+
+    def _init_caches(self) -> None:
+        # the stress period of the current time step, 0 before the first time step
+        self.stress_period = 0
+        self._pointers: dict[tuple[str, str, str], NDArray[Any]] = {}
+        # scratch buffers, reused over time steps
+        self._buffers: dict[tuple[str, str, str], NDArray[Any]] = {}
+
+    def get_pointer(
+        self, var_name: str, component_name: str, subcomponent_name: str = ""
+    ) -> NDArray[Any]:
+        """
+        Returns the pointer to a MODFLOW 6 variable, resolving its address
+        only on the first call.
+
+        MODFLOW 6 allocates the arrays of the API when it initializes, the
+        arrays of the packages with their maximum number of boundaries, and
+        doesn't reallocate them when it reads new period data: only their
+        values, e.g. the nodelists, change. The pointers therefore stay valid
+        for the whole simulation, which the drivers and the boundary packages
+        rely on as well, as they keep the pointers they got at initialization.
+        The pointers are cached until `invalidate_pointers` is called, so
+        that repeated calls are plain array accesses.
+
+        Parameters
+        ----------
+        var_name : str
+            The name of the variable
+        component_name : str
+            The user-assigned component name, e.g. of the flow model
+        subcomponent_name : str
+            The user-assigned subcomponent name, e.g. of the package
+
+        Returns
+        -------
+        NDArray[Any]
+            The array pointing to the memory of MODFLOW 6
+        """
+        key = (var_name, component_name, subcomponent_name)
+        pointer = self._pointers.get(key)
+        if pointer is None:
+            address = self.get_var_address(var_name, component_name, subcomponent_name)
+            pointer = self.get_value_ptr(address)
+            self._pointers[key] = pointer
+        return pointer
+
+    def invalidate_pointers(
+        self, component_name: str | None = None, subcomponent_name: str | None = None
+    ) -> None:
+        """
+        Drop cached pointers, e.g. when MODFLOW 6 is initialized again.
+
+        Without arguments, all pointers are dropped. Otherwise only the
+        pointers of the given component, or of the given subcomponent of the
+        component, are dropped. Only the cache is affected, not the pointers
+        kept by the drivers or the boundary packages.
+        """
+        if component_name is None:
+            self._pointers = {}
+            return
+        self._pointers = {
+            key: pointer
+            for key, pointer in self._pointers.items()
+            if key[1] != component_name
+            or (subcomponent_name is not None and key[2] != subcomponent_name)
+        }
+
+    def prepare_time_step(self, dt: float) -> None:
+        super().prepare_time_step(dt)
+        self._update_stress_period()
+
+    def _update_stress_period(self) -> None:
+        # the users of the nodelists refresh their copies in a new stress period,
+        # when MODFLOW 6 reads new period data
+        self.stress_period = int(self.get_pointer("KPER", "TDIS")[0])
 
     def get_head(self, mf6_flowmodel_key: str) -> NDArray[np.float64]:
-        mf6_head_tag = self.get_var_address("X", mf6_flowmodel_key)
-        mf6_head = self.get_value_ptr(mf6_head_tag)
-        return mf6_head
+        return self.get_pointer("X", mf6_flowmodel_key)
 
     def get_api_packages(
         self, mf6_flowmodel_key: str, mf6_api_keys: Sequence[str]
@@ -45,69 +122,47 @@ class Mf6Wrapper(XmiWrapper):
         mf6_flowmodel_key: str,
         mf6_msw_recharge_pkg: str,
     ) -> NDArray[np.float64]:
-        wel_tag = self.get_var_address("Q", mf6_flowmodel_key, mf6_msw_recharge_pkg)
-        return self.get_value_ptr(wel_tag)
+        return self.get_pointer("Q", mf6_flowmodel_key, mf6_msw_recharge_pkg)
 
     def get_recharge(
         self,
         mf6_flowmodel_key: str,
         mf6_msw_recharge_pkg: str,
     ) -> NDArray[np.float64]:
-        mf6_recharge_tag = self.get_var_address(
-            "RECHARGE", mf6_flowmodel_key, mf6_msw_recharge_pkg
-        )
-        return self.get_value_ptr(mf6_recharge_tag)
+        return self.get_pointer("RECHARGE", mf6_flowmodel_key, mf6_msw_recharge_pkg)
 
     def get_recharge_nodes(
         self,
         mf6_flowmodel_key: str,
         mf6_msw_recharge_pkg: str,
     ) -> NDArray[Any]:
-        mf6_recharge_nodes_tag = self.get_var_address(
-            "NODELIST", mf6_flowmodel_key, mf6_msw_recharge_pkg
-        )
-        return self.get_value_ptr(mf6_recharge_nodes_tag)
+        return self.get_pointer("NODELIST", mf6_flowmodel_key, mf6_msw_recharge_pkg)
 
     def get_storage(self, mf6_flowmodel_key: str) -> NDArray[np.float64]:
-        mf6_storage_tag = self.get_var_address("SS", mf6_flowmodel_key, "STO")
-        mf6_storage = self.get_value_ptr(mf6_storage_tag)
-        return mf6_storage
+        return self.get_pointer("SS", mf6_flowmodel_key, "STO")
 
     def has_sc1(self, mf6_flowmodel_key: str) -> bool:
-        mf6_is_sc1_tag = self.get_var_address("ISTOR_COEF", mf6_flowmodel_key, "STO")
-        mf6_has_sc1 = bool(self.get_value_ptr(mf6_is_sc1_tag)[0] != 0)
-        return mf6_has_sc1
+        mf6_is_sc1 = self.get_pointer("ISTOR_COEF", mf6_flowmodel_key, "STO")
+        return bool(mf6_is_sc1[0] != 0)
 
     def get_area(self, mf6_flowmodel_key: str) -> NDArray[np.float64]:
-        mf6_area_tag = self.get_var_address("AREA", mf6_flowmodel_key, "DIS")
-        mf6_area = self.get_value_ptr(mf6_area_tag)
-        return mf6_area
+        return self.get_pointer("AREA", mf6_flowmodel_key, "DIS")
 
     def get_top(self, mf6_flowmodel_key: str) -> NDArray[np.float64]:
-        mf6_top_tag = self.get_var_address("TOP", mf6_flowmodel_key, "DIS")
-        mf6_top = self.get_value_ptr(mf6_top_tag)
-        return mf6_top
+        return self.get_pointer("TOP", mf6_flowmodel_key, "DIS")
 
     def get_bot(self, mf6_flowmodel_key: str) -> NDArray[np.float64]:
-        mf6_bot_tag = self.get_var_address("BOT", mf6_flowmodel_key, "DIS")
-        mf6_bot = self.get_value_ptr(mf6_bot_tag)
-        return mf6_bot
+        return self.get_pointer("BOT", mf6_flowmodel_key, "DIS")
 
     def max_iter(self) -> Any:
-        mf6_max_iter_tag = self.get_var_address("MXITER", "SLN_1")
-        mf6_max_iter = self.get_value_ptr(mf6_max_iter_tag)[0]
-        return mf6_max_iter
+        return self.get_pointer("MXITER", "SLN_1")[0]
 
     def get_sprinkling(
         self,
         mf6_flowmodel_key: str,
         mf6_package_key: str,
     ) -> NDArray[np.float64]:
-        mf6_sprinkling_tag = self.get_var_address(
-            "BOUND", mf6_flowmodel_key, mf6_package_key
-        )
-        mf6_sprinkling_wells = self.get_value_ptr(mf6_sprinkling_tag)[:, 0]
-        return mf6_sprinkling_wells
+        return self.get_pointer("BOUND", mf6_flowmodel_key, mf6_package_key)[:, 0]
 
     def get_drainage_elevation(
         self,
@@ -129,12 +184,8 @@ class Mf6Wrapper(XmiWrapper):
          NDArray[np.float64]:
             Drainage elevation in modflow
         """
-        bound_address = self.get_var_address(
-            "BOUND", mf6_flowmodel_key, mf6_package_key
-        )
-        bound = self.get_value_ptr(bound_address)
-        stage = bound[:, 0]
-        return stage
+        bound = self.get_pointer("BOUND", mf6_flowmodel_key, mf6_package_key)
+        return bound[:, 0]
 
     def set_drainage_elevation(
         self,
@@ -160,14 +211,14 @@ class Mf6Wrapper(XmiWrapper):
         ValueError
             the size of the provided stage array does not match the expected size
         """
-        stage = self.get_drainage_elevation(mf6_flowmodel_key, mf6_package_key)
-        if len(new_drainage_elevation) != len(stage):
-            raise ValueError(f"Expected size of new_drainage_elevation is {len(stage)}")
-        bound_address = self.get_var_address(
-            "BOUND", mf6_flowmodel_key, mf6_package_key
+        self._set_package_values(
+            mf6_flowmodel_key,
+            mf6_package_key,
+            "BOUND",
+            new_drainage_elevation,
+            0,
+            "new_drainage_elevation",
         )
-        bound = self.get_value_ptr(bound_address)
-        bound[:, 0] = new_drainage_elevation[:]
 
     def set_river_stages(
         self,
@@ -193,14 +244,14 @@ class Mf6Wrapper(XmiWrapper):
         ValueError
             the size of the provided stage array does not match the expected size
         """
-        stage = self.get_river_stages(mf6_flowmodel_key, mf6_package_key)
-        if len(new_river_stages) != len(stage):
-            raise ValueError(f"Expected size of new_river_stages is {len(stage)}")
-        stage_address = self.get_var_address(
-            "STAGE", mf6_flowmodel_key, mf6_package_key
+        self._set_package_values(
+            mf6_flowmodel_key,
+            mf6_package_key,
+            "STAGE",
+            new_river_stages,
+            None,
+            "new_river_stages",
         )
-        stage = self.get_value_ptr(stage_address)
-        stage[:] = new_river_stages[:]
 
     def get_river_stages(
         self,
@@ -222,11 +273,7 @@ class Mf6Wrapper(XmiWrapper):
          NDArray[np.float64]:
             stages of the rivers in modflow
         """
-        stage_address = self.get_var_address(
-            "STAGE", mf6_flowmodel_key, mf6_package_key
-        )
-        stage = self.get_value_ptr(stage_address)
-        return stage
+        return self.get_pointer("STAGE", mf6_flowmodel_key, mf6_package_key)
 
     def get_river_bot(
         self,
@@ -248,9 +295,7 @@ class Mf6Wrapper(XmiWrapper):
          NDArray[np.float64]:
             bots of the rivers in modflow
         """
-        rbot_address = self.get_var_address("RBOT", mf6_flowmodel_key, mf6_package_key)
-        rbot = self.get_value_ptr(rbot_address)
-        return rbot
+        return self.get_pointer("RBOT", mf6_flowmodel_key, mf6_package_key)
 
     def set_well_flux(
         self,
@@ -277,22 +322,69 @@ class Mf6Wrapper(XmiWrapper):
         ValueError
             the size of the provided flux array does not match the expected size
         """
-        bound_address = self.get_var_address(
-            "BOUND", mf6_flowmodel_key, mf6_wel_pkg_key
+        self._set_package_values(
+            mf6_flowmodel_key, mf6_wel_pkg_key, "BOUND", assigned_flux, 0, "flux"
         )
-        mf6_flux = self.get_value_ptr(bound_address)
 
-        if len(assigned_flux) != len(mf6_flux):
-            raise ValueError(f"Expected size of flux is {len(mf6_flux)}")
-        for i in range(len(assigned_flux)):
-            mf6_flux[i, 0] = assigned_flux[i]
+    def set_values(
+        self,
+        mf6_flowmodel_key: str,
+        var_name: str,
+        values: Mapping[str, NDArray[np.float64]],
+        column: int | None = None,
+    ) -> None:
+        """
+        Sets a variable of several packages of a flow model in one call.
+
+        The values are copied directly into the memory of MODFLOW 6, without
+        temporary arrays.
+
+        Parameters
+        ----------
+        mf6_flowmodel_key : str
+            The user-assigned component name of the flow model
+        var_name : str
+            The name of the variable, e.g. "STAGE", "ELEV" or "BOUND"
+        values : Mapping[str, NDArray[np.float64]]
+            The values to be set to modflow, per user-assigned package name
+        column : int | None
+            The column to set of a two-dimensional variable like "BOUND"
 
-        self.set_value(bound_address, mf6_flux)
+        Raises
+        ------
+        ValueError
+            the size of a provided array does not match the expected size
+        """
+        for mf6_package_key, package_values in values.items():
+            self._set_package_values(
+                mf6_flowmodel_key,
+                mf6_package_key,
+                var_name,
+                package_values,
+                column,
+                f"{var_name} of {mf6_package_key}",
+            )
+
+    def _set_package_values(
+        self,
+        mf6_flowmodel_key: str,
+        mf6_package_key: str,
+        var_name: str,
+        values: NDArray[np.float64],
+        column: int | None,
+        description: str,
+    ) -> None:
+        pointer = self.get_pointer(var_name, mf6_flowmodel_key, mf6_package_key)
+        target = pointer if column is None else pointer[:, column]
+        if len(values) != len(target):
+            raise ValueError(f"Expected size of {description} is {len(target)}")
+        np.copyto(target, values)
 
     def get_river_flux_estimate(
         self,
         mf6_flowmodel_key: str,
         mf6_river_pkg_key: str,
+        out: NDArray[np.float64] | None = None,
     ) -> NDArray[np.float64]:
         """
         Returns the river fluxes consistent with current head, river stage and conductance.
@@ -310,6 +402,8 @@ class Mf6Wrapper(XmiWrapper):
             The user-assigned component name of the flow model
         mf6_river_pkg_key : str
             The user-assigned component name of the river package
+        out : NDArray[np.float64], optional
+            Array to store the flux in. If not given, a new array is allocated.
 
         Returns
         -------
@@ -317,37 +411,21 @@ class Mf6Wrapper(XmiWrapper):
             flux (array size = nr of river nodes)
             sign is positive for infiltration
         """
-        stage_address = self.get_var_address(
-            "STAGE", mf6_flowmodel_key, mf6_river_pkg_key
-        )
-        cond_address = self.get_var_address(
-            "COND", mf6_flowmodel_key, mf6_river_pkg_key
-        )
-        rbot_address = self.get_var_address(
-            "RBOT", mf6_flowmodel_key, mf6_river_pkg_key
-        )
-        stage = self.get_value_ptr(stage_address)
-        cond = self.get_value_ptr(cond_address)
-        rbot = self.get_value_ptr(rbot_address)
-
-        head_address = self.get_var_address("X", mf6_flowmodel_key)
-        head = self.get_value_ptr(head_address)
-        nodelist_address = self.get_var_address(
-            "NODELIST", mf6_flowmodel_key, mf6_river_pkg_key
-        )
-        nodelist = self.get_value_ptr(nodelist_address)
-
-        subset_head = head[nodelist - 1]
-        river_head = np.maximum(subset_head, rbot)
-        q = NDArray[np.float64](len(nodelist))
-        q[:] = cond * (stage - river_head)
-
+        stage = self.get_pointer("STAGE", mf6_flowmodel_key, mf6_river_pkg_key)
+        cond = self.get_pointer("COND", mf6_flowmodel_key, mf6_river_pkg_key)
+        rbot = self.get_pointer("RBOT", mf6_flowmodel_key, mf6_river_pkg_key)
+        river_head = self._get_subset_head(mf6_flowmodel_key, mf6_river_pkg_key)
+        np.maximum(river_head, rbot, out=river_head)
+        q = np.empty_like(river_head) if out is None else out
+        np.subtract(stage, river_head, out=q)
+        np.multiply(cond, q, out=q)
         return q
 
     def get_river_drain_flux(
         self,
         mf6_flowmodel_key: str,
         mf6_river_drain_pkg_key: str,
+        out: NDArray[np.float64] | None = None,
     ) -> NDArray[np.float64]:
         """
         Returns the calculated river or DRN fluxes of MF6. In MF6 the RIV boundary condition is added to the solution in the following matter:
@@ -384,6 +462,8 @@ class Mf6Wrapper(XmiWrapper):
             The user-assigned component name of the flow model
         mf6_river_pkg_key : str
             The user-assigned component name of the river or drainage package
+        out : NDArray[np.float64], optional
+            Array to store the flux in. If not given, a new array is allocated.
 
         Returns
         -------
@@ -392,27 +472,59 @@ class Mf6Wrapper(XmiWrapper):
             sign is positive for infiltration
         """
 
-        rhs_address = self.get_var_address(
+        package_rhs = self.get_pointer(
             "RHS", mf6_flowmodel_key, mf6_river_drain_pkg_key
         )
-        package_rhs = self.get_value_ptr(rhs_address)
-        hcof_address = self.get_var_address(
+        package_hcof = self.get_pointer(
             "HCOF", mf6_flowmodel_key, mf6_river_drain_pkg_key
         )
-        package_hcof = self.get_value_ptr(hcof_address)
-        head_address = self.get_var_address("X", mf6_flowmodel_key)
-        head = self.get_value_ptr(head_address)
-        package_nodelist_address = self.get_var_address(
-            "NODELIST", mf6_flowmodel_key, mf6_river_drain_pkg_key
-        )
-        package_nodelist = self.get_value_ptr(package_nodelist_address)
-        subset_head = head[package_nodelist - 1]
-
-        q = NDArray[np.float64](len(package_nodelist))
-        q = package_hcof * subset_head - package_rhs
+        subset_head = self._get_subset_head(mf6_flowmodel_key, mf6_river_drain_pkg_key)
 
+        q = np.empty_like(subset_head) if out is None else out
+        np.multiply(package_hcof, subset_head, out=q)
+        q -= package_rhs
         return q
 
+    def _get_buffer(
+        self,
+        name: str,
+        mf6_flowmodel_key: str,
+        mf6_package_key: str,
+        size: int,
+        dtype: type[np.generic],
+    ) -> NDArray[Any]:
+        key = (name, mf6_flowmodel_key, mf6_package_key)
+        buffer = self._buffers.get(key)
+        if buffer is None or buffer.size != size:
+            buffer = np.empty(size, dtype=dtype)
+            self._buffers[key] = buffer
+        return buffer
+
+    def _get_subset_head(
+        self, mf6_flowmodel_key: str, mf6_package_key: str
+    ) -> NDArray[np.float64]:
+        """Head of the cells of a package, in a scratch buffer of the package"""
+        head = self.get_pointer("X", mf6_flowmodel_key)
+        nodelist = self.get_pointer("NODELIST", mf6_flowmodel_key, mf6_package_key)
+        # Fortran 1-based versus Python 0-based indexing
+        index = self._get_buffer(
+            "index", mf6_flowmodel_key, mf6_package_key, nodelist.size, np.int32
+        )
+        np.subtract(nodelist, 1, out=index)
+        check_bounds(
+            index,
+            head.size,
+            "node",
+            f"the nodelist of {mf6_flowmodel_key}/{mf6_package_key}",
+        )
+        subset_head = self._get_buffer(
+            "head", mf6_flowmodel_key, mf6_package_key, nodelist.size, np.float64
+        )
+        # the indexes are checked; unlike the default mode="raise", mode="wrap"
+        # doesn't make np.take buffer the output
+        np.take(head, index, out=subset_head, mode="wrap")
+        return subset_head
+
 
 class Mf6Boundary(ABC):
     nodelist: NDArray[np.int32]
@@ -462,6 +574,8 @@ class Mf6Api(Mf6Boundary):
 class Mf6HeadBoundary(Mf6Boundary):
     head: NDArray[np.float64]
     private_nodelist: NDArray[np.int32]
+    nodelist_period: int
+    nodelist_name: str  # describes the nodelist in errors
 
     def __init__(
         self, mf6_wrapper: Mf6Wrapper, mf6_flowmodel_key: str, mf6_pkg_key: str
@@ -475,6 +589,10 @@ class Mf6HeadBoundary(Mf6Boundary):
         self.private_nodelist = (
             self.nodelist - 1
         )  # internal to this class, therefore 0-based
+        # the stress period the private nodelist was set in, it is set and
+        # checked again when first used
+        self.nodelist_period = -1
+        self.nodelist_name = f"the nodelist of {mf6_flowmodel_key}/{mf6_pkg_key}"
 
     def set_private_nodelist(self) -> None:
         """
@@ -483,7 +601,25 @@ class Mf6HeadBoundary(Mf6Boundary):
         dummy array of only -1 values. Apparently, it is not allocated yet (?)
         and the allocation only occurs after the first prepare_time_step.
         """
-        self.private_nodelist = self.nodelist - 1
+        np.subtract(self.nodelist, 1, out=self.private_nodelist)
+        self.nodelist_period = self.mf6_wrapper.stress_period
+
+    def update_private_nodelist(self, n_node: int) -> None:
+        """
+        Sets the private nodelist only when MODFLOW 6 started a new stress
+        period since it was set, as the nodelist only changes when MODFLOW 6
+        reads new period data. Raises when any node is not one of the
+        `n_node` cells, e.g. when the nodelist isn't allocated yet.
+        """
+        if self.nodelist_period != self.mf6_wrapper.stress_period:
+            self.set_private_nodelist()
+            check_bounds(self.private_nodelist, n_node, "node", self.nodelist_name)
+
+    def _set_head(self, head: NDArray[np.float64]) -> None:
+        self.update_private_nodelist(head.size)
+        # the nodes are checked; unlike the default mode="raise", mode="wrap"
+        # doesn't make np.take buffer the output
+        np.take(head, self.private_nodelist, out=self.head, mode="wrap")
 
     @property
     def n_bound(self) -> int:
@@ -537,8 +673,7 @@ class Mf6HeadBoundary(Mf6Boundary):
             sign is positive for infiltration
         """
         # Avoid allocating large arrays
-        self.set_private_nodelist()
-        self.head[:] = head[self.private_nodelist]
+        self._set_head(head)
         np.multiply(self.hcof, self.head, out=self.q)
         self.q -= self.rhs
         return self.q
@@ -577,6 +712,11 @@ class Mf6River(Mf6HeadBoundary):
     def water_level(self) -> NDArray[np.float64]:
         return self.stage
 
+    @property
+    def bottom(self) -> NDArray[np.float64]:
+        """The level below which the head does not affect the flux estimate"""
+        return self.bottom_elevation
+
     def set_water_level(self, new_water_level: NDArray[np.float64]) -> None:
         np.maximum(self.bottom_minimum, new_water_level, out=self.stage)
 
@@ -606,10 +746,9 @@ class Mf6River(Mf6HeadBoundary):
             sign is positive for infiltration
         """
 
-        self.set_private_nodelist()
-        self.head[:] = head[self.private_nodelist]
-        max_head = np.maximum(self.head, self.bottom_elevation)
-        np.subtract(self.stage, max_head, out=self.q_estimate)
+        self._set_head(head)
+        np.maximum(self.head, self.bottom_elevation, out=self.q_estimate)
+        np.subtract(self.stage, self.q_estimate, out=self.q_estimate)
         np.multiply(self.conductance, self.q_estimate, out=self.q_estimate)
         return self.q_estimate
 
@@ -640,6 +779,11 @@ class Mf6Drainage(Mf6HeadBoundary):
     def water_level(self) -> NDArray[np.float64]:
         return self.elevation
 
+    @property
+    def bottom(self) -> NDArray[np.float64]:
+        """The level below which the head does not affect the flux estimate"""
+        return self.elevation
+
     def set_water_level(self, new_water_level: NDArray[np.float64]) -> None:
         np.maximum(self.elevation_minimum, new_water_level, out=self.elevation)
 
@@ -667,9 +811,223 @@ class Mf6Drainage(Mf6HeadBoundary):
             flux (array size = nr of river nodes)
             sign is positive for infiltration
         """
-        self.set_private_nodelist()
-        self.head[:] = head[self.private_nodelist]
-        max_head = np.maximum(self.head, self.elevation)
-        np.subtract(self.elevation, max_head, out=self.q_estimate)
+        self._set_head(head)
+        np.maximum(self.head, self.elevation, out=self.q_estimate)
+        np.subtract(self.elevation, self.q_estimate, out=self.q_estimate)
+        np.multiply(self.conductance, self.q_estimate, out=self.q_estimate)
+        return self.q_estimate
+
+
+class Mf6BoundaryGroup:
+    """
+    River and drainage packages of a flow model, stacked into contiguous arrays
+
+    The nodelists, HCOF, RHS, conductances, water levels and bottoms of all
+    packages are gathered from the MODFLOW 6 pointers into stacked arrays,
+    so that the fluxes of all packages are computed in a single vectorised
+    pass. The entries of a package are found at `slices[key]` of every
+    stacked array.
+
+    The memory of the pointers belongs to MODFLOW 6, so the stacked arrays
+    can't be views of them. Only the nodelists are stacked once per stress
+    period. The other arrays are copied into the preallocated stacked
+    arrays on every call, without allocating. HCOF and RHS change every
+    iteration, the water levels are set by the coupler every time step, and
+    conductances and bottoms may change every time step through the time
+    series of MODFLOW 6. The stacked arrays, e.g. the returned fluxes, are
+    overwritten by the next call.
+
+    Parameters
+    ----------
+    packages : Mapping[str, Mf6River | Mf6Drainage]
+        The packages, by their user-assigned component name
+    """
+
+    packages: dict[str, Mf6River | Mf6Drainage]
+    slices: dict[str, slice]
+    n_bound: int
+    nodelist: NDArray[np.int32]  # 0-based
+    nodelist_period: int  # the stress period the nodelist was stacked in
+    head: NDArray[np.float64]
+    q: NDArray[np.float64]
+    q_estimate: NDArray[np.float64]
+
+    def __init__(self, packages: Mapping[str, Mf6River | Mf6Drainage]):
+        self.packages = dict(packages)
+        offsets = np.cumsum([0] + [package.n_bound for package in packages.values()])
+        self.slices = {
+            key: slice(start, end)
+            for key, start, end in zip(packages, offsets[:-1], offsets[1:])
+        }
+        self.n_bound = int(offsets[-1])
+        self.nodelist = np.empty(self.n_bound, dtype=np.int32)
+        self.nodelist_period = -1
+        self.head = np.empty(self.n_bound, dtype=np.float64)
+        self.hcof = np.empty_like(self.head)
+        self.rhs = np.empty_like(self.head)
+        self.conductance = np.empty_like(self.head)
+        self.water_level = np.empty_like(self.head)
+        self.bottom = np.empty_like(self.head)
+        self.q = np.empty_like(self.head)
+        self.q_estimate = np.empty_like(self.head)
+
+    def __len__(self) -> int:
+        return len(self.packages)
+
+    def _stack(self, arrays: Iterable[NDArray[Any]], out: NDArray[Any]) -> None:
+        if self.packages:
+            np.concatenate(list(arrays), out=out)
+
+    def _set_head(self, head: NDArray[np.float64]) -> None:
+        if not self.packages:
+            return
+        # the nodelists only change when MODFLOW 6 reads new period data
+        stress_period = next(iter(self.packages.values())).mf6_wrapper.stress_period
+        if self.nodelist_period != stress_period:
+            self._stack(
+                (package.nodelist for package in self.packages.values()), self.nodelist
+            )
+            # Fortran 1-based versus Python 0-based indexing
+            self.nodelist -= 1
+            check_bounds(
+                self.nodelist,
+                head.size,
+                "node",
+                f"the nodelists of {', '.join(self.packages)}",
+            )
+            self.nodelist_period = stress_period
+        # the nodes are checked; unlike the default mode="raise", mode="wrap"
+        # doesn't make np.take buffer the output
+        np.take(head, self.nodelist, out=self.head, mode="wrap")
+
+    def get_flux(self, head: NDArray[np.float64]) -> NDArray[np.float64]:
+        """
+        Returns the stacked fluxes of all packages, computed from HCOF and RHS
+        like `Mf6HeadBoundary.get_flux`.
+
+        Parameters
+        ----------
+        head: NDArray[np.float64]
+            The MODFLOW6 head for every cell.
+
+        Returns
+        -------
+        NDArray[np.float64]
+            flux (array size = total nr of boundary nodes)
+            sign is positive for infiltration
+        """
+        packages = self.packages.values()
+        self._set_head(head)
+        self._stack((package.hcof for package in packages), self.hcof)
+        self._stack((package.rhs for package in packages), self.rhs)
+        np.multiply(self.hcof, self.head, out=self.q)
+        self.q -= self.rhs
+        return self.q
+
+    def get_flux_estimate(self, head: NDArray[np.float64]) -> NDArray[np.float64]:
+        """
+        Returns the stacked flux estimates of all packages, like
+        `Mf6River.get_flux_estimate` and `Mf6Drainage.get_flux_estimate`:
+        flux = conductance * (water level - max(head, bottom))
+
+        Parameters
+        ----------
+        head: NDArray[np.float64]
+            The MODFLOW6 head for every cell.
+
+        Returns
+        -------
+        NDArray[np.float64]
+            flux (array size = total nr of boundary nodes)
+            sign is positive for infiltration
+        """
+        packages = self.packages.values()
+        self._set_head(head)
+        self._stack((package.conductance for package in packages), self.conductance)
+        self._stack((package.water_level for package in packages), self.water_level)
+        self._stack((package.bottom for package in packages), self.bottom)
+        np.maximum(self.head, self.bottom, out=self.q_estimate)
+        np.subtract(self.water_level, self.q_estimate, out=self.q_estimate)
         np.multiply(self.conductance, self.q_estimate, out=self.q_estimate)
         return self.q_estimate
+
+    def stack_mapping(
+        self,
+        mappings: Mapping[str, csr_matrix | spmatrix | sparray],
+        rows: NDArray[np.intp] | None = None,
+    ) -> csr_matrix:
+        """
+        Returns the block diagonal matrix of a mapping of every package.
+
+        For mappings of size (ntgt x n_bound of the package), the product of
+        the stacked matrix with stacked values reshaped to (len(self), ntgt)
+        gives the mapped values of every package. When `rows` is given, every
+        mapping is restricted to those target entries, and the product is
+        reshaped to (len(self), rows.size) instead.
+        """
+        if not self.packages:
+            return csr_matrix((0, 0), dtype=np.float64)
+        blocks = [csr_matrix(mappings[key]) for key in self.packages]
+        if rows is not None:
+            blocks = [block[rows] for block in blocks]
+        return csr_matrix(block_diag(blocks))
+
+
+class Mf6RechargeArea:
+    """
+    The inverse of the cell area of rows of the nodelist of a recharge
+    package, to convert the coupled recharge from a volume per time to a
+    flux per area.
+
+    The nodelist is only filled when MODFLOW 6 reads the period data, so the
+    inverse area is computed at the first use in every stress period, and
+    reused for the other iterations and time steps of the stress period.
+
+    Parameters
+    ----------
+    mf6_wrapper : Mf6Wrapper
+        The MODFLOW 6 kernel
+    mf6_flowmodel_key : str
+        The user-assigned component name of the flow model
+    mf6_pkg_key : str
+        The user-assigned component name of the recharge package
+    rows : NDArray[np.intp]
+        The rows of the nodelist, e.g. the rows set by an exchange
+    """
+
+    inverse_area: NDArray[np.float64]  # the inverse cell area of every row
+    nodelist_period: int  # the stress period the inverse area was computed in
+
+    def __init__(
+        self,
+        mf6_wrapper: Mf6Wrapper,
+        mf6_flowmodel_key: str,
+        mf6_pkg_key: str,
+        rows: NDArray[np.intp],
+    ):
+        self.mf6_wrapper = mf6_wrapper
+        self.mf6_flowmodel_key = mf6_flowmodel_key
+        self.mf6_pkg_key = mf6_pkg_key
+        self.rows = rows
+        self.nodes = np.empty(rows.size, dtype=np.intp)
+        self.inverse_area = np.empty(rows.size, dtype=np.float64)
+        self.nodelist_period = -1
+
+    def get_inverse_area(self) -> NDArray[np.float64]:
+        stress_period = self.mf6_wrapper.stress_period
+        if self.nodelist_period != stress_period:
+            nodelist = self.mf6_wrapper.get_recharge_nodes(
+                self.mf6_flowmodel_key, self.mf6_pkg_key
+            )
+            area = self.mf6_wrapper.get_area(self.mf6_flowmodel_key)
+            # Fortran 1-based versus Python 0-based indexing
+            np.subtract(nodelist[self.rows], 1, out=self.nodes)
+            check_bounds(
+                self.nodes,
+                area.size,
+                "node",
+                f"the nodelist of {self.mf6_flowmodel_key}/{self.mf6_pkg_key}",
+            )
+            np.divide(1.0, area[self.nodes], out=self.inverse_area)
+            self.nodelist_period = stress_period
+        return self.inverse_area
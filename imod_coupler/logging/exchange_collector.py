@@ -1,75 +1,708 @@
 import abc
+import json
+from collections.abc import Callable
+from functools import partial
 from pathlib import Path
+from queue import Queue
+from threading import Thread
 from typing import Any
 
 import netCDF4 as nc
 import numpy as np
 import tomli
 from numpy.typing import NDArray
+from scipy.sparse import csr_matrix
 from typing_extensions import Self
 
+from imod_coupler.exchange_operator import ExchangeOperator
+from imod_coupler.io import check_bounds, load_table
+from imod_coupler.logging.timing_registry import TimingRegistry, timed
+
+
+def check_shape(exchange: NDArray[Any], shape: tuple[int, ...], name: str) -> None:
+    """
+    Raises when the shape of an exchange differs from the shape of its first
+    exchange, instead of broadcasting e.g. a single value to all entries.
+    """
+    if np.shape(exchange) != shape:
+        raise ValueError(
+            f"Expected exchange {name} of shape {shape}, found {np.shape(exchange)}"
+        )
+
 
 class AbstractExchange(abc.ABC):
     @abc.abstractmethod
     def write_exchange(self, exchange: NDArray[Any], time: float) -> None:
         pass
 
+    def end_time_step(self, converged: bool) -> None:
+        """Called when a time step of the driver is complete"""
+        pass
+
     @abc.abstractmethod
     def finalize(self) -> None:
         pass
 
 
 class NetcdfExchangeLogger(AbstractExchange):
+    """
+    Logs an exchange to a netCDF file, with a row for every logged time.
+
+    Rows are collected in a preallocated buffer, which is written to the file
+    as one block when it is full, on a write with `sync` and in `finalize`.
+    The row of every logged time is kept in memory, so that an exchange
+    logged again at the same time, e.g. in a next iteration, overwrites its
+    row without reading the file.
+
+    The properties of the exchange may set:
+
+    - `buffer_size`: the number of buffered rows. By default, the buffer
+      holds `DEFAULT_BUFFER_BYTES`.
+    - `dtype`: the type the values are stored as, "f8" (default) or "f4"
+    - `zlib`, `complevel` and `shuffle`: the compression of the values
+    - `chunksizes`: the chunk shape (time, id) of the values
+
+    When `dataset` is given, the exchange is logged to a group named after
+    the exchange in that dataset, instead of to a file of its own. When
+    `ids` is set before the first exchange is logged, it is written as the
+    `id` variable.
+    """
+
     output_file: Path
     name: str
+    rows: dict[float, int]  # the row of every logged time
+    pos: int  # the number of rows
+    flushed: int  # the number of rows written to the file
+    buffer_size: int | None
+    dtype: np.dtype[Any]
+    chunksizes: list[int] | None
+    compression: dict[str, Any]
+    owns_dataset: bool  # whether the dataset is closed in finalize
+    ids: NDArray[np.int64] | None  # the ids of the logged entries
 
-    def __init__(self, name: str, output_dir: Path, properties: dict[str, Any]):
-        if not (Path.is_dir(output_dir)):
-            Path.mkdir(output_dir)
-        output_file = Path.joinpath(output_dir, name + ".nc")
-        self.ds = nc.Dataset(output_file, "w")
+    DEFAULT_BUFFER_BYTES = 16 * 1024 * 1024
+
+    def __init__(
+        self,
+        name: str,
+        output_dir: Path,
+        properties: dict[str, Any],
+        dataset: nc.Dataset | None = None,
+    ):
+        if dataset is None:
+            if not (Path.is_dir(output_dir)):
+                Path.mkdir(output_dir)
+            output_file = Path.joinpath(output_dir, name + ".nc")
+            self.ds = nc.Dataset(output_file, "w")
+            self.owns_dataset = True
+        else:
+            self.ds = dataset.createGroup(name)
+            self.owns_dataset = False
         self.name = name
+        self.ids = None
+        self.rows = {}
+        self.pos = 0
+        self.flushed = 0
+        self.buffer_size = properties.get("buffer_size")
+        self.dtype = np.dtype(properties.get("dtype", "f8"))
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(
+                f"dtype of exchange {name} should be f4 or f8, not {self.dtype}"
+            )
+        self.chunksizes = properties.get("chunksizes")
+        self.compression = {
+            "zlib": properties.get("zlib", False),
+            "complevel": properties.get("complevel", 4),
+            "shuffle": properties.get("shuffle", True),
+        }
 
-    def initfile(self, ndx: int) -> None:
+    def initfile(self, ndx: int, niteration: int | None = None) -> None:
+        """
+        Creates the variables, for exchanges of size `ndx`, or for blocks of
+        (niteration x ndx) when `niteration` is given
+        """
         self.nodedim = self.ds.createDimension("id", ndx)
         self.timedim = self.ds.createDimension("time", None)
+        dimensions: tuple[str, ...] = ("time", "id")
+        row_shape: tuple[int, ...] = (ndx,)
+        if niteration is not None:
+            self.iterationdim = self.ds.createDimension("iteration", niteration)
+            dimensions = ("time", "iteration", "id")
+            row_shape = (niteration, ndx)
         self.timevar = self.ds.createVariable("time", "f8", ("time",))
+        if self.ids is not None:
+            self.idvar = self.ds.createVariable("id", "i8", ("id",))
+            self.idvar[:] = self.ids
+        chunksizes = None
+        if self.chunksizes is not None:
+            chunk_time, chunk_id = self.chunksizes
+            chunksizes = (chunk_time, *row_shape[:-1], max(min(chunk_id, ndx), 1))
         self.datavar = self.ds.createVariable(
             "xchg",
-            "f8",
-            (
-                "time",
-                "id",
-            ),
+            self.dtype,
+            dimensions,
+            chunksizes=chunksizes,
+            **self.compression,
         )
-        self.pos = 0
+        buffer_size = self.buffer_size
+        if buffer_size is None:
+            row_size = int(np.prod(row_shape))
+            buffer_size = self.DEFAULT_BUFFER_BYTES // (8 * max(row_size, 1))
+            if chunksizes is not None:
+                # write whole chunks
+                chunk_time = chunksizes[0]
+                buffer_size = max(buffer_size // chunk_time, 1) * chunk_time
+        buffer_size = max(int(buffer_size), 1)
+        self.buffer = np.empty((buffer_size, *row_shape), dtype=np.float64)
+        self.buffer_time = np.empty(buffer_size, dtype=np.float64)
 
     def write_exchange(
         self, exchange: NDArray[Any], time: float, sync: bool = False
     ) -> None:
         if len(self.ds.dimensions) == 0:
-            self.initfile(len(exchange))
-        loc = np.where(self.timevar[:] == time)
-        if np.size(loc) > 0:
-            first = int(loc[0])
-            self.datavar[first, :] = exchange[:]
-        else:
-            self.timevar[self.pos] = time
-            self.datavar[self.pos, :] = exchange[:]
+            if np.ndim(exchange) == 2:
+                self.initfile(exchange.shape[1], exchange.shape[0])
+            else:
+                self.initfile(len(exchange))
+        check_shape(exchange, self.buffer.shape[1:], self.name)
+        row = self.rows.get(time)
+        if row is None:
+            if self.pos - self.flushed == len(self.buffer):
+                self.flush()
+            row = self.pos
+            self.rows[time] = row
+            self.buffer_time[row - self.flushed] = time
             self.pos += 1
+        if row >= self.flushed:
+            self.buffer[row - self.flushed] = exchange
+        else:
+            self.datavar[row, ...] = exchange
         if sync:
+            self.flush()
             self.ds.sync()
 
+    def flush(self) -> None:
+        """Writes the buffered rows to the file"""
+        n = self.pos - self.flushed
+        if n > 0:
+            self.timevar[self.flushed : self.pos] = self.buffer_time[:n]
+            self.datavar[self.flushed : self.pos, ...] = self.buffer[:n]
+            self.flushed = self.pos
+
+    def finalize(self) -> None:
+        if len(self.ds.dimensions) > 0:
+            self.flush()
+        if self.owns_dataset:
+            self.ds.close()
+
+
+class BinaryExchangeLogger(AbstractExchange):
+    """
+    Logs an exchange to a memory-mapped `.npy` file, with a row for every
+    logged time.
+
+    A write is a copy into the page cache, and the file can be opened with
+    `np.load(path, mmap_mode="r")` without reading it. The times, and the
+    ids of the entries when set, are stored in a JSON file next to it. The
+    file is allocated for `capacity` rows (default 1024), and doubled in
+    size when it is full. In `finalize`, it is truncated to the logged rows
+    and the JSON file is written.
+
+    Like `NetcdfExchangeLogger`, an exchange logged again at the same time
+    overwrites its row, and the values are stored as `dtype` "f8"
+    (default) or "f4".
+    """
+
+    output_file: Path
+    sidecar_file: Path
+    name: str
+    rows: dict[float, int]  # the row of every logged time
+    times: list[float]
+    dtype: np.dtype[Any]
+    capacity: int
+    ids: NDArray[np.int64] | None  # the ids of the logged entries
+    array: np.memmap[Any, np.dtype[Any]] | None
+
+    # the size of the .npy header, which is kept the same when the shape changes
+    HEADER_SIZE = 128
+
+    def __init__(self, name: str, output_dir: Path, properties: dict[str, Any]):
+        output_dir.mkdir(parents=True, exist_ok=True)
+        self.output_file = output_dir / f"{name}.npy"
+        self.sidecar_file = output_dir / f"{name}.json"
+        self.name = name
+        self.rows = {}
+        self.times = []
+        self.ids = None
+        self.array = None
+        self.dtype = np.dtype(properties.get("dtype", "f8"))
+        if self.dtype not in (np.float32, np.float64):
+            raise ValueError(
+                f"dtype of exchange {name} should be f4 or f8, not {self.dtype}"
+            )
+        self.capacity = max(int(properties.get("capacity", 1024)), 1)
+
+    def _write_header(self, nrow: int, row_shape: tuple[int, ...]) -> None:
+        header = repr(
+            {
+                "descr": self.dtype.str,
+                "fortran_order": False,
+                "shape": (nrow, *row_shape),
+            }
+        )
+        # magic string, version 1.0 and the length of the header, which is
+        # padded with spaces so that it has the same size for every shape
+        header_size = self.HEADER_SIZE - 10
+        with open(self.output_file, "r+b") as f:
+            f.write(b"\x93NUMPY\x01\x00")
+            f.write(header_size.to_bytes(2, "little"))
+            f.write(header.ljust(header_size - 1).encode("latin1") + b"\n")
+
+    def _resize(self, nrow: int, row_shape: tuple[int, ...]) -> None:
+        row_bytes = int(np.prod(row_shape)) * self.dtype.itemsize
+        with open(self.output_file, "r+b") as f:
+            f.truncate(self.HEADER_SIZE + nrow * row_bytes)
+        self._write_header(nrow, row_shape)
+
+    def _allocate(self, nrow: int, row_shape: tuple[int, ...]) -> None:
+        """(Re)maps the file for nrow rows, keeping the logged rows"""
+        if self.array is not None:
+            self.array.flush()
+            self.array = None
+        else:
+            self.output_file.write_bytes(b"")
+        self._resize(nrow, row_shape)
+        self.array = np.memmap(
+            self.output_file,
+            dtype=self.dtype,
+            mode="r+",
+            offset=self.HEADER_SIZE,
+            shape=(nrow, *row_shape),
+        )
+
+    def write_exchange(self, exchange: NDArray[Any], time: float) -> None:
+        if self.array is None:
+            # an exchange, or a block of (iteration x id)
+            self._allocate(self.capacity, np.shape(exchange))
+        assert self.array is not None
+        check_shape(exchange, self.array.shape[1:], self.name)
+        row = self.rows.get(time)
+        if row is None:
+            row = len(self.times)
+            if row == len(self.array):
+                self._allocate(2 * len(self.array), self.array.shape[1:])
+                assert self.array is not None
+            self.rows[time] = row
+            self.times.append(time)
+        self.array[row] = exchange
+
+    def finalize(self) -> None:
+        if self.array is None:
+            return
+        row_shape = self.array.shape[1:]
+        nrow = len(self.times)
+        self.array.flush()
+        self.array = None
+        self._resize(nrow, row_shape)
+        sidecar: dict[str, Any] = {
+            "name": self.name,
+            "dtype": self.dtype.str,
+            "shape": [nrow, *row_shape],
+            "time": self.times,
+        }
+        if self.ids is not None:
+            sidecar["id"] = self.ids.tolist()
+        with open(self.sidecar_file, "w") as f:
+            json.dump(sidecar, f, indent=2)
+
+
+class TemporalExchange(AbstractExchange):
+    """
+    Logs a selection or aggregation in time of an exchange to another
+    exchange logger.
+
+    The last exchange logged at a time is the state of the time step, which
+    is complete when the driver calls `end_time_step`, or else when an
+    exchange is logged at another time. The properties of the exchange may
+    set:
+
+    - `converged_only`: skip time steps that didn't converge
+    - `every`: only log every N-th time step, starting at the first
+    - `aggregate`: "mean", "sum", "min" or "max" of the (selected) time
+      steps, over either `steps` time steps, or a calendar `period` ("day",
+      "month" or "year") counted from `start_date`. A time step belongs to
+      the period in which it starts. An aggregate is logged at the time of
+      its last time step.
+    - `start_time`: the simulated time at which the first time step starts,
+      0.0 by default, like the start time of MODFLOW 6
+
+    The aggregates are accumulated in memory, so that only the aggregated
+    records are written.
+    """
+
+    name: str
+    exchange: AbstractExchange
+    converged_only: bool
+    every: int
+    aggregate: str | None
+    steps: int | None
+    period: str | None
+    start_date: np.datetime64 | None
+    start_time: float
+
+    AGGREGATES = ("mean", "sum", "min", "max")
+    PERIODS = {"day": "D", "month": "M", "year": "Y"}
+    KEYS = ("converged_only", "every", "aggregate", "steps", "period")
+
+    def __init__(
+        self, name: str, exchange: AbstractExchange, properties: dict[str, Any]
+    ):
+        self.name = name
+        self.exchange = exchange
+        self.converged_only = bool(properties.get("converged_only", False))
+        self.every = int(properties.get("every", 1))
+        self.aggregate = properties.get("aggregate")
+        self.steps = properties.get("steps")
+        self.period = properties.get("period")
+        self.start_date = None
+        self.start_time = float(properties.get("start_time", 0.0))
+        if self.every < 1:
+            raise ValueError(f"every of exchange {name} should be at least 1")
+        if self.aggregate is not None:
+            if self.aggregate not in self.AGGREGATES:
+                raise ValueError(
+                    f"aggregate of exchange {name} should be one of "
+                    f"{', '.join(self.AGGREGATES)}, not {self.aggregate}"
+                )
+            if (self.steps is None) == (self.period is None):
+                raise ValueError(
+                    f"Exchange {name} should aggregate over either steps or a period"
+                )
+            if self.period is not None:
+                if self.period not in self.PERIODS:
+                    raise ValueError(
+                        f"period of exchange {name} should be one of "
+                        f"{', '.join(self.PERIODS)}, not {self.period}"
+                    )
+                if "start_date" not in properties:
+                    raise ValueError(
+                        f"Exchange {name} aggregates per {self.period}, "
+                        "which requires a start_date"
+                    )
+                self.start_date = np.datetime64(str(properties["start_date"]), "s")
+        self.pending: NDArray[np.float64] | None = None
+        self.pending_time: float | None = None
+        self.previous_time = self.start_time  # the end of the previous time step
+        self.nstep = 0  # the number of complete time steps
+        self.accumulator: NDArray[np.float64] | None = None
+        self.count = 0  # the number of time steps in the accumulator
+        self.window_time = 0.0  # the time of the last time step in the accumulator
+        self.window: Any = None  # the calendar period of the accumulator
+
+    def write_exchange(self, exchange: NDArray[Any], time: float) -> None:
+        if self.pending_time is not None and time != self.pending_time:
+            self.end_time_step(True)
+        if self.pending is None:
+            self.pending = np.array(exchange, dtype=np.float64)
+        else:
+            check_shape(exchange, self.pending.shape, self.name)
+            self.pending[:] = exchange
+        self.pending_time = time
+
+    def end_time_step(self, converged: bool) -> None:
+        if self.pending is None or self.pending_time is None:
+            return
+        time, self.pending_time = self.pending_time, None
+        previous_time, self.previous_time = self.previous_time, time
+        if self.converged_only and not converged:
+            return
+        self.nstep += 1
+        if (self.nstep - 1) % self.every != 0:
+            return
+        if self.aggregate is None:
+            self.exchange.write_exchange(self.pending, time)
+            return
+
+        if self.start_date is not None:
+            assert self.period is not None
+            seconds = np.timedelta64(int(round(previous_time * 86400.0)), "s")
+            window = (self.start_date + seconds).astype(
+                f"datetime64[{self.PERIODS[self.period]}]"
+            )
+            if self.count > 0 and window != self.window:
+                self._write_window()
+            self.window = window
+        self._accumulate(self.pending)
+        self.window_time = time
+        if self.count == self.steps:
+            self._write_window()
+
+    def _accumulate(self, values: NDArray[np.float64]) -> None:
+        if self.accumulator is None:
+            self.accumulator = np.empty_like(values)
+        if self.count == 0:
+            self.accumulator[:] = values
+        elif self.aggregate in ("mean", "sum"):
+            self.accumulator += values
+        elif self.aggregate == "min":
+            np.minimum(self.accumulator, values, out=self.accumulator)
+        else:
+            np.maximum(self.accumulator, values, out=self.accumulator)
+        self.count += 1
+
+    def _write_window(self) -> None:
+        assert self.accumulator is not None
+        if self.aggregate == "mean":
+            self.accumulator /= self.count
+        self.exchange.write_exchange(self.accumulator, self.window_time)
+        self.count = 0
+
+    def finalize(self) -> None:
+        self.end_time_step(True)
+        if self.count > 0:
+            self._write_window()
+        self.exchange.finalize()
+
+
+class SpatialExchange(AbstractExchange):
+    """
+    Logs a subset, or zonal statistics, of an exchange to another exchange
+    logger.
+
+    The properties of the exchange should set one of:
+
+    - `indices`: the (0-based) indices of the entries to log
+    - `indices_file`: a file with these indices, one per line
+    - `zones_file`: a file with the integer zone id of every entry, one per
+      line. Entries with a negative zone id are not part of a zone. With
+      `zonal`, "sum" (default) or "mean", the statistic of every zone is
+      logged, in the order of the zone ids.
+
+    The subset or the zonal statistics are computed by an `ExchangeOperator`
+    with a sparse aggregation matrix, built when the first exchange is
+    logged.
+    """
+
+    exchange: AbstractExchange
+    name: str
+    ids: NDArray[np.int64]  # the logged indices or zone ids
+    indices: NDArray[np.int32] | None
+    zones: NDArray[np.int32] | None
+    zonal: str
+    operator: ExchangeOperator | None
+
+    KEYS = ("indices", "indices_file", "zones_file")
+    ZONAL = ("sum", "mean")
+
+    def __init__(
+        self, name: str, exchange: AbstractExchange, properties: dict[str, Any]
+    ):
+        self.exchange = exchange
+        self.name = name
+        self.indices = None
+        self.zones = None
+        self.operator = None
+        self.zonal = properties.get("zonal", "sum")
+        given = [key for key in self.KEYS if key in properties]
+        if len(given) != 1:
+            raise ValueError(
+                f"Exchange {name} should set one of {', '.join(self.KEYS)}, "
+                f"not {', '.join(given)}"
+            )
+        if self.zonal not in self.ZONAL:
+            raise ValueError(
+                f"zonal of exchange {name} should be one of "
+                f"{', '.join(self.ZONAL)}, not {self.zonal}"
+            )
+        if "indices" in properties:
+            self.indices = np.asarray(properties["indices"], dtype=np.int32)
+        elif "indices_file" in properties:
+            self.indices = load_table(properties["indices_file"], ncol=1)[:, 0]
+        else:
+            self.zones = load_table(properties["zones_file"], ncol=1)[:, 0]
+        if self.indices is not None:
+            self.ids = self.indices.astype(np.int64)
+        else:
+            assert self.zones is not None
+            self.ids = np.unique(self.zones[self.zones >= 0]).astype(np.int64)
+        self.values = np.empty(self.ids.size, dtype=np.float64)
+
+    def create_operator(self, size: int) -> ExchangeOperator:
+        """Returns the operator of the subset or zonal statistics of `size` entries"""
+        columns: NDArray[Any]
+        if self.indices is not None:
+            check_bounds(self.indices, size, "index", f"exchange {self.name}")
+            rows = np.arange(self.indices.size)
+            columns = self.indices
+            data = np.ones(self.indices.size, dtype=np.float64)
+        else:
+            assert self.zones is not None
+            if self.zones.size != size:
+                raise ValueError(
+                    f"Expected {self.zones.size} values for exchange {self.name}, "
+                    f"found {size}"
+                )
+            columns = np.flatnonzero(self.zones >= 0)
+            rows = np.searchsorted(self.ids, self.zones[columns])
+            data = np.ones(columns.size, dtype=np.float64)
+            if self.zonal == "mean":
+                data /= np.bincount(rows, minlength=self.ids.size)[rows]
+        matrix = csr_matrix((data, (rows, columns)), shape=(self.ids.size, size))
+        return ExchangeOperator(matrix, np.zeros(self.ids.size, dtype=np.int8))
+
+    def write_exchange(self, exchange: NDArray[Any], time: float) -> None:
+        if self.operator is None:
+            self.operator = self.create_operator(np.shape(exchange)[-1])
+        if np.ndim(exchange) == 2:
+            # a block of (iteration x id) of an `IterationExchange`
+            shape = (len(exchange), self.ids.size)
+            if self.values.shape != shape:
+                self.values = np.empty(shape, dtype=np.float64)
+            for source, target in zip(exchange, self.values):
+                self.operator.exchange(source, target)
+        else:
+            self.operator.exchange(exchange, self.values)
+        self.exchange.write_exchange(self.values, time)
+
+    def end_time_step(self, converged: bool) -> None:
+        self.exchange.end_time_step(converged)
+
+    def finalize(self) -> None:
+        self.exchange.finalize()
+
+
+class IterationExchange(AbstractExchange):
+    """
+    Logs the exchange of every outer iteration of a time step to another
+    exchange logger.
+
+    The exchanges of a time step are kept in a preallocated block of
+    (`iterations` x id), which is written once, as a record of the time step,
+    with a (time, iteration, id) layout. Iterations that weren't reached are
+    NaN. Iterations beyond `iterations` overwrite the last row, so that it
+    always holds the final iteration. An exchange logged outside of the
+    convergence loop is logged as the first iteration.
+    """
+
+    name: str
+    exchange: AbstractExchange
+    iterations: int
+    block: NDArray[np.float64] | None
+    block_time: float | None  # the time of the logged block, if any
+
+    KEYS = ("iterations",)
+
+    def __init__(
+        self, name: str, exchange: AbstractExchange, properties: dict[str, Any]
+    ):
+        self.name = name
+        self.exchange = exchange
+        self.iterations = int(properties["iterations"])
+        if self.iterations < 1:
+            raise ValueError(f"iterations of exchange {name} should be at least 1")
+        self.block = None
+        self.block_time = None
+
+    def write_iteration(
+        self, exchange: NDArray[Any], time: float, iteration: int
+    ) -> None:
+        if self.block_time is not None and time != self.block_time:
+            self._write_block()
+        if self.block is None:
+            self.block = np.empty((self.iterations, len(exchange)), dtype=np.float64)
+        if self.block_time is None:
+            self.block.fill(np.nan)
+            self.block_time = time
+        row = min(iteration, self.iterations) - 1
+        check_shape(exchange, self.block.shape[1:], self.name)
+        self.block[row] = exchange
+
+    def write_exchange(self, exchange: NDArray[Any], time: float) -> None:
+        self.write_iteration(exchange, time, 1)
+
+    def _write_block(self) -> None:
+        if self.block is not None and self.block_time is not None:
+            self.exchange.write_exchange(self.block, self.block_time)
+            self.block_time = None
+
+    def end_time_step(self, converged: bool) -> None:
+        self._write_block()
+        self.exchange.end_time_step(converged)
+
     def finalize(self) -> None:
-        self.ds.close()
+        self._write_block()
+        self.exchange.finalize()
 
 
 class ExchangeCollector:
+    """
+    Logs the exchanges configured in the output TOML file.
+
+    With `output_file` in the general settings, all exchanges are logged to
+    groups in that single file, instead of to a file per exchange. The
+    storage settings of `NetcdfExchangeLogger`, e.g. `zlib` or `dtype`, can
+    be set for all exchanges in the general settings as well.
+
+    An exchange with any of the properties of `TemporalExchange`, e.g.
+    `every` or `aggregate`, is only logged for a selection or an aggregation
+    of the time steps. An exchange with any of the properties of
+    `SpatialExchange`, e.g. `zones_file`, is only logged for a subset or per
+    zone, before any aggregation in time. The drivers call `end_time_step` after every time step.
+
+    The drivers set `iteration` to the outer iteration during their
+    convergence loop. By default, an exchange logged in the loop is only
+    copied to memory, and only its state of the last iteration is logged at
+    the end of the time step, so that intra-iteration logging costs no I/O.
+    An exchange with `iterations = N` is logged for each of the first N
+    iterations instead, see `IterationExchange`.
+
+    With `asynchronous = true` in the general settings, `log_exchange` only
+    puts a copy of the exchange in a queue, which is written by a writer
+    thread, so that the coupling loop doesn't wait for the file I/O. The
+    queue holds at most `queue_size` exchanges, after which `log_exchange`
+    waits until the writer caught up. An error of the writer is raised by
+    the next call of `log_exchange` or by `finalize`, which waits until all
+    queued exchanges are written.
+    """
+
     exchanges: dict[str, AbstractExchange]
     output_dir: Path
+    timing_registry: TimingRegistry  # set by the driver when timing is enabled
+    queue: Queue[Callable[[], None] | None] | None
+    writer: Thread | None
+    writer_error: BaseException | None
+    dataset: nc.Dataset | None  # the single file of all exchanges
+    defaults: dict[str, Any]  # the default properties of all exchanges
+    iteration: int | None  # the outer iteration, set by the driver
+    last_iteration: dict[str, NDArray[Any]]  # exchanges logged in the loop
+    last_iteration_time: dict[str, float]  # their time, until they are logged
+
+    DEFAULT_QUEUE_SIZE = 64
+    # general settings that are default properties of all exchanges
+    EXCHANGE_DEFAULTS = (
+        "start_date",
+        "start_time",
+        "converged_only",
+        "buffer_size",
+        "dtype",
+        "zlib",
+        "complevel",
+        "shuffle",
+        "chunksizes",
+        "capacity",
+    )
 
     def __init__(self, config: dict[str, dict[str, Any]] | None = None):
         self.exchanges = {}
+        self.timing_registry = TimingRegistry(enabled=False)
+        self.queue = None
+        self.writer = None
+        self.writer_error = None
+        self.dataset = None
+        self.defaults = {}
+        self.iteration = None
+        self.last_iteration = {}
+        self.last_iteration_time = {}
 
     @classmethod
     def from_file(cls, output_toml_file: Path) -> Self:
@@ -82,6 +715,16 @@ class ExchangeCollector:
         new_instance = cls()
         general_settings = config["general"]
         new_instance.output_dir = Path(general_settings["output_dir"])
+        new_instance.defaults = {
+            key: value
+            for key, value in general_settings.items()
+            if key in cls.EXCHANGE_DEFAULTS
+        }
+        if "output_file" in general_settings:
+            new_instance.output_dir.mkdir(parents=True, exist_ok=True)
+            new_instance.dataset = nc.Dataset(
+                new_instance.output_dir / general_settings["output_file"], "w"
+            )
 
         exchanges_config = config["exchanges"]
 
@@ -89,20 +732,140 @@ class ExchangeCollector:
             new_instance.exchanges[exchange_name] = new_instance.create_exchange_object(
                 exchange_name, dict_def
             )
+        if general_settings.get("asynchronous", False):
+            new_instance.start_writer(
+                general_settings.get("queue_size", cls.DEFAULT_QUEUE_SIZE)
+            )
         return new_instance
 
+    def start_writer(self, queue_size: int = DEFAULT_QUEUE_SIZE) -> None:
+        """Writes all subsequently logged exchanges from a writer thread"""
+        self.queue = Queue(maxsize=queue_size)
+        self.writer = Thread(
+            target=self._write_queued, name="exchange-writer", daemon=True
+        )
+        self.writer.start()
+
+    def _write_queued(self) -> None:
+        assert self.queue is not None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.writer_error is not None:
+                continue  # keep emptying the queue, so that log_exchange won't block
+            try:
+                item()
+            except BaseException as e:
+                self.writer_error = e
+
+    def _raise_writer_error(self) -> None:
+        if self.writer_error is not None:
+            error, self.writer_error = self.writer_error, None
+            raise error
+
+    @timed("exchange_logging")
     def log_exchange(self, name: str, exchange: NDArray[Any], time: float) -> None:
-        if name in self.exchanges.keys():
-            self.exchanges[name].write_exchange(exchange, time)
+        if name not in self.exchanges.keys():
+            return
+        exchange_object = self.exchanges[name]
+        if self.iteration is None:
+            self._write(exchange_object.write_exchange, exchange, time)
+        elif isinstance(exchange_object, IterationExchange):
+            self._write(
+                partial(exchange_object.write_iteration, iteration=self.iteration),
+                exchange,
+                time,
+            )
+        else:
+            # only the state of the last iteration is logged, see `end_time_step`
+            values = self.last_iteration.get(name)
+            if values is None or values.shape != np.shape(exchange):
+                self.last_iteration[name] = np.array(exchange, copy=True)
+            else:
+                values[...] = exchange
+            self.last_iteration_time[name] = time
+
+    def _write(
+        self,
+        write: Callable[[NDArray[Any], float], None],
+        exchange: NDArray[Any],
+        time: float,
+    ) -> None:
+        if self.queue is None:
+            write(exchange, time)
+        else:
+            self._raise_writer_error()
+            # a copy, since the kernels update the exchanged arrays in place
+            self.queue.put(partial(write, np.array(exchange, copy=True), time))
+
+    def _log_last_iteration(self) -> None:
+        """Logs the exchanges of the last iteration of the convergence loop"""
+        for name, time in self.last_iteration_time.items():
+            self._write(
+                self.exchanges[name].write_exchange, self.last_iteration[name], time
+            )
+        # the buffers are reused in the next time step
+        self.last_iteration_time.clear()
+
+    def end_time_step(self, converged: bool = True) -> None:
+        """
+        Marks the end of a time step of the driver, after which the logged
+        exchanges are the state of that time step
+
+        Parameters
+        ----------
+        converged : bool
+            Whether the time step converged
+        """
+        self.iteration = None
+        self._log_last_iteration()
+        if self.queue is None:
+            self._end_time_step(converged)
+        else:
+            self._raise_writer_error()
+            self.queue.put(partial(self._end_time_step, converged))
+
+    def _end_time_step(self, converged: bool) -> None:
+        for exchange in self.exchanges.values():
+            exchange.end_time_step(converged)
 
     def create_exchange_object(
         self, flux_name: str, dict_def: dict[str, Any]
     ) -> AbstractExchange:
         typename = dict_def["type"]
+        properties = {**self.defaults, **dict_def}
+        exchange: AbstractExchange
+        logger: NetcdfExchangeLogger | BinaryExchangeLogger
         if typename == "netcdf":
-            return NetcdfExchangeLogger(flux_name, self.output_dir, dict_def)
-        raise ValueError("unkwnown type of exchange logger")
+            exchange = logger = NetcdfExchangeLogger(
+                flux_name, self.output_dir, properties, self.dataset
+            )
+        elif typename == "binary":
+            exchange = logger = BinaryExchangeLogger(
+                flux_name, self.output_dir, properties
+            )
+        else:
+            raise ValueError("unkwnown type of exchange logger")
+        if any(key in properties for key in TemporalExchange.KEYS):
+            exchange = TemporalExchange(flux_name, exchange, properties)
+        if any(key in properties for key in SpatialExchange.KEYS):
+            exchange = SpatialExchange(flux_name, exchange, properties)
+            logger.ids = exchange.ids
+        if any(key in properties for key in IterationExchange.KEYS):
+            exchange = IterationExchange(flux_name, exchange, properties)
+        return exchange
 
     def finalize(self) -> None:
+        self._log_last_iteration()
+        if self.queue is not None and self.writer is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.queue = None
+            self.writer = None
         for exchange in self.exchanges.values():
             exchange.finalize()
+        if self.dataset is not None:
+            self.dataset.close()
+            self.dataset = None
+        self._raise_writer_error()
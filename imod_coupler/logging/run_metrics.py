@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TextIO
+
+from loguru import logger
+from xmipy import XmiWrapper
+from xmipy.timers.timer import Timer
+
+from imod_coupler.logging.timing_registry import KERNEL_SETUP_FUNCTIONS
+
+
+class RunMetrics:
+    """
+    Writes a table of metrics per time step of a coupled run to a CSV file.
+
+    Every row holds the simulated time at the end of the time step, its
+    length `delt`, the number of outer iterations, whether it converged, the
+    wall time of the time step, the wall time spent in every kernel, the
+    coupler overhead (the wall time not spent in any kernel) and the
+    throughput in simulated time per hour of wall time. Rows are streamed to
+    the file as the time steps complete, so that the table of an aborted run
+    can be read as well.
+
+    The kernel times are taken from the XMI timers of the kernels, which are
+    enabled by `add_kernels` when timing is not.
+    """
+
+    path: Path
+    file: TextIO
+    kernels: dict[str, XmiWrapper]
+    nstep: int
+    nstep_not_converged: int
+    max_iterations: int
+    loop_time: float
+    simulated_time: float
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = csv.writer(self.file)
+        self.kernels = {}
+        self.nstep = 0
+        self.nstep_not_converged = 0
+        self.max_iterations = 0
+        self.loop_time = 0.0
+        self.simulated_time = 0.0
+        self._start = 0.0
+        self._kernel_start: list[float] = []
+
+    def add_kernels(self, kernels: dict[str, XmiWrapper]) -> None:
+        """Add a wall time column for every kernel, and write the header"""
+        for kernel in kernels.values():
+            if not kernel.timing:
+                kernel.timer = Timer(
+                    kernel.libname,
+                    "Elapsed time for {name}.{fn_name}: {seconds:0.4f} seconds",
+                )
+                kernel.timing = True
+        self.kernels = kernels
+        self.writer.writerow(
+            [
+                "step",
+                "time",
+                "delt",
+                "iterations",
+                "converged",
+                "wall_time",
+                *(f"{kernel_name}_time" for kernel_name in kernels),
+                "coupler_overhead",
+                "throughput",
+            ]
+        )
+
+    def _kernel_times(self) -> list[float]:
+        # the timers may be replaced after `add_kernels`, e.g. when tracing
+        return [
+            sum(
+                seconds
+                for fn_name, seconds in kernel.timer.timers.items()
+                if fn_name not in KERNEL_SETUP_FUNCTIONS
+            )
+            for kernel in self.kernels.values()
+        ]
+
+    def start_time_step(self) -> None:
+        self._kernel_start = self._kernel_times()
+        self._start = perf_counter()
+
+    def end_time_step(
+        self, time: float, delt: float, iterations: int, converged: bool
+    ) -> None:
+        """
+        Add the row of the time step that started at `start_time_step`
+
+        Parameters
+        ----------
+        time : float
+            The simulated time at the end of the time step
+        delt : float
+            The length of the time step
+        iterations : int
+            The number of outer iterations
+        converged : bool
+            Whether the time step converged
+        """
+        wall_time = perf_counter() - self._start
+        kernel_times = [
+            end - start for start, end in zip(self._kernel_start, self._kernel_times())
+        ]
+        coupler_overhead = max(wall_time - sum(kernel_times), 0.0)
+        throughput = 3600.0 * delt / wall_time if wall_time > 0.0 else 0.0
+        self.nstep += 1
+        self.writer.writerow(
+            [
+                self.nstep,
+                time,
+                delt,
+                iterations,
+                int(converged),
+                wall_time,
+                *kernel_times,
+                coupler_overhead,
+                throughput,
+            ]
+        )
+        if not converged:
+            self.nstep_not_converged += 1
+        self.max_iterations = max(self.max_iterations, iterations)
+        self.loop_time += wall_time
+        self.simulated_time += delt
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "steps": self.nstep,
+            "not_converged": self.nstep_not_converged,
+            "max_iterations": self.max_iterations,
+            "throughput": (
+                3600.0 * self.simulated_time / self.loop_time
+                if self.loop_time > 0.0
+                else 0.0
+            ),
+        }
+
+    def finalize(self) -> None:
+        self.file.close()
+        summary = self.summary()
+        logger.info(
+            f"{summary['steps']} time steps, of which {summary['not_converged']} "
+            f"didn't converge, at most {summary['max_iterations']} outer "
+            f"iterations, {summary['throughput']:0.4g} simulated time per hour"
+        )
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import csv
+import json
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Protocol, TypeVar, cast
+
+import numpy as np
+from loguru import logger
+from numpy.typing import NDArray
+from xmipy.timers.timer import Timer
+
+from imod_coupler.logging.trace import TraceRecorder
+
+# the phase timing a single time step of the driver, see `Driver.execute`
+UPDATE_PHASE = "update"
+# kernel functions that are called outside of the time loop
+KERNEL_SETUP_FUNCTIONS = {"initialize", "finalize", "init_sw_component"}
+
+
+class PhaseTimer:
+    """Wall times of all calls of a single phase"""
+
+    count: int
+    durations: NDArray[np.float64]
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.durations = np.empty(64, dtype=np.float64)
+
+    def extend(self, durations: list[float]) -> float:
+        for seconds in durations:
+            self.add(seconds)
+        return self.total
+
+    def add(self, seconds: float) -> None:
+        if self.count == self.durations.size:
+            # amortized growth, a long run can have millions of calls
+            self.durations = np.resize(self.durations, 2 * self.durations.size)
+        self.durations[self.count] = seconds
+        self.count += 1
+
+    @property
+    def total(self) -> float:
+        return float(self.durations[: self.count].sum())
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+
+    @property
+    def p95(self) -> float:
+        if self.count == 0:
+            return 0.0
+        return float(np.percentile(self.durations[: self.count], 95))
+
+
+class TimingRegistry:
+    """
+    Registry of the wall time spent per phase of a coupled run.
+
+    Coupler phases are measured with `measure` or the `timed` decorator. The
+    time spent inside the kernels is taken over from their XMI timers with
+    `add_kernel_timer`, after which the coupler overhead is the time of the
+    time loop not spent in any kernel. When a `tracer` is set, every measured
+    phase is added to the trace as well.
+    """
+
+    enabled: bool
+    phases: dict[str, PhaseTimer]
+    kernel_phases: set[str]
+    tracer: TraceRecorder | None
+
+    def __init__(self, enabled: bool = True) -> None:
+        self.enabled = enabled
+        self.phases = {}
+        self.kernel_phases = set()
+        self.tracer = None
+
+    @contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        if not self.enabled and self.tracer is None:
+            yield
+            return
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            if self.enabled:
+                self.add(phase, duration)
+            if self.tracer is not None:
+                self.tracer.add_span(phase, "coupler", start, duration)
+
+    def add(self, phase: str, seconds: float) -> None:
+        if phase not in self.phases:
+            self.phases[phase] = PhaseTimer()
+        self.phases[phase].add(seconds)
+
+    def add_kernel_timer(self, kernel_name: str, timer: Timer) -> None:
+        """Take over the timings of all functions called in a kernel"""
+        for fn_name in timer.timers:
+            phase = f"{kernel_name}.{fn_name}"
+            self.phases[phase] = PhaseTimer()
+            self.kernel_phases.add(phase)
+            timer.timers.apply(self.phases[phase].extend, fn_name)
+
+    @property
+    def kernel_time(self) -> float:
+        """Total time spent in the kernels during the time loop"""
+        return sum(
+            self.phases[phase].total
+            for phase in self.kernel_phases
+            if phase.split(".", 1)[1] not in KERNEL_SETUP_FUNCTIONS
+        )
+
+    @property
+    def loop_time(self) -> float:
+        """Total time spent in the time loop"""
+        if UPDATE_PHASE not in self.phases:
+            return 0.0
+        return self.phases[UPDATE_PHASE].total
+
+    @property
+    def coupler_overhead(self) -> float:
+        """Total time of the time loop spent outside of the kernels"""
+        return max(self.loop_time - self.kernel_time, 0.0)
+
+    def summary(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "phase": phase,
+                "kind": "kernel" if phase in self.kernel_phases else "coupler",
+                "count": timer.count,
+                "total": timer.total,
+                "mean": timer.mean,
+                "p95": timer.p95,
+            }
+            for phase, timer in sorted(self.phases.items())
+        ]
+
+    def report(self) -> None:
+        for row in self.summary():
+            logger.info(
+                f"Elapsed time for {row['phase']}: {row['total']:0.4f} seconds "
+                f"in {row['count']} calls "
+                f"(mean: {row['mean']:0.6f}, p95: {row['p95']:0.6f} seconds)"
+            )
+        logger.info(
+            f"Total elapsed time in numerical kernels: {self.kernel_time:0.4f} seconds"
+        )
+        loop_time = self.loop_time
+        fraction = self.coupler_overhead / loop_time if loop_time > 0.0 else 0.0
+        logger.info(
+            f"Total coupler overhead: {self.coupler_overhead:0.4f} seconds "
+            f"({fraction:0.1%} of the time loop)"
+        )
+
+    def write_json(self, path: Path) -> None:
+        content = {
+            "loop_time": self.loop_time,
+            "kernel_time": self.kernel_time,
+            "coupler_overhead": self.coupler_overhead,
+            "phases": self.summary(),
+        }
+        with open(path, "w") as f:
+            json.dump(content, f, indent=2)
+
+    def write_csv(self, path: Path) -> None:
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(
+                f, fieldnames=["phase", "kind", "count", "total", "mean", "p95"]
+            )
+            writer.writeheader()
+            writer.writerows(self.summary())
+
+
+class HasTimingRegistry(Protocol):
+    timing_registry: TimingRegistry
+
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def timed(phase: str) -> Callable[[F], F]:
+    """Decorator measuring a method as a phase in the `timing_registry` of its object"""
+
+    def decorator(method: F) -> F:
+        @wraps(method)
+        def wrapper(self: HasTimingRegistry, *args: Any, **kwargs: Any) -> Any:
+            with self.timing_registry.measure(phase):
+                return method(self, *args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
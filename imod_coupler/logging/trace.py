@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from time import perf_counter
+from typing import Any, TextIO
+
+from xmipy import XmiWrapper
+from xmipy.timers.timer import Timer
+
+
+class TraceRecorder:
+    """
+    Writes the spans of a coupled run in the trace event format.
+
+    The resulting file can be loaded in a trace viewer such as Perfetto
+    (https://ui.perfetto.dev) or chrome://tracing. Events are streamed to the
+    file as they complete, so that the memory use does not grow with the
+    length of the run. The trace event format allows the closing bracket to be
+    missing, so that the trace of an aborted run can be loaded as well.
+    """
+
+    path: Path
+    file: TextIO
+    origin: float  # perf_counter at the start of the trace
+    pid: int
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.file = open(path, "w")
+        self.file.write("[\n")
+        self.origin = perf_counter()
+        self.pid = os.getpid()
+        self._separator = ""
+
+    def add_span(
+        self,
+        name: str,
+        category: str,
+        start: float,
+        duration: float,
+        args: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Add a complete event
+
+        Parameters
+        ----------
+        name : str
+            The name of the span
+        category : str
+            The category of the span, e.g. "coupler" or the kernel name
+        start : float
+            The `time.perf_counter` at the start of the span
+        duration : float
+            The duration of the span in seconds
+        args : dict[str, Any], optional
+            Additional information shown with the span
+        """
+        event: dict[str, Any] = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start - self.origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": self.pid,
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        self.file.write(self._separator + json.dumps(event))
+        self._separator = ",\n"
+
+    def trace_kernel(self, kernel: XmiWrapper) -> None:
+        """Add a span for every subsequent call into the kernel"""
+        if kernel.timing:
+            timer = TracingTimer(self, kernel.timer.name, kernel.timer.text)
+            # keep the timings collected so far
+            timer.timers = kernel.timer.timers
+        else:
+            timer = TracingTimer(
+                self,
+                kernel.libname,
+                "Elapsed time for {name}.{fn_name}: {seconds:0.4f} seconds",
+            )
+        kernel.timer = timer
+        kernel.timing = True
+
+    def finalize(self) -> None:
+        self.file.write("\n]\n")
+        self.file.close()
+
+
+class TracingTimer(Timer):
+    """XMI timer that also adds a span to the trace for every kernel call"""
+
+    tracer: TraceRecorder
+
+    def __init__(self, tracer: TraceRecorder, name: str, text: str):
+        super().__init__(name, text)
+        self.tracer = tracer
+        self._span_start: dict[str, float] = {}
+
+    def start(self, fn_name: str) -> None:
+        super().start(fn_name)
+        self._span_start[fn_name] = perf_counter()
+
+    def stop(self, fn_name: str) -> float:
+        end = perf_counter()
+        seconds = super().stop(fn_name)
+        start = self._span_start.pop(fn_name)
+        self.tracer.add_span(f"{self.name}.{fn_name}", self.name, start, end - start)
+        return seconds
@@ -20,6 +20,12 @@ def parse_args(args: Sequence[str] | None = None) -> Any:
         help="stop the script to wait for the native debugger",
     )
 
+    parser.add_argument(
+        "--enable-trace",
+        action="store_true",
+        help="write a timeline of the run to imod_coupler_trace.json",
+    )
+
     parser.add_argument("--version", action="version", version=__version__)
 
     return parser.parse_args(args)
@@ -0,0 +1,32 @@
+"""NumPy-backed stand-ins for the MODFLOW 6, MetaSWAP and Ribasim kernels
+
+They implement the XMI surface used by the coupler without loading any
+shared library, so that the coupling overhead of the drivers can be measured
+in isolation on any platform.
+"""
+
+from imod_coupler.testing.fake_kernels.drivers import (
+    FakeMetaMod,
+    FakeRibaMetaMod,
+    FakeRibaMod,
+    create_metamod,
+    create_ribametamod,
+    create_ribamod,
+)
+from imod_coupler.testing.fake_kernels.kernel import FakeKernel
+from imod_coupler.testing.fake_kernels.mf6 import FakeMf6Wrapper
+from imod_coupler.testing.fake_kernels.msw import FakeMswWrapper
+from imod_coupler.testing.fake_kernels.ribasim import FakeRibasimApi
+
+__all__ = [
+    "FakeKernel",
+    "FakeMetaMod",
+    "FakeMf6Wrapper",
+    "FakeMswWrapper",
+    "FakeRibaMetaMod",
+    "FakeRibaMod",
+    "FakeRibasimApi",
+    "create_metamod",
+    "create_ribametamod",
+    "create_ribamod",
+]
@@ -0,0 +1,530 @@
+"""Coupled drivers running on the fake kernels
+
+The `create_*` functions write synthetic coupling tables of the requested
+size to a directory, validate a configuration referring to them, and return
+a driver of which the kernels are replaced by their NumPy stand-ins. The
+mapping, exchange and logging code of the drivers is the production code.
+"""
+
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+from imod_coupler.config import BaseConfig, DriverType
+from imod_coupler.drivers.metamod.config import MetaModConfig
+from imod_coupler.drivers.metamod.metamod import MetaMod
+from imod_coupler.drivers.ribametamod.config import RibaMetaModConfig
+from imod_coupler.drivers.ribametamod.ribametamod import RibaMetaMod
+from imod_coupler.drivers.ribamod.config import RibaModConfig
+from imod_coupler.drivers.ribamod.ribamod import RibaMod
+from imod_coupler.logging.exchange_collector import ExchangeCollector
+from imod_coupler.testing.fake_kernels.mf6 import FakeMf6Wrapper
+from imod_coupler.testing.fake_kernels.msw import FakeMswWrapper
+from imod_coupler.testing.fake_kernels.ribasim import FakeRibasimApi
+from imod_coupler.utils import cd
+
+MF6_MODEL = "GWF_1"
+MF6_RECHARGE_PKG = "rch_msw"
+MF6_WELL_PKG = "wells_msw"
+
+
+class FakeMetaMod(MetaMod):
+    """MetaMod driver running on fake MODFLOW 6 and MetaSWAP kernels"""
+
+    def __init__(
+        self,
+        base_config: BaseConfig,
+        metamod_config: MetaModConfig,
+        mf6: FakeMf6Wrapper,
+        msw: FakeMswWrapper,
+    ):
+        super().__init__(base_config, metamod_config)
+        self.mf6 = mf6
+        self.msw = msw
+
+    def initialize(self) -> None:
+        self.mf6.set_int("ISTDOUTTOFILE", 0)
+        self.mf6.initialize()
+        self.msw.initialize()
+        self.log_version()
+        self.exchange_logger = _exchange_logger(self.coupling.output_config_file)
+        self.exchange_logger.timing_registry = self.timing_registry
+        self.couple()
+
+
+class FakeRibaMod(RibaMod):
+    """RibaMod driver running on fake MODFLOW 6 and Ribasim kernels"""
+
+    def __init__(
+        self,
+        base_config: BaseConfig,
+        ribamod_config: RibaModConfig,
+        mf6: FakeMf6Wrapper,
+        ribasim: FakeRibasimApi,
+    ):
+        super().__init__(base_config, ribamod_config)
+        self.mf6 = mf6
+        self.ribasim = ribasim
+
+    def initialize(self) -> None:
+        self.mf6.set_int("ISTDOUTTOFILE", 0)
+        self.mf6.initialize()
+        self.ribasim.init_julia()
+        self.ribasim.initialize(str(self.ribamod_config.kernels.ribasim.config_file))
+        self.log_version()
+        self.exchange_logger = _exchange_logger(self.coupling.output_config_file)
+        self.exchange_logger.timing_registry = self.timing_registry
+        self.couple()
+
+
+class FakeRibaMetaMod(RibaMetaMod):
+    """RibaMetaMod driver running on fake MODFLOW 6, Ribasim and MetaSWAP kernels"""
+
+    def __init__(
+        self,
+        base_config: BaseConfig,
+        ribametamod_config: RibaMetaModConfig,
+        mf6: FakeMf6Wrapper,
+        ribasim: FakeRibasimApi | None,
+        msw: FakeMswWrapper | None,
+    ):
+        super().__init__(base_config, ribametamod_config)
+        self.mf6 = mf6
+        self.has_ribasim = ribasim is not None
+        if ribasim is not None:
+            self.ribasim = ribasim
+        self.has_metaswap = msw is not None
+        if msw is not None:
+            self.msw = msw
+
+    def initialize(self) -> None:
+        self.mf6.set_int("ISTDOUTTOFILE", 0)
+        self.mf6.initialize()
+        self.current_time = self.get_current_time()
+        if self.has_ribasim:
+            self.ribasim.init_julia()
+            self.ribasim.initialize()
+        if self.has_metaswap:
+            self.msw.initialize()
+            if self.has_ribasim:
+                self.msw.initialize_surface_water_component()
+        self.log_version()
+        self.exchange_logger = _exchange_logger(self.coupling.output_config_file)
+        self.exchange_logger.timing_registry = self.timing_registry
+        self.couple()
+
+
+def create_metamod(
+    directory: Path,
+    n_svat: int,
+    n_node: int,
+    n_well: int = 0,
+    n_iter: int = 3,
+    n_timestep: int = 10,
+    timing: bool = False,
+    output_config_file: Path | None = None,
+) -> FakeMetaMod:
+    """
+    Create a MetaMod driver on fake kernels.
+
+    Svat i is coupled to cell ``i % n_node``, so there are n:1 couplings
+    when `n_svat` exceeds `n_node`. The recharge package covers the coupled
+    cells and, when `n_well` > 0, every svat sprinkles from well
+    ``i % n_well``.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory to write the coupling tables and configuration to
+    n_svat : int
+        The number of MetaSWAP svats
+    n_node : int
+        The number of MODFLOW 6 cells
+    n_well : int
+        The number of sprinkling wells, 0 disables groundwater sprinkling
+    n_iter : int
+        The number of outer iterations needed for convergence
+    n_timestep : int
+        The number of daily time steps
+    timing : bool
+        Whether timing should be activated
+    output_config_file : Path | None
+        The exchange logging configuration
+
+    Returns
+    -------
+    FakeMetaMod
+        The driver, ready to be executed
+    """
+    tables = _write_metaswap_tables(directory, n_svat, n_node, n_well)
+    coupling: dict[str, Any] = {
+        "mf6_model": MF6_MODEL,
+        "mf6_msw_recharge_pkg": MF6_RECHARGE_PKG,
+        "mf6_msw_node_map": tables["node2svat"],
+        "mf6_msw_recharge_map": tables["rch2svat"],
+    }
+    if output_config_file is not None:
+        coupling["output_config_file"] = output_config_file
+    if n_well > 0:
+        coupling["mf6_msw_well_pkg"] = MF6_WELL_PKG
+        coupling["mf6_msw_sprinkling_map_groundwater"] = tables["well2svat"]
+    kernels = {
+        "modflow6": _kernel_config(directory, "modflow6"),
+        "metaswap": _kernel_config(directory, "metaswap"),
+    }
+    # the configuration changes the working directory during validation
+    with cd(directory):
+        metamod_config = MetaModConfig(directory, kernels=kernels, coupling=[coupling])
+    base_config = BaseConfig(
+        driver_type=DriverType.METAMOD, driver=metamod_config, timing=timing
+    )
+    mf6 = FakeMf6Wrapper(
+        n_node,
+        MF6_MODEL,
+        recharge_packages={MF6_RECHARGE_PKG: tables["rch_nodelist"]},
+        well_packages=({MF6_WELL_PKG: tables["well_nodelist"]} if n_well > 0 else None),
+        n_iter=n_iter,
+        n_timestep=n_timestep,
+        working_directory=directory / "modflow6",
+        timing=timing,
+    )
+    msw = FakeMswWrapper(
+        n_svat, working_directory=directory / "metaswap", timing=timing
+    )
+    return FakeMetaMod(base_config, metamod_config, mf6, msw)
+
+
+def create_ribamod(
+    directory: Path,
+    n_node: int,
+    n_basin: int,
+    n_bound: int,
+    n_active_river: int = 1,
+    n_passive_river: int = 0,
+    n_active_drainage: int = 1,
+    n_passive_drainage: int = 0,
+    n_subgrid: int | None = None,
+    n_iter: int = 3,
+    n_timestep: int = 10,
+    timing: bool = False,
+    output_config_file: Path | None = None,
+) -> FakeRibaMod:
+    """
+    Create a RibaMod driver on fake kernels.
+
+    Every river and drainage package has `n_bound` boundaries, where
+    boundary j lies in cell ``j % n_node`` and drains to basin
+    ``j % n_basin``.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory to write the coupling tables and configuration to
+    n_node : int
+        The number of MODFLOW 6 cells
+    n_basin : int
+        The number of Ribasim basins
+    n_bound : int
+        The number of boundaries per river or drainage package
+    n_active_river, n_passive_river, n_active_drainage, n_passive_drainage : int
+        The number of packages of each kind
+    n_subgrid : int | None
+        The number of Ribasim subgrid elements, defaults to `n_basin`
+    n_iter : int
+        The number of outer iterations needed for convergence
+    n_timestep : int
+        The number of daily time steps
+    timing : bool
+        Whether timing should be activated
+    output_config_file : Path | None
+        The exchange logging configuration
+
+    Returns
+    -------
+    FakeRibaMod
+        The driver, ready to be executed
+    """
+    if n_subgrid is None:
+        n_subgrid = n_basin
+    packages = _write_ribasim_tables(
+        directory,
+        n_node,
+        n_basin,
+        n_subgrid,
+        n_bound,
+        n_active_river,
+        n_passive_river,
+        n_active_drainage,
+        n_passive_drainage,
+    )
+    coupling: dict[str, Any] = {"mf6_model": MF6_MODEL, **packages["coupling"]}
+    if output_config_file is not None:
+        coupling["output_config_file"] = output_config_file
+    kernels = {
+        "modflow6": _kernel_config(directory, "modflow6"),
+        "ribasim": _ribasim_config(directory),
+    }
+    with cd(directory):
+        ribamod_config = RibaModConfig(directory, kernels=kernels, coupling=[coupling])
+    base_config = BaseConfig(
+        driver_type=DriverType.RIBAMOD, driver=ribamod_config, timing=timing
+    )
+    mf6 = FakeMf6Wrapper(
+        n_node,
+        MF6_MODEL,
+        river_packages=packages["river_nodelists"],
+        drainage_packages=packages["drainage_nodelists"],
+        n_iter=n_iter,
+        n_timestep=n_timestep,
+        working_directory=directory / "modflow6",
+        timing=timing,
+    )
+    ribasim = FakeRibasimApi(n_basin, n_subgrid, timing=timing)
+    return FakeRibaMod(base_config, ribamod_config, mf6, ribasim)
+
+
+def create_ribametamod(
+    directory: Path,
+    n_svat: int,
+    n_node: int,
+    n_basin: int,
+    n_bound: int,
+    n_active_river: int = 1,
+    n_passive_river: int = 0,
+    n_active_drainage: int = 1,
+    n_passive_drainage: int = 0,
+    n_subgrid: int | None = None,
+    n_well: int = 0,
+    n_user: int = 0,
+    delt_sw: float = 1.0,
+    n_iter: int = 3,
+    n_timestep: int = 10,
+    timing: bool = False,
+    output_config_file: Path | None = None,
+) -> FakeRibaMetaMod:
+    """
+    Create a RibaMetaMod driver on fake kernels.
+
+    The MODFLOW 6 - MetaSWAP coupling is laid out as in `create_metamod`,
+    the MODFLOW 6 - Ribasim coupling as in `create_ribamod`. Svat i ponds to
+    basin ``i % n_basin`` and, when `n_user` > 0, sprinkles from surface
+    water user ``i % n_user``.
+
+    Parameters
+    ----------
+    directory : Path
+        Directory to write the coupling tables and configuration to
+    n_svat : int
+        The number of MetaSWAP svats
+    n_node : int
+        The number of MODFLOW 6 cells
+    n_basin : int
+        The number of Ribasim basins
+    n_bound : int
+        The number of boundaries per river or drainage package
+    n_active_river, n_passive_river, n_active_drainage, n_passive_drainage : int
+        The number of packages of each kind
+    n_subgrid : int | None
+        The number of Ribasim subgrid elements, defaults to `n_basin`
+    n_well : int
+        The number of sprinkling wells, 0 disables groundwater sprinkling
+    n_user : int
+        The number of Ribasim users, 0 disables surface water sprinkling
+    delt_sw : float
+        The surface water time step length of MetaSWAP in days
+    n_iter : int
+        The number of outer iterations needed for convergence
+    n_timestep : int
+        The number of daily time steps
+    timing : bool
+        Whether timing should be activated
+    output_config_file : Path | None
+        The exchange logging configuration
+
+    Returns
+    -------
+    FakeRibaMetaMod
+        The driver, ready to be executed
+    """
+    if n_subgrid is None:
+        n_subgrid = n_basin
+    tables = _write_metaswap_tables(directory, n_svat, n_node, n_well)
+    packages = _write_ribasim_tables(
+        directory,
+        n_node,
+        n_basin,
+        n_subgrid,
+        n_bound,
+        n_active_river,
+        n_passive_river,
+        n_active_drainage,
+        n_passive_drainage,
+    )
+    svat = np.arange(n_svat)
+    exchange_dir = directory / "exchanges"
+    ponding_map = exchange_dir / "msw_ponding.tsv"
+    _write_tsv(ponding_map, ["basin_index", "svat"], [svat % n_basin, svat + 1])
+    coupling: dict[str, Any] = {
+        "mf6_model": MF6_MODEL,
+        **packages["coupling"],
+        "mf6_msw_recharge_pkg": MF6_RECHARGE_PKG,
+        "mf6_msw_node_map": tables["node2svat"],
+        "mf6_msw_recharge_map": tables["rch2svat"],
+        "rib_msw_ponding_map_surface_water": ponding_map,
+    }
+    if output_config_file is not None:
+        coupling["output_config_file"] = output_config_file
+    if n_well > 0:
+        coupling["mf6_msw_well_pkg"] = MF6_WELL_PKG
+        coupling["mf6_msw_sprinkling_map_groundwater"] = tables["well2svat"]
+    if n_user > 0:
+        sprinkling_map = exchange_dir / "msw_sw_sprinkling.tsv"
+        _write_tsv(
+            sprinkling_map, ["user_demand_index", "svat"], [svat % n_user, svat + 1]
+        )
+        coupling["rib_msw_sprinkling_map_surface_water"] = sprinkling_map
+    kernels = {
+        "modflow6": _kernel_config(directory, "modflow6"),
+        "metaswap": _kernel_config(directory, "metaswap"),
+        "ribasim": _ribasim_config(directory),
+    }
+    with cd(directory):
+        ribametamod_config = RibaMetaModConfig(
+            directory, kernels=kernels, coupling=[coupling]
+        )
+    base_config = BaseConfig(
+        driver_type=DriverType.RIBAMETAMOD, driver=ribametamod_config, timing=timing
+    )
+    active_rivers = list(ribametamod_config.coupling[0].mf6_active_river_packages)
+    mf6 = FakeMf6Wrapper(
+        n_node,
+        MF6_MODEL,
+        recharge_packages={MF6_RECHARGE_PKG: tables["rch_nodelist"]},
+        well_packages=({MF6_WELL_PKG: tables["well_nodelist"]} if n_well > 0 else None),
+        river_packages=packages["river_nodelists"],
+        drainage_packages=packages["drainage_nodelists"],
+        api_packages={f"api_{key}": n_bound for key in active_rivers},
+        n_iter=n_iter,
+        n_timestep=n_timestep,
+        working_directory=directory / "modflow6",
+        timing=timing,
+    )
+    msw = FakeMswWrapper(
+        n_svat,
+        delt_sw=delt_sw,
+        working_directory=directory / "metaswap",
+        timing=timing,
+    )
+    ribasim = FakeRibasimApi(n_basin, n_subgrid, n_user=n_user, timing=timing)
+    return FakeRibaMetaMod(base_config, ribametamod_config, mf6, ribasim, msw)
+
+
+def _exchange_logger(output_config_file: Path | None) -> ExchangeCollector:
+    if output_config_file is not None:
+        return ExchangeCollector.from_file(output_config_file)
+    return ExchangeCollector()
+
+
+def _kernel_config(directory: Path, kernel: str) -> dict[str, Path]:
+    # the configuration requires an existing library, which is never loaded
+    work_dir = directory / kernel
+    work_dir.mkdir(parents=True, exist_ok=True)
+    dll = work_dir / "fake_kernel"
+    dll.touch()
+    return {"dll": dll, "work_dir": work_dir}
+
+
+def _ribasim_config(directory: Path) -> dict[str, Path | None]:
+    config = _kernel_config(directory, "ribasim")
+    config_file = config["work_dir"] / "ribasim.toml"
+    config_file.touch()
+    return {"dll": config["dll"], "dll_dep_dir": None, "config_file": config_file}
+
+
+def _write_dxc(path: Path, index: NDArray[Any], svat: NDArray[Any]) -> None:
+    layer = np.ones_like(svat)
+    table = np.column_stack((index, svat, layer))
+    np.savetxt(path, table, fmt="%10d%10d%10d")
+
+
+def _write_tsv(path: Path, header: list[str], columns: list[NDArray[Any]]) -> None:
+    table = np.column_stack(columns)
+    np.savetxt(
+        path, table, fmt="%d", delimiter="\t", header="\t".join(header), comments=""
+    )
+
+
+def _write_metaswap_tables(
+    directory: Path, n_svat: int, n_node: int, n_well: int
+) -> dict[str, Any]:
+    msw_dir = directory / "metaswap"
+    exchange_dir = directory / "exchanges"
+    msw_dir.mkdir(parents=True, exist_ok=True)
+    exchange_dir.mkdir(parents=True, exist_ok=True)
+
+    svat = np.arange(n_svat)
+    node = svat % n_node
+    mod2svat = np.column_stack((node + 1, svat + 1, np.ones_like(svat)))
+    np.savetxt(msw_dir / "mod2svat.inp", mod2svat, fmt="%10d%12d%5d")
+
+    tables: dict[str, Any] = {
+        "node2svat": exchange_dir / "nodenr2svat.dxc",
+        "rch2svat": exchange_dir / "rchindex2svat.dxc",
+    }
+    _write_dxc(tables["node2svat"], node + 1, svat + 1)
+    # the recharge package covers exactly the coupled cells
+    n_rch = min(n_svat, n_node)
+    tables["rch_nodelist"] = np.arange(1, n_rch + 1, dtype=np.int32)
+    _write_dxc(tables["rch2svat"], svat % n_rch + 1, svat + 1)
+    if n_well > 0:
+        tables["well2svat"] = exchange_dir / "wellindex2svat.dxc"
+        tables["well_nodelist"] = np.arange(n_well, dtype=np.int32) % n_node + 1
+        _write_dxc(tables["well2svat"], svat % n_well + 1, svat + 1)
+    return tables
+
+
+def _write_ribasim_tables(
+    directory: Path,
+    n_node: int,
+    n_basin: int,
+    n_subgrid: int,
+    n_bound: int,
+    n_active_river: int,
+    n_passive_river: int,
+    n_active_drainage: int,
+    n_passive_drainage: int,
+) -> dict[str, Any]:
+    exchange_dir = directory / "exchanges"
+    exchange_dir.mkdir(parents=True, exist_ok=True)
+
+    bound = np.arange(n_bound)
+    nodelist = (bound % n_node + 1).astype(np.int32)
+    basin = bound % n_basin
+    subgrid = bound % n_subgrid
+    packages: dict[str, Any] = {
+        "coupling": {},
+        "river_nodelists": {},
+        "drainage_nodelists": {},
+    }
+    kinds = [
+        ("river", "active", n_active_river),
+        ("river", "passive", n_passive_river),
+        ("drainage", "active", n_active_drainage),
+        ("drainage", "passive", n_passive_drainage),
+    ]
+    for kind, coupling_type, n_package in kinds:
+        tables = {}
+        for i in range(1, n_package + 1):
+            key = f"{kind[:3]}_{coupling_type}_{i}"
+            path = exchange_dir / f"{key}.tsv"
+            if coupling_type == "active":
+                header = ["basin_index", "bound_index", "subgrid_index"]
+                _write_tsv(path, header, [basin, bound, subgrid])
+            else:
+                _write_tsv(path, ["basin_index", "bound_index"], [basin, bound])
+            tables[key] = str(path)
+            packages[f"{kind}_nodelists"][key] = nodelist
+        packages["coupling"][f"mf6_{coupling_type}_{kind}_packages"] = tables
+    return packages
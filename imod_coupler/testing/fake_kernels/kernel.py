@@ -0,0 +1,129 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+from xmipy.errors import TimerError
+from xmipy.timers.timer import Timer
+
+
+class FakeKernel:
+    """
+    NumPy-backed replacement of the XMI primitives of `XmiWrapper`.
+
+    Every kernel variable lives in `values`, keyed by its address. Pointers
+    handed out by `get_value_ptr` are the arrays themselves, so writes by the
+    coupler are seen by the fake kernel and vice versa, just as with the
+    shared memory of a real kernel. No shared library is loaded.
+
+    Inherit from this class first, then from the wrapper that should be
+    replaced, so that the methods defined here take precedence.
+    """
+
+    libname: str
+    working_directory: Path
+    timing: bool
+    timer: Timer
+    values: dict[str, NDArray[Any]]
+    start_time: float
+    current_time: float
+    end_time: float
+    delt: float
+
+    def _init_kernel(
+        self,
+        libname: str,
+        working_directory: str | Path | None,
+        timing: bool,
+        end_time: float,
+        delt: float,
+    ) -> None:
+        self.libname = libname
+        if working_directory:
+            self.working_directory = Path(working_directory)
+        else:
+            self.working_directory = Path().cwd()
+        self.timing = timing
+        if self.timing:
+            self.timer = Timer(
+                name=self.libname,
+                text="Elapsed time for {name}.{fn_name}: {seconds:0.4f} seconds",
+            )
+        self.values = {}
+        self.start_time = 0.0
+        self.current_time = 0.0
+        self.end_time = end_time
+        self.delt = delt
+
+    def __del__(self) -> None:
+        # there is no library to finalize
+        pass
+
+    @contextmanager
+    def _timed(self, fn_name: str) -> Iterator[None]:
+        if self.timing:
+            self.timer.start(fn_name)
+        try:
+            yield
+        finally:
+            if self.timing:
+                self.timer.stop(fn_name)
+
+    def _add_value(self, name: str, value: NDArray[Any]) -> NDArray[Any]:
+        self.values[name] = np.ascontiguousarray(value)
+        return self.values[name]
+
+    def report_timing_totals(self) -> float:
+        if self.timing:
+            return self.timer.report_totals()
+        else:
+            raise TimerError("Timing not activated")
+
+    def set_int(self, name: str, value: int) -> None:
+        pass
+
+    def initialize(self, config_file: str | PathLike[Any] = "") -> None:
+        self.current_time = self.start_time
+
+    def finalize(self) -> None:
+        pass
+
+    def get_version(self) -> str:
+        return f"{self.libname} (fake)"
+
+    def get_current_time(self) -> float:
+        return self.current_time
+
+    def get_start_time(self) -> float:
+        return self.start_time
+
+    def get_end_time(self) -> float:
+        return self.end_time
+
+    def get_time_step(self) -> float:
+        return self.delt
+
+    def get_var_address(
+        self, var_name: str, component_name: str, subcomponent_name: str = ""
+    ) -> str:
+        parts = [component_name, subcomponent_name, var_name]
+        return "/".join(part.upper() for part in parts if part)
+
+    def get_value_ptr(self, name: str) -> NDArray[Any]:
+        try:
+            return self.values[name]
+        except KeyError:
+            raise ValueError(f"{self.libname} has no variable {name}") from None
+
+    def get_value(self, name: str, dest: NDArray[Any] | None = None) -> NDArray[Any]:
+        src = self.get_value_ptr(name)
+        if dest is None:
+            return src.copy()
+        dest[...] = src
+        return dest
+
+    def set_value(self, name: str, values: NDArray[Any]) -> None:
+        self.get_value_ptr(name)[...] = values
@@ -0,0 +1,177 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from numpy.typing import NDArray
+
+from imod_coupler.kernelwrappers.mf6_wrapper import Mf6Wrapper
+from imod_coupler.testing.fake_kernels.kernel import FakeKernel
+
+
+class FakeMf6Wrapper(FakeKernel, Mf6Wrapper):
+    """
+    Stand-in for MODFLOW 6 exposing the variables used by the coupler.
+
+    The groundwater model has `n_node` cells. Boundary packages are given as
+    a mapping of package key to their (1-based) nodelist. Every outer
+    iteration relaxes the head halfway towards a fixed target head, and the
+    solution is reported as converged after `n_iter` iterations.
+
+    Parameters
+    ----------
+    n_node : int
+        The number of cells of the flow model
+    mf6_flowmodel_key : str
+        The component name of the flow model
+    recharge_packages : dict[str, NDArray[np.int32]], optional
+        The recharge packages with their nodelists
+    well_packages : dict[str, NDArray[np.int32]], optional
+        The well packages with their nodelists
+    river_packages : dict[str, NDArray[np.int32]], optional
+        The river packages with their nodelists
+    drainage_packages : dict[str, NDArray[np.int32]], optional
+        The drainage packages with their nodelists
+    api_packages : dict[str, int], optional
+        The API packages with their maximum number of boundaries
+    n_iter : int
+        The number of outer iterations needed for convergence
+    max_iter : int
+        The maximum number of outer iterations (MXITER)
+    delt : float
+        The time step length in days
+    n_timestep : int
+        The number of time steps of the simulation
+    working_directory : str | Path | None
+        The working directory of the kernel
+    timing : bool
+        Whether timing should be activated
+    seed : int
+        Seed of the random initial state
+    """
+
+    def __init__(
+        self,
+        n_node: int,
+        mf6_flowmodel_key: str = "GWF_1",
+        recharge_packages: dict[str, NDArray[np.int32]] | None = None,
+        well_packages: dict[str, NDArray[np.int32]] | None = None,
+        river_packages: dict[str, NDArray[np.int32]] | None = None,
+        drainage_packages: dict[str, NDArray[np.int32]] | None = None,
+        api_packages: dict[str, int] | None = None,
+        n_iter: int = 3,
+        max_iter: int = 25,
+        delt: float = 1.0,
+        n_timestep: int = 10,
+        working_directory: str | Path | None = None,
+        timing: bool = False,
+        seed: int = 0,
+    ):
+        self._init_kernel("libmf6", working_directory, timing, n_timestep * delt, delt)
+        self._init_caches()
+        self.n_node = n_node
+        self.mf6_flowmodel_key = mf6_flowmodel_key
+        self.n_iter = n_iter
+        self.kiter = 0
+        self.river_keys = list((river_packages or {}).keys())
+        self.drainage_keys = list((drainage_packages or {}).keys())
+        rng = np.random.default_rng(seed)
+
+        self._add_value("SLN_1/MXITER", np.array([max_iter], dtype=np.int32))
+        # a single stress period, tests may increase it to emulate a new period
+        self._add_value("TDIS/KPER", np.array([0], dtype=np.int32))
+        head = self._add_model_value("X", rng.uniform(-1.0, 1.0, n_node))
+        self.head_target = head - 0.1
+        self._add_model_value("DIS/AREA", np.full(n_node, 625.0))
+        self._add_model_value("DIS/TOP", np.full(n_node, 1.0))
+        self._add_model_value("DIS/BOT", np.full(n_node, -10.0))
+        self._add_model_value("STO/SS", np.full(n_node, 1.0e-5))
+        self._add_model_value("STO/ISTOR_COEF", np.array([0], dtype=np.int32))
+
+        for key, nodelist in (recharge_packages or {}).items():
+            self._add_boundary(key, nodelist, 1)
+            self._add_model_value(f"{key}/RECHARGE", np.zeros(len(nodelist)))
+        for key, nodelist in (well_packages or {}).items():
+            self._add_boundary(key, nodelist, 1)
+            self._add_model_value(f"{key}/Q", np.zeros(len(nodelist)))
+        for key, nodelist in (river_packages or {}).items():
+            nbound = len(nodelist)
+            self._add_boundary(key, nodelist, 3)
+            stage = rng.uniform(0.0, 0.5, nbound)
+            self._add_model_value(f"{key}/STAGE", stage)
+            self._add_model_value(f"{key}/COND", np.full(nbound, 100.0))
+            self._add_model_value(f"{key}/RBOT", stage - 1.0)
+        for key, nodelist in (drainage_packages or {}).items():
+            nbound = len(nodelist)
+            self._add_boundary(key, nodelist, 2)
+            self._add_model_value(f"{key}/ELEV", rng.uniform(-0.5, 0.5, nbound))
+            self._add_model_value(f"{key}/COND", np.full(nbound, 100.0))
+        for key, maxbound in (api_packages or {}).items():
+            # API packages get their nodelist from the coupler
+            self._add_boundary(key, np.zeros(maxbound, dtype=np.int32), 0)
+            self._model_value(f"{key}/NBOUND")[0] = 0
+
+    def _model_address(self, name: str) -> str:
+        return f"{self.mf6_flowmodel_key}/{name}".upper()
+
+    def _model_value(self, name: str) -> NDArray[Any]:
+        return self.values[self._model_address(name)]
+
+    def _add_model_value(self, name: str, value: NDArray[Any]) -> NDArray[Any]:
+        return self._add_value(self._model_address(name), value)
+
+    def _add_boundary(self, key: str, nodelist: NDArray[np.int32], ncol: int) -> None:
+        nbound = len(nodelist)
+        self._add_model_value(f"{key}/NODELIST", np.asarray(nodelist, dtype=np.int32))
+        self._add_model_value(f"{key}/MAXBOUND", np.array([nbound], dtype=np.int32))
+        self._add_model_value(f"{key}/NBOUND", np.array([nbound], dtype=np.int32))
+        self._add_model_value(f"{key}/HCOF", np.zeros(nbound))
+        self._add_model_value(f"{key}/RHS", np.zeros(nbound))
+        if ncol > 0:
+            self._add_model_value(f"{key}/BOUND", np.zeros((nbound, ncol)))
+
+    def prepare_time_step(self, dt: float) -> None:
+        with self._timed("prepare_time_step"):
+            self.current_time += self.delt
+            kper = self.values["TDIS/KPER"]
+            kper[0] = max(kper[0], 1)
+            # formulate the head dependent boundaries like MODFLOW 6 does
+            head = self._model_value("X")
+            for key in self.river_keys:
+                cond = self._model_value(f"{key}/COND")
+                stage = self._model_value(f"{key}/STAGE")
+                rbot = self._model_value(f"{key}/RBOT")
+                river_head = head[self._model_value(f"{key}/NODELIST") - 1]
+                connected = river_head > rbot
+                hcof = self._model_value(f"{key}/HCOF")
+                hcof[:] = np.where(connected, -cond, 0.0)
+                self._model_value(f"{key}/RHS")[:] = np.where(
+                    connected, -cond * stage, -cond * (stage - rbot)
+                )
+            for key in self.drainage_keys:
+                cond = self._model_value(f"{key}/COND")
+                elev = self._model_value(f"{key}/ELEV")
+                drain_head = head[self._model_value(f"{key}/NODELIST") - 1]
+                active = drain_head > elev
+                self._model_value(f"{key}/HCOF")[:] = np.where(active, -cond, 0.0)
+                self._model_value(f"{key}/RHS")[:] = np.where(active, -cond * elev, 0.0)
+        # like Mf6Wrapper.prepare_time_step
+        self._update_stress_period()
+
+    def prepare_solve(self, component_id: int = 1) -> None:
+        with self._timed("prepare_solve"):
+            self.kiter = 0
+
+    def solve(self, component_id: int = 1) -> bool:
+        with self._timed("solve"):
+            self.kiter += 1
+            head = self._model_value("X")
+            head += 0.5 * (self.head_target - head)
+            return self.kiter >= self.n_iter
+
+    def finalize_solve(self, component_id: int = 1) -> None:
+        with self._timed("finalize_solve"):
+            pass
+
+    def finalize_time_step(self) -> None:
+        with self._timed("finalize_time_step"):
+            pass
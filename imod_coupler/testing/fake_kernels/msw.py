@@ -0,0 +1,96 @@
+from pathlib import Path
+
+import numpy as np
+
+from imod_coupler.kernelwrappers.msw_wrapper import MswWrapper
+from imod_coupler.testing.fake_kernels.kernel import FakeKernel
+
+
+class FakeMswWrapper(FakeKernel, MswWrapper):
+    """
+    Stand-in for MetaSWAP exposing the variables used by the coupler.
+
+    Every solve computes the unsaturated zone volume of all `n_svat` svats
+    from the groundwater head set by the coupler. Every surface water time
+    step offers a ponding volume and a sprinkling demand to the coupler.
+
+    Parameters
+    ----------
+    n_svat : int
+        The number of svats
+    delt_sw : float
+        The surface water time step length in days
+    working_directory : str | Path | None
+        The working directory of the kernel, containing mod2svat.inp
+    timing : bool
+        Whether timing should be activated
+    seed : int
+        Seed of the random initial state
+    """
+
+    def __init__(
+        self,
+        n_svat: int,
+        delt_sw: float = 1.0,
+        working_directory: str | Path | None = None,
+        timing: bool = False,
+        seed: int = 1,
+    ):
+        self._init_kernel("MetaSWAP", working_directory, timing, np.inf, 1.0)
+        self.n_svat = n_svat
+        rng = np.random.default_rng(seed)
+
+        area = self._add_value("ark", rng.uniform(100.0, 625.0, n_svat))
+        self._add_value("dhgwmod", np.zeros(n_svat))
+        self._add_value("dvsim", np.zeros(n_svat))
+        self._add_value("dsc1sim", 0.1 * area)
+        self._add_value("ts2dfmput", np.zeros(n_svat))
+        self._add_value("ts2dfmget", np.zeros(n_svat))
+        self._add_value("ts2dfmputsp", np.zeros(n_svat))
+        self._add_value("dfm2tsgetsp", np.zeros(n_svat))
+        self._add_value("dfm2lvswk", np.zeros(n_svat))
+        self._add_value("dtsw", np.array([delt_sw]))
+
+    def prepare_time_step(self, dt: float) -> None:
+        with self._timed("prepare_time_step"):
+            self.delt = dt
+
+    def prepare_time_step_noSW(self, dt: float) -> None:
+        with self._timed("prepare_time_step_noSW"):
+            self.delt = dt
+
+    def prepare_solve(self, component_id: int = 1) -> None:
+        with self._timed("prepare_solve"):
+            pass
+
+    def solve(self, component_id: int = 1) -> bool:
+        with self._timed("solve"):
+            # percolation increases with the groundwater depth
+            volume = self.values["dvsim"]
+            np.multiply(self.values["dhgwmod"], -1.0e-4, out=volume)
+            volume += 1.0e-3
+            volume *= self.values["ark"]
+            volume *= self.delt
+            return True
+
+    def finalize_solve(self, component_id: int = 1) -> None:
+        with self._timed("finalize_solve"):
+            pass
+
+    def finalize_time_step(self) -> None:
+        with self._timed("finalize_time_step"):
+            self.current_time += self.delt
+
+    def initialize_surface_water_component(self) -> None:
+        pass
+
+    def prepare_surface_water_time_step(self, idtsw: int) -> None:
+        with self._timed("perform_sw_time_step"):
+            area = self.values["ark"]
+            np.multiply(area, 1.0e-4, out=self.values["ts2dfmput"])
+            # MetaSWAP reports its sprinkling demand as a negative volume
+            np.multiply(area, -1.0e-4, out=self.values["ts2dfmputsp"])
+
+    def finish_surface_water_time_step(self, idtsw: int) -> None:
+        with self._timed("finish_sw_time_step"):
+            self.values["ts2dfmget"][:] = self.values["ts2dfmput"]
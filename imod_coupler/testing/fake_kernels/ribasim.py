@@ -0,0 +1,95 @@
+from os import PathLike
+from typing import Any
+
+import numpy as np
+from ribasim_api import RibasimApi
+
+from imod_coupler.testing.fake_kernels.kernel import FakeKernel
+
+
+class FakeRibasimApi(FakeKernel, RibasimApi):
+    """
+    Stand-in for Ribasim exposing the variables used by the coupler.
+
+    Every call to `update_until` integrates the infiltration, drainage and
+    user demand fluxes set by the coupler over the elapsed time (in seconds)
+    and updates the basin levels accordingly. Every user demand is fully
+    realised.
+
+    Parameters
+    ----------
+    n_basin : int
+        The number of basins
+    n_subgrid : int
+        The number of subgrid elements, divided evenly over the basins
+    n_user : int
+        The number of user demand nodes
+    n_priority : int
+        The number of demand priorities
+    timing : bool
+        Whether timing should be activated
+    """
+
+    def __init__(
+        self,
+        n_basin: int,
+        n_subgrid: int | None = None,
+        n_user: int = 0,
+        n_priority: int = 1,
+        timing: bool = False,
+    ):
+        self._init_kernel("libribasim", None, timing, np.inf, 0.0)
+        if n_subgrid is None:
+            n_subgrid = n_basin
+        self.n_basin = n_basin
+        self.n_user = n_user
+        self.n_priority = n_priority
+        self.subgrid_basin = np.arange(n_subgrid) % n_basin
+        self.basin_area = np.full(n_basin, 1.0e6)
+
+        self._add_value("basin.infiltration", np.zeros(n_basin))
+        self._add_value("basin.drainage", np.zeros(n_basin))
+        self._add_value("basin.cumulative_infiltration", np.zeros(n_basin))
+        self._add_value("basin.cumulative_drainage", np.zeros(n_basin))
+        level = self._add_value("basin.level", np.ones(n_basin))
+        self._add_value("basin.storage", level * self.basin_area)
+        self._add_value("basin.subgrid_level", level[self.subgrid_basin])
+        demand = np.zeros((n_priority, n_user))
+        if n_priority > 0:
+            demand[0, :] = 1.0
+        self._add_value("user_demand.demand", demand.ravel())
+        self._add_value("user_demand.cumulative_inflow", np.zeros(n_user))
+
+    def init_julia(self) -> None:
+        pass
+
+    def shutdown_julia(self) -> None:
+        pass
+
+    def initialize(self, config_file: str | PathLike[Any] = "") -> None:
+        with self._timed("initialize"):
+            super().initialize(config_file)
+
+    def update_subgrid_level(self) -> None:
+        with self._timed("update_subgrid_level"):
+            np.take(
+                self.values["basin.level"],
+                self.subgrid_basin,
+                out=self.values["basin.subgrid_level"],
+            )
+
+    def update_until(self, time: float) -> None:
+        with self._timed("update_until"):
+            dt = time - self.current_time
+            infiltration = self.values["basin.infiltration"]
+            drainage = self.values["basin.drainage"]
+            self.values["basin.cumulative_infiltration"] += infiltration * dt
+            self.values["basin.cumulative_drainage"] += drainage * dt
+            storage = self.values["basin.storage"]
+            storage += (drainage - infiltration) * dt
+            np.divide(storage, self.basin_area, out=self.values["basin.level"])
+            if self.n_user > 0:
+                demand = self.values["user_demand.demand"]
+                realised = demand.reshape(-1, self.n_user).sum(axis=0)
+                self.values["user_demand.cumulative_inflow"] += realised * dt
+            self.current_time = time
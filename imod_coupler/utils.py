@@ -13,11 +13,12 @@ from numpy.typing import NDArray
 from scipy.sparse import csr_matrix
 
 from imod_coupler.config import LogLevel
+from imod_coupler.io import load_table
 
 
 def create_mapping(
     src_idx: Any, tgt_idx: Any, nsrc: int, ntgt: int, operator: str
-) -> tuple[csr_matrix, NDArray[np.int_]]:
+) -> tuple[csr_matrix, NDArray[np.int8]]:
     """
     Create a mapping from source indexes to target indexes by constructing
     a sparse matrix of size (ntgt x nsrc) and creates a mask array with 0
@@ -45,22 +46,98 @@ def create_mapping(
     Returns
     -------
     Tuple
-        containing the mapping (csr_matrix) and a mask (numpy array)
+        containing the mapping (csr_matrix) and a mask (numpy array of int8)
     """
+    src_idx = np.asarray(src_idx)
+    tgt_idx = np.asarray(tgt_idx)
     if operator == "avg":
-        cnt = np.zeros(max(tgt_idx) + 1)
-        for i in range(len(tgt_idx)):
-            cnt[tgt_idx[i]] += 1
-        dat = np.array([1.0 / cnt[xx] for xx in tgt_idx])
+        cnt = np.bincount(tgt_idx, minlength=ntgt)
+        dat = 1.0 / cnt[tgt_idx]
     elif operator == "sum":
         dat = np.ones(tgt_idx.shape)
     else:
         raise ValueError("`operator` should be either 'sum' or 'avg'")
     map_out = csr_matrix((dat, (tgt_idx, src_idx)), shape=(ntgt, nsrc))
-    mask = np.array([0 if i > 0 else 1 for i in map_out.getnnz(axis=1)])
+    mask = (np.diff(map_out.indptr) == 0).astype(np.int8)
     return map_out, mask
 
 
+class SvatLookup:
+    """
+    Lookup of the MetaSWAP internal (zero-based) index of svats, identified
+    by their (svat id, layer) combination as listed in mod2svat.inp.
+
+    The combinations are stored as sorted 64-bit keys, so that the indexes
+    of a whole coupling table are found at once with `np.searchsorted`.
+    When a combination occurs more than once, the last occurrence is used.
+
+    Parameters
+    ----------
+    svat_id : NDArray[np.int32]
+        The svat id of every MetaSWAP internal index
+    svat_lay : NDArray[np.int32]
+        The MODFLOW 6 layer of every MetaSWAP internal index
+    source : str
+        Description of where the svats are defined, used in error messages
+    """
+
+    sorted_keys: NDArray[np.int64]
+    order: NDArray[np.intp]  # MetaSWAP internal index of every sorted key
+    source: str
+
+    def __init__(
+        self,
+        svat_id: NDArray[np.int32],
+        svat_lay: NDArray[np.int32],
+        source: str = "mod2svat.inp",
+    ):
+        keys = self._keys(svat_id, svat_lay)
+        self.order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[self.order]
+        self.source = source
+
+    @classmethod
+    def from_file(cls, mod2svat: Path) -> SvatLookup:
+        if not mod2svat.is_file():
+            raise ValueError(f"Can't find {mod2svat}.")
+        svat_data = load_table(mod2svat, ncol=3)
+        return cls(svat_data[:, 1], svat_data[:, 2], str(mod2svat))
+
+    @staticmethod
+    def _keys(svat_id: NDArray[Any], svat_lay: NDArray[Any]) -> NDArray[np.int64]:
+        return (np.asarray(svat_id, dtype=np.int64) << 32) + np.asarray(
+            svat_lay, dtype=np.int64
+        )
+
+    def indices(
+        self, svat_id: NDArray[np.int32], svat_lay: NDArray[np.int32]
+    ) -> NDArray[np.intp]:
+        """
+        Return the MetaSWAP internal indexes of (svat id, layer) combinations
+
+        Raises
+        ------
+        ValueError
+            When any of the combinations is not defined in the lookup
+        """
+        keys = self._keys(svat_id, svat_lay)
+        position = np.searchsorted(self.sorted_keys, keys, side="right") - 1
+        found = position >= 0
+        found[found] = self.sorted_keys[position[found]] == keys[found]
+        if not found.all():
+            missing = np.unique(keys[~found])
+            pairs = ", ".join(
+                f"({key >> 32}, {key & 0xFFFFFFFF})" for key in missing[:10].tolist()
+            )
+            more = f" and {missing.size - 10} more" if missing.size > 10 else ""
+            raise ValueError(
+                f"{missing.size} (svat, layer) combinations are not defined in "
+                f"{self.source}: {pairs}{more}"
+            )
+        indices: NDArray[np.intp] = self.order[position]
+        return indices
+
+
 def setup_logger(log_level: LogLevel, log_file: Path) -> None:
     # Remove default handler
     logger.remove()
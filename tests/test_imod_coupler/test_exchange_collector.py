@@ -1,4 +1,6 @@
+import json
 from pathlib import Path
+from typing import Any
 
 import netCDF4 as nc
 import numpy as np
@@ -7,7 +9,10 @@ import tomli
 from numpy.testing import assert_equal
 from numpy.typing import NDArray
 
-from imod_coupler.logging.exchange_collector import ExchangeCollector
+from imod_coupler.logging.exchange_collector import (
+    ExchangeCollector,
+    NetcdfExchangeLogger,
+)
 
 
 def test_exchange_collector_read(tmp_path_dev: Path, output_config_toml: str) -> None:
@@ -67,11 +72,11 @@ def test_exchange_collector_raises_exception_when_array_size_varies(
     some_array: NDArray[np.float64] = np.array([1.1, 2.0, -4.8, np.nan, 3])
     some_smaller_array: NDArray[np.float64] = np.array([1.1, 666.0, -4.8, 0.0])
     exchange_collector.log_exchange("example_stage_output", some_array, 8.0)
-    with pytest.raises(Exception) as e_info:
+    with pytest.raises(ValueError) as e_info:
         exchange_collector.log_exchange(
             "example_stage_output", some_smaller_array, 23.0
         )
-    assert "operands could not be broadcast together with remapped shapes" in str(
+    assert "Expected exchange example_stage_output of shape (5,), found (4,)" in str(
         e_info.value
     )
     exchange_collector.finalize()
@@ -120,3 +125,461 @@ def test_exchange_collector_can_initialized_without_input():
 
     exchange_collector.log_exchange("example_stage_output", some_array, 8.0)
     exchange_collector.finalize()
+
+
+def test_exchange_collector_buffers_rows(tmp_path_dev: Path) -> None:
+    """
+    Rows are written in blocks of `buffer_size`, a repeated time overwrites its
+    row also after it was written to the file.
+    """
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", "buffer_size": 2}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    logger = exchange_collector.exchanges["example_flux_output"]
+    assert isinstance(logger, NetcdfExchangeLogger)
+
+    for time in range(5):
+        exchange_collector.log_exchange(
+            "example_flux_output", np.full(3, float(time)), float(time)
+        )
+    assert logger.flushed == 4
+    exchange_collector.log_exchange("example_flux_output", np.full(3, -1.0), 1.0)
+    exchange_collector.log_exchange("example_flux_output", np.full(3, -4.0), 4.0)
+    exchange_collector.finalize()
+
+    ds = nc.Dataset(tmp_path_dev / "example_flux_output.nc", "r")
+    assert_equal(ds.variables["time"][:], np.arange(5.0))
+    assert_equal(ds.variables["xchg"][:, 0], [0.0, -1.0, 2.0, 3.0, -4.0])
+    ds.close()
+
+
+def test_exchange_collector_asynchronous(
+    tmp_path_dev: Path, output_config_toml: str
+) -> None:
+    """
+    Exchanges logged asynchronously are written by the writer thread, which
+    takes a copy of the array.
+    """
+    config_dict = tomli.loads(output_config_toml)
+    config_dict["general"]["output_dir"] = tmp_path_dev
+    config_dict["general"]["asynchronous"] = True
+    config_dict["general"]["queue_size"] = 2
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    assert exchange_collector.writer is not None
+
+    array = np.zeros(5)
+    for time in range(10):
+        array[:] = time
+        exchange_collector.log_exchange("example_flux_output", array, float(time))
+    exchange_collector.finalize()
+    assert exchange_collector.writer is None
+
+    ds = nc.Dataset(tmp_path_dev / "example_flux_output.nc", "r")
+    assert_equal(ds.variables["time"][:], np.arange(10.0))
+    assert_equal(ds.variables["xchg"][:, 0], np.arange(10.0))
+    ds.close()
+
+
+def test_exchange_collector_asynchronous_raises(
+    tmp_path_dev: Path, output_config_toml: str
+) -> None:
+    """An error in the writer thread is raised in the coupling loop"""
+    config_dict = tomli.loads(output_config_toml)
+    config_dict["general"]["output_dir"] = tmp_path_dev
+    config_dict["general"]["asynchronous"] = True
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    exchange_collector.log_exchange("example_stage_output", np.zeros(5), 8.0)
+    exchange_collector.log_exchange("example_stage_output", np.zeros(4), 23.0)
+    with pytest.raises(ValueError, match="Expected exchange example_stage_output"):
+        exchange_collector.finalize()
+
+
+def test_exchange_collector_single_file(
+    tmp_path_dev: Path, output_config_toml: str
+) -> None:
+    """All exchanges are logged to groups of a single, compressed file"""
+    config_dict = tomli.loads(output_config_toml)
+    config_dict["general"]["output_dir"] = tmp_path_dev
+    config_dict["general"]["output_file"] = "exchanges.nc"
+    config_dict["general"]["zlib"] = True
+    config_dict["general"]["chunksizes"] = [4, 100]
+    config_dict["exchanges"]["example_stage_output"]["dtype"] = "f4"
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+
+    some_array = np.array([1.1, 2.0, -4.8, np.nan, 3])
+    for time in range(10):
+        exchange_collector.log_exchange("example_flux_output", some_array, float(time))
+        exchange_collector.log_exchange("example_stage_output", some_array, float(time))
+    exchange_collector.finalize()
+
+    assert sorted(p.name for p in tmp_path_dev.glob("*.nc")) == ["exchanges.nc"]
+    ds = nc.Dataset(tmp_path_dev / "exchanges.nc", "r")
+    flux = ds["example_flux_output"].variables["xchg"]
+    stage = ds["example_stage_output"].variables["xchg"]
+    assert flux.dtype == np.float64
+    assert stage.dtype == np.float32
+    assert flux.filters()["zlib"]
+    assert flux.chunking() == [4, 5]
+    assert_equal(flux[:], np.tile(some_array, (10, 1)))
+    assert_equal(stage[:], np.tile(some_array.astype(np.float32), (10, 1)))
+    assert_equal(ds["example_stage_output"].variables["time"][:], np.arange(10.0))
+    ds.close()
+
+
+def test_exchange_collector_invalid_dtype(
+    tmp_path_dev: Path, output_config_toml: str
+) -> None:
+    config_dict = tomli.loads(output_config_toml)
+    config_dict["general"]["output_dir"] = tmp_path_dev
+    config_dict["general"]["dtype"] = "i4"
+    with pytest.raises(ValueError, match="should be f4 or f8"):
+        ExchangeCollector.from_config(config_dict)
+
+
+def _log_time_steps(
+    exchange_collector: ExchangeCollector,
+    values: list[float],
+    converged: list[bool] | None = None,
+) -> None:
+    """Logs an exchange of value `values[i]` at time step i + 1, twice per step"""
+    for i, value in enumerate(values):
+        time = float(i + 1)
+        exchange_collector.log_exchange("example_flux_output", np.zeros(3), time)
+        exchange_collector.log_exchange("example_flux_output", np.full(3, value), time)
+        exchange_collector.end_time_step(True if converged is None else converged[i])
+    exchange_collector.finalize()
+
+
+def _read_exchange(path: Path) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+    with nc.Dataset(path, "r") as ds:
+        return ds.variables["time"][:], ds.variables["xchg"][:, 0]
+
+
+@pytest.mark.parametrize(
+    "properties, expected_time, expected_value",
+    [
+        ({"every": 2}, [1.0, 3.0, 5.0], [1.0, 3.0, 5.0]),
+        ({"aggregate": "mean", "steps": 2}, [2.0, 4.0, 5.0], [1.5, 3.5, 5.0]),
+        ({"aggregate": "sum", "steps": 3}, [3.0, 5.0], [6.0, 9.0]),
+        ({"aggregate": "max", "steps": 2, "every": 2}, [3.0, 5.0], [3.0, 5.0]),
+        ({"aggregate": "min", "steps": 5}, [5.0], [1.0]),
+    ],
+)
+def test_exchange_collector_temporal(
+    tmp_path_dev: Path,
+    properties: dict[str, Any],
+    expected_time: list[float],
+    expected_value: list[float],
+) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", **properties}},
+    }
+    _log_time_steps(
+        ExchangeCollector.from_config(config_dict), [1.0, 2.0, 3.0, 4.0, 5.0]
+    )
+    time, value = _read_exchange(tmp_path_dev / "example_flux_output.nc")
+    assert_equal(time, expected_time)
+    assert_equal(value, expected_value)
+
+
+def test_exchange_collector_calendar_period(tmp_path_dev: Path) -> None:
+    """Daily values, summed per month"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev, "start_date": "2000-01-01"},
+        "exchanges": {
+            "example_flux_output": {
+                "type": "netcdf",
+                "aggregate": "sum",
+                "period": "month",
+            }
+        },
+    }
+    _log_time_steps(ExchangeCollector.from_config(config_dict), [1.0] * 60)
+    time, value = _read_exchange(tmp_path_dev / "example_flux_output.nc")
+    assert_equal(time, [31.0, 60.0])
+    assert_equal(value, [31.0, 29.0])
+
+
+@pytest.mark.parametrize(
+    "general, times, expected_time, expected_value",
+    [
+        ({}, [31.0, 60.0], [31.0, 60.0], [1.0, 2.0]),
+        ({"start_time": 31.0}, [60.0, 91.0], [60.0, 91.0], [1.0, 2.0]),
+    ],
+)
+def test_exchange_collector_calendar_period_first_step(
+    tmp_path_dev: Path,
+    general: dict[str, Any],
+    times: list[float],
+    expected_time: list[float],
+    expected_value: list[float],
+) -> None:
+    """Monthly time steps, the first one belongs to the month it starts in"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev, "start_date": "2000-01-01", **general},
+        "exchanges": {
+            "example_flux_output": {
+                "type": "netcdf",
+                "aggregate": "sum",
+                "period": "month",
+            }
+        },
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    for value, time in enumerate(times, start=1):
+        exchange_collector.log_exchange(
+            "example_flux_output", np.full(3, float(value)), time
+        )
+        exchange_collector.end_time_step(True)
+    exchange_collector.finalize()
+    time, value = _read_exchange(tmp_path_dev / "example_flux_output.nc")
+    assert_equal(time, expected_time)
+    assert_equal(value, expected_value)
+
+
+def test_exchange_collector_converged_only(tmp_path_dev: Path) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev, "converged_only": True},
+        "exchanges": {"example_flux_output": {"type": "netcdf"}},
+    }
+    _log_time_steps(
+        ExchangeCollector.from_config(config_dict),
+        [1.0, 2.0, 3.0],
+        converged=[True, False, True],
+    )
+    time, value = _read_exchange(tmp_path_dev / "example_flux_output.nc")
+    assert_equal(time, [1.0, 3.0])
+    assert_equal(value, [1.0, 3.0])
+
+
+@pytest.mark.parametrize(
+    "properties, message",
+    [
+        ({"every": 0}, "should be at least 1"),
+        ({"aggregate": "median", "steps": 2}, "should be one of"),
+        ({"aggregate": "mean"}, "either steps or a period"),
+        ({"aggregate": "mean", "period": "week"}, "should be one of"),
+        ({"aggregate": "mean", "period": "day"}, "requires a start_date"),
+    ],
+)
+def test_exchange_collector_temporal_invalid(
+    tmp_path_dev: Path, properties: dict[str, Any], message: str
+) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", **properties}},
+    }
+    with pytest.raises(ValueError, match=message):
+        ExchangeCollector.from_config(config_dict)
+
+
+def test_exchange_collector_subset(tmp_path_dev: Path) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", "indices": [4, 1]}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    exchange_collector.log_exchange("example_flux_output", np.arange(5.0), 1.0)
+    exchange_collector.finalize()
+
+    with nc.Dataset(tmp_path_dev / "example_flux_output.nc", "r") as ds:
+        assert_equal(ds.variables["id"][:], [4, 1])
+        assert_equal(ds.variables["xchg"][:], [[4.0, 1.0]])
+
+
+@pytest.mark.parametrize(
+    "zonal, expected", [("sum", [[3.0, 7.0]]), ("mean", [[1.5, 3.5]])]
+)
+def test_exchange_collector_zones(
+    tmp_path_dev: Path, zonal: str, expected: list[list[float]]
+) -> None:
+    """Zonal statistics, aggregated in time afterwards"""
+    tmp_path_dev.mkdir(parents=True, exist_ok=True)
+    zones_file = tmp_path_dev / "zones.txt"
+    zones_file.write_text("3\n-1\n3\n10\n10\n")
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {
+            "example_flux_output": {
+                "type": "netcdf",
+                "zones_file": str(zones_file),
+                "zonal": zonal,
+                "aggregate": "sum",
+                "steps": 2,
+            }
+        },
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    for time in [1.0, 2.0]:
+        exchange_collector.log_exchange(
+            "example_flux_output", np.array([1.0, 100.0, 0.5, 2.5, 1.0]), time
+        )
+        exchange_collector.end_time_step()
+    exchange_collector.finalize()
+
+    with nc.Dataset(tmp_path_dev / "example_flux_output.nc", "r") as ds:
+        assert_equal(ds.variables["id"][:], [3, 10])
+        assert_equal(ds.variables["xchg"][:], expected)
+
+
+def test_exchange_collector_spatial_invalid(tmp_path_dev: Path) -> None:
+    config_dict: dict[str, Any] = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", "indices": [0, 5]}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    with pytest.raises(ValueError, match="1 index values in exchange"):
+        exchange_collector.log_exchange("example_flux_output", np.zeros(5), 1.0)
+    exchange_collector.finalize()
+
+    config_dict["exchanges"]["example_flux_output"]["zones_file"] = "zones.txt"
+    with pytest.raises(ValueError, match="should set one of"):
+        ExchangeCollector.from_config(config_dict)
+
+
+@pytest.mark.parametrize("dtype", ["f4", "f8"])
+def test_exchange_collector_binary(tmp_path_dev: Path, dtype: str) -> None:
+    """The binary log grows beyond its capacity and is a valid .npy file"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {
+            "example_flux_output": {"type": "binary", "capacity": 2, "dtype": dtype}
+        },
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    for time in range(5):
+        exchange_collector.log_exchange(
+            "example_flux_output", np.full(3, float(time)), float(time)
+        )
+    exchange_collector.log_exchange("example_flux_output", np.full(3, -1.0), 1.0)
+    exchange_collector.finalize()
+
+    values = np.load(tmp_path_dev / "example_flux_output.npy", mmap_mode="r")
+    assert values.dtype == np.dtype(dtype)
+    assert_equal(values[:, 0], [0.0, -1.0, 2.0, 3.0, 4.0])
+    with open(tmp_path_dev / "example_flux_output.json") as f:
+        sidecar = json.load(f)
+    assert sidecar["shape"] == [5, 3]
+    assert sidecar["time"] == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_exchange_collector_binary_ids(tmp_path_dev: Path) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "binary", "indices": [2, 0]}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    exchange_collector.log_exchange("example_flux_output", np.arange(3.0), 1.0)
+    exchange_collector.finalize()
+
+    assert_equal(np.load(tmp_path_dev / "example_flux_output.npy"), [[2.0, 0.0]])
+    with open(tmp_path_dev / "example_flux_output.json") as f:
+        assert json.load(f)["id"] == [2, 0]
+
+
+def _log_iterations(
+    collector: ExchangeCollector, iterations: list[int], size: int = 3
+) -> None:
+    """Logs iteration + 10 * time step in the convergence loop of every time step"""
+    for step, niter in enumerate(iterations, start=1):
+        for kiter in range(1, niter + 1):
+            collector.iteration = kiter
+            collector.log_exchange(
+                "example_flux_output", np.full(size, kiter + 10.0 * step), float(step)
+            )
+        collector.iteration = None
+        collector.end_time_step(True)
+
+
+@pytest.mark.parametrize("asynchronous", [False, True])
+def test_exchange_collector_last_iteration(
+    tmp_path_dev: Path, asynchronous: bool
+) -> None:
+    """By default, only the state of the last iteration is logged"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev, "asynchronous": asynchronous},
+        "exchanges": {"example_flux_output": {"type": "netcdf"}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    logger = exchange_collector.exchanges["example_flux_output"]
+    assert isinstance(logger, NetcdfExchangeLogger)
+
+    exchange_collector.iteration = 1
+    exchange_collector.log_exchange("example_flux_output", np.zeros(3), 1.0)
+    assert logger.rows == {}
+    _log_iterations(exchange_collector, [3, 2])
+    exchange_collector.finalize()
+
+    time, values = _read_exchange(tmp_path_dev / "example_flux_output.nc")
+    assert_equal(time, [1.0, 2.0])
+    assert_equal(values, [13.0, 22.0])
+
+
+@pytest.mark.parametrize(
+    "properties, expected_size",
+    [
+        ({"type": "netcdf"}, 3),
+        ({"type": "netcdf", "indices": [2]}, 1),
+        ({"type": "binary"}, 3),
+    ],
+)
+def test_exchange_collector_iterations(
+    tmp_path_dev: Path, properties: dict[str, Any], expected_size: int
+) -> None:
+    """The first iterations of every time step are logged as (time, iteration, id)"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {**properties, "iterations": 3}},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    _log_iterations(exchange_collector, [2, 5])
+    exchange_collector.finalize()
+
+    expected = np.array([[11.0, 12.0, np.nan], [21.0, 22.0, 25.0]])
+    if properties["type"] == "netcdf":
+        with nc.Dataset(tmp_path_dev / "example_flux_output.nc", "r") as ds:
+            assert ds.variables["xchg"].dimensions == ("time", "iteration", "id")
+            values = ds.variables["xchg"][:].filled(np.nan)
+    else:
+        values = np.load(tmp_path_dev / "example_flux_output.npy")
+    assert values.shape == (2, 3, expected_size)
+    assert_equal(values[..., 0], expected)
+
+
+@pytest.mark.parametrize(
+    "properties",
+    [
+        {"type": "netcdf"},
+        {"type": "binary"},
+        {"type": "netcdf", "every": 2},
+        {"type": "binary", "iterations": 2},
+    ],
+)
+def test_exchange_collector_single_value_raises(
+    tmp_path_dev: Path, properties: dict[str, Any]
+) -> None:
+    """An exchange of a single value isn't broadcast to the size of the first one"""
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": properties},
+    }
+    exchange_collector = ExchangeCollector.from_config(config_dict)
+    exchange_collector.log_exchange("example_flux_output", np.zeros(3), 1.0)
+    with pytest.raises(
+        ValueError,
+        match=r"Expected exchange example_flux_output of shape \(3,\), found \(1,\)",
+    ):
+        exchange_collector.log_exchange("example_flux_output", np.ones(1), 1.0)
+    exchange_collector.finalize()
+
+
+def test_exchange_collector_iterations_invalid(tmp_path_dev: Path) -> None:
+    config_dict = {
+        "general": {"output_dir": tmp_path_dev},
+        "exchanges": {"example_flux_output": {"type": "netcdf", "iterations": 0}},
+    }
+    with pytest.raises(ValueError, match="should be at least 1"):
+        ExchangeCollector.from_config(config_dict)
@@ -0,0 +1,380 @@
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+from numpy.testing import assert_allclose
+from numpy.typing import NDArray
+from scipy.sparse import csr_matrix
+
+from imod_coupler.drivers.ribametamod.exchange import CoupledExchangeBalance
+from imod_coupler.kernelwrappers.mf6_wrapper import (
+    Mf6BoundaryGroup,
+    Mf6Drainage,
+    Mf6River,
+)
+from imod_coupler.testing.fake_kernels import (
+    FakeMf6Wrapper,
+    create_metamod,
+    create_ribametamod,
+    create_ribamod,
+)
+
+
+def test_fake_metamod(tmp_path_dev: Path) -> None:
+    """
+    MetaMod runs end-to-end on the fake kernels, with the recharge of every
+    cell being the summed volume of its svats.
+    """
+    driver = create_metamod(tmp_path_dev, n_svat=300, n_node=100, n_well=10)
+    driver.execute()
+
+    assert driver.get_current_time() == driver.get_end_time()
+    # svats i, i + 100 and i + 200 are coupled to cell i
+    volume = driver.msw_volume.reshape(3, 100).sum(axis=0)
+    assert_allclose(driver.mf6_recharge, volume / driver.delt / driver.mf6_area)
+    assert_allclose(driver.msw_head, np.tile(driver.mf6_head, 3))
+    assert np.all(driver.mf6_sprinkling_wells > 0.0)
+
+
+def test_fake_metamod_recharge_nodelist(tmp_path_dev: Path) -> None:
+    """The recharge is divided by the area of the current recharge cells"""
+    driver = create_metamod(tmp_path_dev, n_svat=10, n_node=10, n_timestep=3)
+    assert isinstance(driver.mf6, FakeMf6Wrapper)
+    area = driver.mf6.values["GWF_1/DIS/AREA"]
+    area[:] = np.arange(1.0, 11.0)
+    nodelist = driver.mf6.values["GWF_1/RCH_MSW/NODELIST"]
+    cells = nodelist.copy()
+    # MODFLOW 6 only fills the nodelist when it reads the period data
+    nodelist[:] = 0
+    driver.initialize()
+    nodelist[:] = cells
+    driver.update()
+    volume = driver.msw_volume
+    assert_allclose(driver.mf6_recharge, volume / driver.delt / area[cells - 1])
+
+    # a new stress period with other recharge cells
+    nodelist[:] = cells[::-1]
+    driver.mf6.values["TDIS/KPER"][0] = 2
+    driver.update()
+    assert_allclose(driver.mf6_recharge, volume / driver.delt / area[cells[::-1] - 1])
+    # the inverse area is only computed once per stress period
+    inverse_area = driver.recharge_area.inverse_area
+    assert driver.recharge_area.nodelist_period == 2
+    driver.update()
+    assert driver.recharge_area.inverse_area is inverse_area
+    assert_allclose(inverse_area, 1.0 / area[cells[::-1] - 1])
+
+
+def test_fake_ribamod(tmp_path_dev: Path) -> None:
+    """
+    RibaMod runs end-to-end on the fake kernels, exchanging with all basins.
+    """
+    driver = create_ribamod(
+        tmp_path_dev,
+        n_node=100,
+        n_basin=10,
+        n_bound=50,
+        n_passive_river=1,
+        n_passive_drainage=1,
+    )
+    driver.execute()
+
+    assert driver.get_current_time() == driver.get_end_time()
+    assert driver.coupled_mod2rib.all()
+    assert np.any(driver.ribasim_drainage > 0.0)
+    assert np.any(driver.ribasim_infiltration > 0.0)
+
+
+def test_fake_ribamod_uncoupled_basins(tmp_path_dev: Path) -> None:
+    """Only the coupled basins receive fluxes"""
+    driver = create_ribamod(
+        tmp_path_dev,
+        n_node=100,
+        n_basin=60,
+        n_bound=50,
+        n_passive_river=1,
+        n_passive_drainage=1,
+    )
+    driver.execute()
+
+    assert_allclose(driver.coupled_basins, np.arange(50))
+    assert np.any(driver.ribasim_drainage[:50] > 0.0)
+    assert not driver.ribasim_drainage[50:].any()
+    assert not driver.ribasim_infiltration[50:].any()
+
+
+def test_fake_ribametamod(tmp_path_dev: Path) -> None:
+    """
+    RibaMetaMod runs end-to-end on the fake kernels, including surface water
+    sub-timestepping and sprinkling from both groundwater and surface water.
+    """
+    driver = create_ribametamod(
+        tmp_path_dev,
+        n_svat=300,
+        n_node=100,
+        n_basin=10,
+        n_bound=50,
+        n_passive_drainage=1,
+        n_well=5,
+        n_user=3,
+        delt_sw=0.25,
+    )
+    driver.execute()
+
+    assert driver.get_current_time() == driver.get_end_time()
+    assert driver.enable_sprinkling_groundwater
+    assert driver.enable_sprinkling_surface_water
+    assert np.all(driver.exchange.demands["sw_ponding"] > 0.0)
+
+
+def test_fake_ribametamod_demands_mf6(tmp_path_dev: Path) -> None:
+    """The MODFLOW 6 demands are copies, not views of the group's flux estimate"""
+    driver = create_ribametamod(
+        tmp_path_dev, n_svat=30, n_node=10, n_basin=5, n_bound=10, delt_sw=0.5
+    )
+    driver.initialize()
+    driver.update()
+    exchange = driver.exchange
+    assert exchange.demands_mf6
+    demands_mf6 = {key: demand.copy() for key, demand in exchange.demands_mf6.items()}
+
+    exchange.mf6_river_group.get_flux_estimate(driver.mf6_head + 10.0)
+    for key, demand in exchange.demands_mf6.items():
+        assert_allclose(demand, demands_mf6[key])
+
+
+def test_fake_ribametamod_invalid_coupled_basins(tmp_path_dev: Path) -> None:
+    driver = create_ribametamod(
+        tmp_path_dev, n_svat=30, n_node=10, n_basin=5, n_bound=10, delt_sw=0.5
+    )
+    driver.initialize()
+    driver.mapping.coupled_basins = np.array([0, 5])
+    with pytest.raises(ValueError, match="1 basin values in the coupled basins"):
+        CoupledExchangeBalance(
+            shape=driver.ribasim_infiltration.size,
+            labels=driver.exchange_labels(),
+            mf6_river_packages=driver.mf6_river_packages,
+            mf6_drainage_packages=driver.mf6_drainage_packages,
+            mf6_active_river_api_packages=driver.mf6_active_river_api_packages,
+            mapping=driver.mapping,
+            ribasim_infiltration=driver.ribasim_infiltration,
+            ribasim_drainage=driver.ribasim_drainage,
+            exchange_logger=driver.exchange_logger,
+        )
+
+
+def test_mf6_pointer_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Addresses are resolved once, until the pointers are invalidated"""
+    nodelist = np.array([1, 2, 3], dtype=np.int32)
+    mf6 = FakeMf6Wrapper(
+        n_node=5, river_packages={"riv-1": nodelist, "riv-2": nodelist}
+    )
+    mf6.initialize()
+    calls: list[str] = []
+    get_value_ptr = mf6.get_value_ptr
+
+    def counting_get_value_ptr(name: str) -> NDArray[Any]:
+        calls.append(name)
+        return get_value_ptr(name)
+
+    monkeypatch.setattr(mf6, "get_value_ptr", counting_get_value_ptr)
+
+    stage = mf6.get_river_stages("GWF_1", "riv-1")
+    for _ in range(3):
+        mf6.set_river_stages("GWF_1", "riv-1", np.arange(3.0))
+        mf6.get_river_flux_estimate("GWF_1", "riv-1")
+    assert_allclose(stage, np.arange(3.0))
+    assert sorted(calls) == [
+        "GWF_1/RIV-1/COND",
+        "GWF_1/RIV-1/NODELIST",
+        "GWF_1/RIV-1/RBOT",
+        "GWF_1/RIV-1/STAGE",
+        "GWF_1/X",
+    ]
+
+    # invalidating a package keeps the pointers of other packages
+    mf6.get_river_stages("GWF_1", "riv-2")
+    mf6.invalidate_pointers("GWF_1", "riv-1")
+    calls.clear()
+    mf6.get_river_stages("GWF_1", "riv-1")
+    mf6.get_river_stages("GWF_1", "riv-2")
+    assert calls == ["GWF_1/RIV-1/STAGE"]
+
+    # MODFLOW 6 doesn't reallocate its arrays, neither in a time step nor in a
+    # new stress period, so the pointers are kept
+    mf6.prepare_time_step(0.0)
+    mf6.values["TDIS/KPER"][0] = 2
+    mf6.prepare_time_step(0.0)
+    calls.clear()
+    mf6.get_river_stages("GWF_1", "riv-2")
+    assert calls == []
+    assert mf6.stress_period == 2
+
+    # as opposed to an explicit invalidation of all pointers
+    mf6.invalidate_pointers()
+    calls.clear()
+    mf6.get_river_stages("GWF_1", "riv-2")
+    assert calls == ["GWF_1/RIV-2/STAGE"]
+
+
+def test_mf6_nodelist_update() -> None:
+    """The private nodelists are only set again in a new stress period"""
+    mf6 = FakeMf6Wrapper(
+        n_node=5, river_packages={"riv-1": np.array([1, 2, 3], dtype=np.int32)}
+    )
+    mf6.initialize()
+    mf6.prepare_time_step(0.0)
+    head = mf6.get_head("GWF_1")
+    river = mf6.get_rivers_packages("GWF_1", ["riv-1"])["riv-1"]
+    group = Mf6BoundaryGroup({"riv-1": river})
+    river.get_flux_estimate(head)
+    group.get_flux_estimate(head)
+
+    mf6.values["GWF_1/RIV-1/NODELIST"][:] = [3, 4, 5]
+    mf6.prepare_time_step(0.0)
+    river.get_flux_estimate(head)
+    group.get_flux_estimate(head)
+    assert_allclose(river.private_nodelist, [0, 1, 2])
+    assert_allclose(group.head, head[[0, 1, 2]])
+
+    mf6.values["TDIS/KPER"][0] = 2
+    mf6.prepare_time_step(0.0)
+    river.get_flux_estimate(head)
+    group.get_flux_estimate(head)
+    assert_allclose(river.private_nodelist, [2, 3, 4])
+    assert_allclose(group.head, head[[2, 3, 4]])
+
+
+def test_mf6_nodelist_placeholder() -> None:
+    """A nodelist that isn't filled yet raises, instead of reading other cells"""
+    mf6 = FakeMf6Wrapper(
+        n_node=5, river_packages={"riv-1": np.array([1, 2, 3], dtype=np.int32)}
+    )
+    mf6.initialize()
+    head = mf6.get_head("GWF_1")
+    nodelist = mf6.values["GWF_1/RIV-1/NODELIST"]
+    nodelist[:] = -1
+    river = mf6.get_rivers_packages("GWF_1", ["riv-1"])["riv-1"]
+    group = Mf6BoundaryGroup({"riv-1": river})
+    with pytest.raises(ValueError, match="3 node values in the nodelist of GWF_1"):
+        river.get_flux_estimate(head)
+    with pytest.raises(ValueError, match="3 node values in the nodelists of riv-1"):
+        group.get_flux_estimate(head)
+
+    # MODFLOW 6 fills the nodelist when it reads the period data
+    nodelist[:] = [1, 2, 5]
+    mf6.prepare_time_step(0.0)
+    river.get_flux_estimate(head)
+    group.get_flux_estimate(head)
+    assert_allclose(river.head, head[[0, 1, 4]])
+    assert_allclose(group.head, head[[0, 1, 4]])
+
+
+def test_mf6_setters() -> None:
+    nodelist = np.array([1, 2, 3], dtype=np.int32)
+    mf6 = FakeMf6Wrapper(
+        n_node=5,
+        well_packages={"wel-1": nodelist},
+        river_packages={"riv-1": nodelist, "riv-2": nodelist[:2]},
+        drainage_packages={"drn-1": nodelist},
+    )
+    mf6.initialize()
+
+    mf6.set_well_flux("GWF_1", "wel-1", np.array([1.0, 2.0, 3.0]))
+    assert_allclose(mf6.get_sprinkling("GWF_1", "wel-1"), [1.0, 2.0, 3.0])
+    mf6.set_drainage_elevation("GWF_1", "drn-1", np.array([4.0, 5.0, 6.0]))
+    assert_allclose(mf6.get_drainage_elevation("GWF_1", "drn-1"), [4.0, 5.0, 6.0])
+
+    mf6.set_values(
+        "GWF_1", "STAGE", {"riv-1": np.full(3, 7.0), "riv-2": np.full(2, 8.0)}
+    )
+    assert_allclose(mf6.get_river_stages("GWF_1", "riv-1"), 7.0)
+    assert_allclose(mf6.get_river_stages("GWF_1", "riv-2"), 8.0)
+
+    with pytest.raises(ValueError, match="Expected size of flux is 3"):
+        mf6.set_well_flux("GWF_1", "wel-1", np.zeros(2))
+    with pytest.raises(ValueError, match="Expected size of STAGE of riv-2 is 2"):
+        mf6.set_values("GWF_1", "STAGE", {"riv-2": np.zeros(3)})
+
+
+def test_mf6_flux_getters_out() -> None:
+    """The flux getters write into the given array, using scratch buffers"""
+    nodelist = np.array([1, 3, 5], dtype=np.int32)
+    mf6 = FakeMf6Wrapper(n_node=5, river_packages={"riv-1": nodelist})
+    mf6.initialize()
+    mf6.prepare_time_step(0.0)
+    head = mf6.get_head("GWF_1")
+    stage = mf6.get_river_stages("GWF_1", "riv-1")
+    rbot = mf6.get_river_bot("GWF_1", "riv-1")
+    cond = mf6.get_pointer("COND", "GWF_1", "riv-1")
+    hcof = mf6.get_pointer("HCOF", "GWF_1", "riv-1")
+    rhs = mf6.get_pointer("RHS", "GWF_1", "riv-1")
+    river_head = head[nodelist - 1]
+
+    out = np.empty(3)
+    q = mf6.get_river_flux_estimate("GWF_1", "riv-1", out=out)
+    assert q is out
+    assert_allclose(q, cond * (stage - np.maximum(river_head, rbot)))
+    q = mf6.get_river_drain_flux("GWF_1", "riv-1", out=out)
+    assert q is out
+    assert_allclose(q, hcof * river_head - rhs)
+    # without out, a new array is returned
+    q_new = mf6.get_river_drain_flux("GWF_1", "riv-1")
+    assert q_new is not out
+    assert_allclose(q_new, out)
+
+
+def test_mf6_flux_getters_invalid_nodelist() -> None:
+    """A nodelist that isn't filled yet raises, instead of reading other cells"""
+    mf6 = FakeMf6Wrapper(
+        n_node=5, river_packages={"riv-1": np.array([1, 3, 5], dtype=np.int32)}
+    )
+    mf6.initialize()
+    mf6.values["GWF_1/RIV-1/NODELIST"][:] = -1
+    with pytest.raises(ValueError, match="3 node values in the nodelist of GWF_1"):
+        mf6.get_river_flux_estimate("GWF_1", "riv-1")
+    mf6.values["GWF_1/RIV-1/NODELIST"][:] = [1, 3, 6]
+    with pytest.raises(ValueError, match="first at row 2: 5"):
+        mf6.get_river_drain_flux("GWF_1", "riv-1")
+
+
+def test_mf6_boundary_group() -> None:
+    """The stacked fluxes equal those of the individual packages"""
+    mf6 = FakeMf6Wrapper(
+        n_node=10,
+        river_packages={
+            "riv-1": np.array([1, 2, 3], dtype=np.int32),
+            "riv-2": np.array([4, 10], dtype=np.int32),
+        },
+        drainage_packages={"drn-1": np.array([5, 6, 7, 8], dtype=np.int32)},
+    )
+    mf6.initialize()
+    mf6.prepare_time_step(0.0)
+    head = mf6.get_head("GWF_1")
+    packages: dict[str, Mf6River | Mf6Drainage] = {
+        **mf6.get_rivers_packages("GWF_1", ["riv-1", "riv-2"]),
+        **mf6.get_drainage_packages("GWF_1", ["drn-1"]),
+    }
+    group = Mf6BoundaryGroup(packages)
+    assert group.n_bound == 9
+    assert group.slices["riv-2"] == slice(3, 5)
+
+    q = group.get_flux(head)
+    q_estimate = group.get_flux_estimate(head)
+    for key, package in packages.items():
+        assert_allclose(q[group.slices[key]], package.get_flux(head))
+        assert_allclose(q_estimate[group.slices[key]], package.get_flux_estimate(head))
+
+    # the stacked mapping gives the mapped values of every package
+    mappings = {
+        key: csr_matrix(np.ones((2, package.n_bound)))
+        for key, package in packages.items()
+    }
+    mapped = group.stack_mapping(mappings).dot(q).reshape(len(group), 2)
+    for i, key in enumerate(packages):
+        assert_allclose(mapped[i], mappings[key].dot(q[group.slices[key]]))
+
+    empty = Mf6BoundaryGroup({})
+    assert empty.get_flux(head).size == 0
+    assert empty.stack_mapping({}).dot(empty.q).reshape(0, 2).sum(axis=0).shape == (2,)
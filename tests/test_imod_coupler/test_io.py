@@ -0,0 +1,133 @@
+import os
+from collections.abc import Iterator
+from pathlib import Path
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from imod_coupler.io import check_bounds, configure_table_cache, load_table
+
+
+@pytest.fixture
+def table_path(tmp_path: Path) -> Path:
+    path = tmp_path / "mod2svat.inp"
+    path.write_text("1 10 1\n2 11 1\n3 12 2\n")
+    return path
+
+
+def test_load_table_creates_and_uses_cache(table_path: Path) -> None:
+    table = load_table(table_path, ncol=3)
+    cache_path = table_path.with_name("mod2svat.inp.npz")
+    assert table.dtype == np.int32
+    assert table.shape == (3, 3)
+    assert table[:, 0].flags.c_contiguous
+    assert cache_path.is_file()
+
+    # a valid cache is used instead of parsing the table
+    with open(cache_path, "wb") as f:
+        stat = table_path.stat()
+        np.savez(
+            f,
+            table=np.zeros((1, 3), dtype=np.int32),
+            size=stat.st_size,
+            mtime=stat.st_mtime_ns,
+            hash="",
+            options="skiprows=0",
+        )
+    assert load_table(table_path, ncol=3).shape == (1, 3)
+    # different options are parsed again
+    np.testing.assert_array_equal(
+        load_table(table_path, ncol=3, header=True), table[1:]
+    )
+
+
+def test_load_table_invalidates_cache(table_path: Path) -> None:
+    load_table(table_path, ncol=3)
+    table_path.write_text("1 10 1\n2 11 1\n4 12 2\n")
+    assert load_table(table_path, ncol=3)[2, 0] == 4
+
+
+def test_load_table_touched(table_path: Path) -> None:
+    table = load_table(table_path, ncol=3)
+    stat = table_path.stat()
+    os.utime(table_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    np.testing.assert_array_equal(load_table(table_path, ncol=3), table)
+    # the cache is refreshed with the new modification time
+    with np.load(table_path.with_name("mod2svat.inp.npz")) as cache:
+        assert int(cache["mtime"]) == table_path.stat().st_mtime_ns
+
+
+def test_load_table_unwritable_cache(table_path: Path) -> None:
+    """A cache that can't be written is not an error, but it is logged"""
+    cache_path = table_path.with_name("mod2svat.inp.npz")
+    cache_path.mkdir()
+    messages: list[str] = []
+    handler_id = logger.add(messages.append, level="WARNING")
+    try:
+        table = load_table(table_path, ncol=3)
+    finally:
+        logger.remove(handler_id)
+    assert table.shape == (3, 3)
+    assert cache_path.is_dir()
+    assert list(table_path.parent.glob("*.tmp")) == []
+    assert len(messages) == 1
+    assert "Can't write cache" in messages[0]
+
+
+@pytest.fixture
+def reset_table_cache() -> Iterator[None]:
+    yield
+    configure_table_cache()
+
+
+@pytest.mark.usefixtures("reset_table_cache")
+def test_load_table_cache_disabled(table_path: Path) -> None:
+    configure_table_cache(enabled=False)
+    table = load_table(table_path, ncol=3)
+    assert table.shape == (3, 3)
+    assert list(table_path.parent.glob("*.npz")) == []
+
+
+@pytest.mark.usefixtures("reset_table_cache")
+def test_load_table_cache_dir(table_path: Path, tmp_path: Path) -> None:
+    """The cache is stored in the cache directory, instead of next to the table"""
+    cache_dir = tmp_path / "cache"
+    configure_table_cache(cache_dir=cache_dir)
+    table = load_table(table_path, ncol=3)
+    assert list(table_path.parent.glob("*.npz")) == []
+    (cache_path,) = cache_dir.glob("mod2svat.inp.*.npz")
+    with np.load(cache_path) as cache:
+        assert int(cache["mtime"]) == table_path.stat().st_mtime_ns
+    assert np.array_equal(load_table(table_path, ncol=3), table)
+
+
+def test_load_table_tsv(tmp_path: Path) -> None:
+    path = tmp_path / "riv-1.tsv"
+    path.write_text("basin_index\tbound_index\n0\t0\n2\t1\n")
+    basin_index, bound_index = load_table(path, ncol=2, header=True).T
+    np.testing.assert_array_equal(basin_index, [0, 2])
+    np.testing.assert_array_equal(bound_index, [0, 1])
+
+    path.write_text("basin_index\tbound_index\n")
+    assert load_table(path, ncol=2, header=True).shape == (0, 2)
+
+
+def test_load_table_invalid(table_path: Path) -> None:
+    with pytest.raises(ValueError, match="Expected 2 columns"):
+        load_table(table_path, ncol=2)
+    table_path.write_text("1 10 1\n2 11\n")
+    with pytest.raises(ValueError, match="number of columns changed"):
+        load_table(table_path, ncol=3)
+    table_path.write_text("1 10 1\n2 99999999999 1\n")
+    with pytest.raises(ValueError, match="99999999999"):
+        load_table(table_path, ncol=3)
+    table_path.write_text("1 10 1\n2 11.5 1\n")
+    with pytest.raises(ValueError, match="could not convert string '11.5'"):
+        load_table(table_path, ncol=3)
+
+
+def test_check_bounds() -> None:
+    check_bounds(np.array([0, 4]), 5, "node", "nodenr2svat.dxc")
+    with pytest.raises(ValueError, match="2 node values .* first at row 1: -1"):
+        check_bounds(np.array([0, -1, 5]), 5, "node", "nodenr2svat.dxc")
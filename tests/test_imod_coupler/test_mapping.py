@@ -4,8 +4,11 @@ from imod import mf6, msw
 from numpy.testing import assert_almost_equal, assert_array_equal
 from primod.mapping.rch_svat_mapping import RechargeSvatMapping
 from pytest_cases import parametrize_with_cases
+from scipy.sparse import csr_matrix, dia_matrix
 
-from imod_coupler.utils import create_mapping
+import imod_coupler.exchange_operator as exchange_operator_module
+from imod_coupler.exchange_operator import ExchangeOperator
+from imod_coupler.utils import SvatLookup, create_mapping
 
 
 @parametrize_with_cases(
@@ -33,6 +36,96 @@ def test_create_mapping(
     assert_array_equal(mask, expected_mask)
 
 
+@parametrize_with_cases(
+    "src_idx,tgt_idx,nsrc,ntgt,operator,expected_map_dense,expected_mask",
+    prefix="util_",
+)
+def test_exchange_operator(
+    src_idx, tgt_idx, nsrc, ntgt, operator, expected_map_dense, expected_mask
+):
+    """
+    The exchange operator updates the target in place, equivalent to
+    evaluating mask * target + factor * mapping.dot(source)
+    """
+    map_out, mask = create_mapping(src_idx, tgt_idx, nsrc, ntgt, operator)
+    exchange_operator = ExchangeOperator(map_out, mask)
+
+    rng = np.random.default_rng(0)
+    source = rng.random(nsrc)
+    target = rng.random(ntgt)
+    expected = mask * target + 0.5 * map_out.dot(source)
+
+    exchange_operator.exchange(source, target, 0.5)
+
+    assert_almost_equal(target, expected)
+    # 1:1 and 1:n mappings are evaluated as a gather from the source
+    n_source = np.count_nonzero(expected_map_dense, axis=1)
+    assert exchange_operator.is_gather == np.all(n_source[n_source > 0] == 1)
+
+
+def test_exchange_operator_weighted_gather():
+    map_out, mask = create_mapping(
+        np.array([2, 0, 1]), np.array([0, 1, 3]), 3, 4, "sum"
+    )
+    weights = dia_matrix((np.array([2.0, 3.0, 4.0, 5.0]), [0]), shape=(4, 4))
+    exchange_operator = ExchangeOperator(weights * map_out, mask)
+    target = np.full(4, -1.0)
+
+    exchange_operator.exchange(np.array([10.0, 20.0, 30.0]), target)
+
+    assert exchange_operator.is_gather
+    assert_array_equal(target, [60.0, 30.0, -1.0, 100.0])
+
+
+def test_exchange_operator_without_csr_matvec(monkeypatch):
+    """Without the internal csr_matvec of scipy, the exchange falls back to @"""
+    monkeypatch.setattr(exchange_operator_module, "_csr_matvec", None)
+    map_out, mask = create_mapping(
+        np.array([0, 1, 2]), np.array([0, 0, 2]), 3, 3, "sum"
+    )
+    exchange_operator = ExchangeOperator(map_out, mask)
+    target = np.full(3, -1.0)
+
+    exchange_operator.exchange(np.array([1.0, 2.0, 4.0]), target, 0.5)
+
+    assert not exchange_operator.is_gather
+    assert_array_equal(target, [1.5, -1.0, 2.0])
+
+
+def test_exchange_operator_invalid():
+    """Invalid indexes or sources raise, instead of reading other entries"""
+    mapping = csr_matrix(
+        (np.ones(2), np.array([0, 7]), np.array([0, 1, 2])), shape=(2, 3)
+    )
+    with pytest.raises(ValueError, match="1 source values in the mapping"):
+        ExchangeOperator(mapping, np.zeros(2))
+
+    map_out, mask = create_mapping(np.array([2, 0]), np.array([0, 1]), 3, 2, "sum")
+    exchange_operator = ExchangeOperator(map_out, mask)
+    with pytest.raises(ValueError, match="Expected a source of size 3, found 2"):
+        exchange_operator.exchange(np.zeros(2), np.zeros(2))
+
+
+def test_svat_lookup():
+    svat_id = np.array([5, 3, 5, 1], dtype=np.int32)
+    svat_lay = np.array([1, 1, 2, 1], dtype=np.int32)
+    svat_lookup = SvatLookup(svat_id, svat_lay)
+
+    indices = svat_lookup.indices(
+        np.array([1, 5, 5, 3, 1], dtype=np.int32),
+        np.array([1, 2, 1, 1, 1], dtype=np.int32),
+    )
+
+    assert_array_equal(indices, [3, 2, 0, 1, 3])
+
+
+def test_svat_lookup_missing():
+    svat_lookup = SvatLookup(np.array([1, 2]), np.array([1, 1]), "mod2svat.inp")
+
+    with pytest.raises(ValueError, match=r"2 \(svat, layer\).*\(1, 2\), \(3, 1\)"):
+        svat_lookup.indices(np.array([1, 3, 2, 1]), np.array([2, 1, 1, 2]))
+
+
 @parametrize_with_cases("recharge", prefix="rch", has_tag="succeed")
 def test_recharge_mapping(
     recharge: mf6.Recharge, prepared_msw_model: msw.MetaSwapModel
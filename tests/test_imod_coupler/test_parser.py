@@ -12,3 +12,10 @@ def test_get_version(capsys: pytest.CaptureFixture[str]) -> None:
     output_version = captured.out.strip()
     assert output_version is not None
     assert output_version == __version__
+
+
+def test_enable_trace() -> None:
+    args = imod_coupler.parser.parse_args(["imod_coupler.toml", "--enable-trace"])
+    assert args.enable_trace
+    args = imod_coupler.parser.parse_args(["imod_coupler.toml"])
+    assert not args.enable_trace
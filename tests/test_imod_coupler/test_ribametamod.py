@@ -944,3 +944,31 @@ def test_exchange_balance() -> None:
         ValueError, match="Invalid realised volumes: found shortage for positive demand"
     ):
         exchange.compute_realised(realised)
+
+
+def test_exchange_balance_label_arrays() -> None:
+    exchange = ExchangeBalance(shape=3, labels=["sw_ponding", "riv-1", "drn-1"])
+    # the arrays of all labels are rows of a single array
+    exchange.demands["riv-1"] = np.array([1.0, 2.0, 3.0])
+    exchange.demands.add("drn-1", 1.0)
+    np.testing.assert_allclose(exchange.demands.array[1:], [[1, 2, 3], [1, 1, 1]])
+    # the total is kept up to date when the arrays are set
+    np.testing.assert_allclose(exchange.demand, [2.0, 3.0, 4.0])
+    exchange.demands["riv-1"] = np.array([2.0, 2.0, 2.0])
+    exchange.demands.set_rows(slice(0, 1), np.array([[0.5, 0.5, 0.5]]))
+    np.testing.assert_allclose(exchange.demand, [3.5, 3.5, 3.5])
+    # the arrays and the total are only written through the methods
+    with pytest.raises(ValueError, match="read-only"):
+        exchange.demands["drn-1"] += 1.0
+    with pytest.raises(ValueError, match="read-only"):
+        exchange.demand[:] = 0.0
+    with pytest.raises(KeyError):
+        exchange.demands["riv-2"] = np.zeros(3)
+    with pytest.raises(KeyError):
+        exchange.demands.add("riv-2", 1.0)
+
+    assert exchange.demands.rows(["riv-1", "drn-1"]) == slice(1, 3)
+    np.testing.assert_array_equal(exchange.demands.rows(["drn-1", "riv-1"]), [2, 1])
+    exchange.reset()
+    assert not exchange.demands.array.any()
+    assert not exchange.demand.any()
@@ -0,0 +1,59 @@
+import csv
+from pathlib import Path
+
+import pytest
+
+from imod_coupler.logging.run_metrics import RunMetrics
+from imod_coupler.testing.fake_kernels import (
+    FakeMf6Wrapper,
+    create_metamod,
+    create_ribamod,
+)
+
+
+def read_metrics(path: Path) -> list[dict[str, str]]:
+    with open(path, newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_run_metrics_metamod(tmp_path_dev: Path) -> None:
+    """The metrics are written without timing, for every time step"""
+    driver = create_metamod(
+        tmp_path_dev, n_svat=30, n_node=10, n_iter=3, n_timestep=4, timing=False
+    )
+    metrics = RunMetrics(tmp_path_dev / "imod_coupler_metrics.csv")
+    driver.run_metrics = metrics
+    driver.execute()
+    metrics.finalize()
+
+    rows = read_metrics(tmp_path_dev / "imod_coupler_metrics.csv")
+    assert [float(row["time"]) for row in rows] == [1.0, 2.0, 3.0, 4.0]
+    assert all(float(row["delt"]) == 1.0 for row in rows)
+    assert all(row["iterations"] == "3" for row in rows)
+    assert all(row["converged"] == "1" for row in rows)
+    for row in rows:
+        kernel_time = float(row["modflow6_time"]) + float(row["metaswap_time"])
+        assert kernel_time > 0.0
+        assert float(row["coupler_overhead"]) == pytest.approx(
+            max(float(row["wall_time"]) - kernel_time, 0.0)
+        )
+    # no timing statistics are collected
+    assert driver.timing_registry.phases == {}
+    assert metrics.summary()["steps"] == 4
+
+
+def test_run_metrics_not_converged(tmp_path_dev: Path) -> None:
+    driver = create_ribamod(
+        tmp_path_dev, n_node=10, n_basin=5, n_bound=10, n_iter=5, n_timestep=2
+    )
+    assert isinstance(driver.mf6, FakeMf6Wrapper)
+    driver.mf6.values["SLN_1/MXITER"][0] = 2
+    metrics = RunMetrics(tmp_path_dev / "imod_coupler_metrics.csv")
+    driver.run_metrics = metrics
+    driver.execute()
+    metrics.finalize()
+
+    rows = read_metrics(tmp_path_dev / "imod_coupler_metrics.csv")
+    assert [row["iterations"] for row in rows] == ["2", "2"]
+    assert [row["converged"] for row in rows] == ["0", "0"]
+    assert metrics.summary()["not_converged"] == 2
@@ -0,0 +1,79 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from imod_coupler.logging.timing_registry import TimingRegistry
+from imod_coupler.testing.fake_kernels import create_metamod, create_ribametamod
+
+
+def test_phase_statistics() -> None:
+    registry = TimingRegistry()
+    for seconds in range(1, 101):
+        registry.add("exchange_msw2mod", float(seconds))
+
+    (row,) = registry.summary()
+    assert row["phase"] == "exchange_msw2mod"
+    assert row["kind"] == "coupler"
+    assert row["count"] == 100
+    assert row["total"] == pytest.approx(5050.0)
+    assert row["mean"] == pytest.approx(50.5)
+    assert row["p95"] == pytest.approx(95.05)
+
+
+def test_disabled_registry_records_nothing() -> None:
+    registry = TimingRegistry(enabled=False)
+    with registry.measure("update"):
+        pass
+    assert registry.phases == {}
+    assert registry.coupler_overhead == 0.0
+
+
+def test_timing_metamod(tmp_path_dev: Path) -> None:
+    driver = create_metamod(
+        tmp_path_dev, n_svat=300, n_node=100, n_well=10, n_timestep=5, timing=True
+    )
+    driver.execute()
+    driver.report_timing_totals()
+
+    phases = driver.timing_registry.phases
+    assert phases["update"].count == 5
+    assert phases["modflow6.prepare_time_step"].count == 5
+    assert phases["modflow6.solve"].count == phases["exchange_msw2mod"].count
+    assert phases["metaswap.solve"].count > 0
+    assert "modflow6.solve" in driver.timing_registry.kernel_phases
+    assert driver.timing_registry.loop_time == pytest.approx(
+        driver.timing_registry.kernel_time + driver.timing_registry.coupler_overhead
+    )
+
+    driver.timing_registry.write_json(tmp_path_dev / "imod_coupler_timing.json")
+    driver.timing_registry.write_csv(tmp_path_dev / "imod_coupler_timing.csv")
+    with open(tmp_path_dev / "imod_coupler_timing.json") as f:
+        content = json.load(f)
+    assert content["coupler_overhead"] == driver.timing_registry.coupler_overhead
+    with open(tmp_path_dev / "imod_coupler_timing.csv", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert {row["phase"] for row in rows} == set(phases)
+
+
+def test_timing_ribametamod(tmp_path_dev: Path) -> None:
+    """Exchange logging and the Ribasim sub-timesteps are timed separately"""
+    driver = create_ribametamod(
+        tmp_path_dev,
+        n_svat=300,
+        n_node=100,
+        n_basin=10,
+        n_bound=50,
+        delt_sw=0.25,
+        n_timestep=2,
+        timing=True,
+    )
+    driver.execute()
+    driver.report_timing_totals()
+
+    phases = driver.timing_registry.phases
+    assert phases["ribasim.update_until"].count == 8
+    assert phases["flux_to_ribasim"].count == 8
+    assert phases["exchange_logging"].count > 0
+    assert phases["exchange_rib2mod"].count == 2
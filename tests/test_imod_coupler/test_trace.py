@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+from typing import Any
+
+from imod_coupler.logging.trace import TraceRecorder
+from imod_coupler.testing.fake_kernels import create_metamod, create_ribametamod
+
+
+def read_trace(path: Path) -> list[dict[str, Any]]:
+    with open(path) as f:
+        events: list[dict[str, Any]] = json.load(f)
+    return events
+
+
+def test_trace_metamod(tmp_path_dev: Path) -> None:
+    """Tracing works without timing, and covers coupler phases and kernel calls"""
+    driver = create_metamod(
+        tmp_path_dev, n_svat=30, n_node=10, n_iter=3, n_timestep=4, timing=False
+    )
+    tracer = TraceRecorder(tmp_path_dev / "imod_coupler_trace.json")
+    driver.timing_registry.tracer = tracer
+    driver.execute()
+    tracer.finalize()
+
+    events = read_trace(tmp_path_dev / "imod_coupler_trace.json")
+    names = [event["name"] for event in events]
+    assert names.count("update") == 4
+    assert names.count("outer_iteration") == 4 * 3
+    assert names.count("libmf6.solve") == 4 * 3
+    assert names.count("libmf6.prepare_time_step") == 4
+    assert all(event["ph"] == "X" for event in events)
+    # no timing statistics are collected
+    assert driver.timing_registry.phases == {}
+
+
+def test_trace_ribametamod(tmp_path_dev: Path) -> None:
+    driver = create_ribametamod(
+        tmp_path_dev,
+        n_svat=30,
+        n_node=10,
+        n_basin=5,
+        n_bound=10,
+        delt_sw=0.5,
+        n_timestep=2,
+    )
+    tracer = TraceRecorder(tmp_path_dev / "imod_coupler_trace.json")
+    driver.timing_registry.tracer = tracer
+    driver.execute()
+    tracer.finalize()
+
+    events = read_trace(tmp_path_dev / "imod_coupler_trace.json")
+    names = [event["name"] for event in events]
+    assert names.count("surface_water_timestep") == 4
+    assert names.count("libribasim.update_until") == 4
+    # spans of a sub-timestep lie within the span of its time step
+    update = next(event for event in events if event["name"] == "update")
+    substep = next(e for e in events if e["name"] == "surface_water_timestep")
+    assert update["ts"] <= substep["ts"]